@@ -0,0 +1,206 @@
+import math
+import time
+import heapq
+import itertools
+import threading
+
+from duckfy_client import DuckfyAPIError
+
+# Classes de prioridade, da mais para a menos importante
+PRIORITIES = ('high', 'normal', 'low')
+
+
+class AdmissionRejected(DuckfyAPIError):
+    """Sem vaga para chamar a Duckfy agora: a requisição é recusada na hora"""
+    def __init__(self, reason, retry_after=1):
+        super().__init__(
+            message='Muitas requisições em andamento. Tente novamente em instantes.',
+            status_code=503,
+            error_code='OVERLOADED',
+            details={'reason': reason}
+        )
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_priorities(value):
+    """Converte '/pix/create/taxa-sedex=high,/pix/create/batch=low' em {rota: classe}"""
+    priorities = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        route, priority = (part.strip() for part in item.split('=', 1))
+        if priority not in PRIORITIES:
+            raise ValueError(f"Prioridade inválida para {route}: {priority}")
+        priorities[route] = priority
+    return priorities
+
+
+def parse_class_shares(value):
+    """Converte 'low=0.5,normal=0.8' em {classe: fração das vagas}"""
+    shares = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        priority, share = (part.strip() for part in item.split('=', 1))
+        if priority not in PRIORITIES:
+            raise ValueError(f"Classe de prioridade inválida: {priority}")
+        shares[priority] = float(share)
+    return shares
+
+
+class _Waiter:
+    __slots__ = ('priority', 'event', 'state')
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.event = threading.Event()
+        self.state = 'waiting'  # waiting -> granted | shed | expired
+
+
+class AdmissionController:
+    """
+    Limite de chamadas simultâneas à Duckfy por worker, com fila curta por
+    prioridade.
+
+    Até max_in_flight chamadas em andamento; as demais esperam em uma fila
+    de até max_queue posições, ordenada por prioridade (high, normal, low) e
+    chegada, por no máximo max_queue_seconds (ou o que sobrar do deadline).
+    Com a fila cheia, quem chega com prioridade maior toma a vaga do último
+    da fila de prioridade menor; sem vaga, a requisição é recusada na hora.
+
+    class_shares limita a fração de max_in_flight que cada classe pode
+    ocupar (ex.: low=0.5 deixa metade das vagas sempre livre para as demais).
+    """
+
+    def __init__(self, max_in_flight=10, max_queue=10, max_queue_seconds=2.0, class_shares=None,
+                 on_result=None):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_seconds = max_queue_seconds
+        self.on_result = on_result
+        shares = class_shares or {}
+        self.class_limits = {
+            priority: max(1, math.floor(max_in_flight * shares.get(priority, 1.0)))
+            for priority in PRIORITIES
+        }
+        self.in_flight = 0
+        self.class_in_flight = dict.fromkeys(PRIORITIES, 0)
+        self._queue = []  # heap (rank, sequência, waiter)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self):
+        return sum(1 for _, _, waiter in self._queue if waiter.state == 'waiting')
+
+    def _has_room(self, priority):
+        return self.in_flight < self.max_in_flight and self.class_in_flight[priority] < self.class_limits[priority]
+
+    def _admit(self, priority):
+        self.in_flight += 1
+        self.class_in_flight[priority] += 1
+
+    def _queued_ahead(self, rank):
+        """Há alguém esperando com prioridade igual ou maior (a fila não é furada)"""
+        return any(queued_rank <= rank and waiter.state == 'waiting' for queued_rank, _, waiter in self._queue)
+
+    def _shed_lowest(self, rank):
+        """Tira da fila o último de prioridade menor que rank; False se não houver"""
+        victims = [entry for entry in self._queue if entry[0] > rank and entry[2].state == 'waiting']
+        if not victims:
+            return False
+        victim = max(victims, key=lambda entry: (entry[0], entry[1]))
+        victim[2].state = 'shed'
+        victim[2].event.set()
+        self._queue.remove(victim)
+        heapq.heapify(self._queue)
+        return True
+
+    def acquire(self, priority='normal', timeout=None):
+        """
+        Reserva uma vaga para chamar a Duckfy, esperando no máximo
+        min(max_queue_seconds, timeout). Levanta AdmissionRejected se não
+        conseguir; toda vaga obtida deve ser devolvida com release(priority).
+        """
+        rank = PRIORITIES.index(priority)
+        wait = self.max_queue_seconds if timeout is None else max(0.0, min(self.max_queue_seconds, timeout))
+        with self._lock:
+            if self._has_room(priority) and not self._queued_ahead(rank):
+                self._admit(priority)
+                self._report(priority, 'admitted')
+                return 0.0
+            if wait <= 0 or (self.queued >= self.max_queue and not self._shed_lowest(rank)):
+                self._report(priority, 'rejected')
+                raise AdmissionRejected('queue_full' if wait > 0 else 'no_time')
+            waiter = _Waiter(priority)
+            heapq.heappush(self._queue, (rank, next(self._sequence), waiter))
+
+        start = time.monotonic()
+        waiter.event.wait(wait)
+        with self._lock:
+            if waiter.state == 'waiting':
+                waiter.state = 'expired'
+                self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                heapq.heapify(self._queue)
+            state = waiter.state
+        waited = time.monotonic() - start
+
+        if state == 'granted':
+            self._report(priority, 'admitted')
+            return waited
+        self._report(priority, 'shed' if state == 'shed' else 'timeout')
+        raise AdmissionRejected('preempted' if state == 'shed' else 'queue_timeout',
+                                retry_after=max(1, math.ceil(self.max_queue_seconds)))
+
+    def acquire_many(self, priority, count, timeout=None):
+        """
+        Reserva até count vagas de uma vez (lotes): a primeira como em
+        acquire(); as demais só se estiverem livres agora, sem entrar na
+        fila. Retorna quantas vagas foram obtidas, cada uma devolvida com
+        release(priority).
+        """
+        self.acquire(priority, timeout)
+        granted = 1
+        rank = PRIORITIES.index(priority)
+        with self._lock:
+            while granted < count and self._has_room(priority) and not self._queued_ahead(rank):
+                self._admit(priority)
+                self._report(priority, 'admitted')
+                granted += 1
+        return granted
+
+    def release(self, priority):
+        """Devolve a vaga e a repassa ao primeiro da fila que caiba no limite da sua classe"""
+        with self._lock:
+            self.in_flight -= 1
+            self.class_in_flight[priority] -= 1
+            skipped = []
+            while self._queue and self.in_flight < self.max_in_flight:
+                entry = heapq.heappop(self._queue)
+                waiter = entry[2]
+                if waiter.state != 'waiting':
+                    continue
+                if not self._has_room(waiter.priority):
+                    skipped.append(entry)
+                    continue
+                self._admit(waiter.priority)
+                waiter.state = 'granted'
+                waiter.event.set()
+                break
+            for entry in skipped:
+                heapq.heappush(self._queue, entry)
+
+    def _report(self, priority, result):
+        if self.on_result is not None:
+            self.on_result(priority, result)
+
+    def snapshot(self):
+        """Ocupação atual (usado em /health)"""
+        return {
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'queued': self.queued,
+            'max_queue': self.max_queue,
+            'by_priority': dict(self.class_in_flight)
+        }
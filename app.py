@@ -1,24 +1,48 @@
 import os
+import time
 import uuid
-import requests
+import hashlib
+import hmac
 import logging
 import json
-from flask import Flask, request, jsonify
+from urllib.parse import urlencode
+from flask import Flask, request, jsonify, g, has_request_context, Response, stream_with_context
+from functools import wraps
+from contextlib import contextmanager
 from flask_cors import CORS
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from config import config
+from duckfy_client import DuckfyAPIError
+from credential_pool import get_credential_pool, parse_credentials
+from idempotency import IdempotencyCache, IdempotencyConflict
+from circuit_breaker import get_circuit_breaker
+from admission import AdmissionController, AdmissionRejected, parse_class_shares, parse_priorities
+from rate_limit import RateLimiter, SharedBucketBackend, MemoryBucketBackend, client_ip, parse_rate_limit_rules, without_dimension
+import metrics
+from database import SQLiteDatabase
+from webhook_queue import WebhookQueue, WebhookProcessor, parse_webhook_payload
+from transaction_store import TransactionStore, ReadThroughCache, hash_client_document
+from catalog import Catalog
+from charge_reuse import PendingChargeStore
+from qr_images import QRImageStore
+from async_jobs import PixJobStore, StatusChanges, JobExecutor, TERMINAL_STATES
+from identifiers import IdentifierGenerator
+from compression import compress_response
+from conversion_export import ConversionExporter, build_checkout_event, build_purchase_event
+from utm_analytics import UTMAggregator, UTMRollupStore, DIMENSION_NAMES, parse_window
+from fast_json import FastJSONProvider, StaticJSON, dumps_bytes
+from validation import RequestValidator
+from structured_logging import configure_logging
+from tracing import RequestTrace, BatchSpanProcessor, build_span_exporter, parse_headers, server_timing_header
+from deadline import Deadline, LatencyTracker, deadline_from_request, parse_route_defaults, upstream_timeouts
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-# Configurar logging para produção
-if os.environ.get('FLASK_ENV') == 'production':
-    logging.basicConfig(level=logging.INFO)
-else:
-    logging.basicConfig(level=logging.DEBUG)
-
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # Configurar app baseado no ambiente
 config_name = os.environ.get('FLASK_ENV', 'development')
@@ -27,99 +51,887 @@ app.config.from_object(config.get(config_name, config['default']))
 CORS(app)
 
 # Configurações
-DUCKFY_BASE_URL = "https://app.duckfyoficial.com/api/v1"
+DUCKFY_BASE_URL = app.config['DUCKFY_BASE_URL']
 PUBLIC_KEY = os.getenv('PUBLIC_KEY')
 SECRET_KEY = os.getenv('SECRET_KEY')
 
-if not PUBLIC_KEY or not SECRET_KEY:
-    raise ValueError("Chaves PUBLIC_KEY e SECRET_KEY devem estar definidas no arquivo .env")
+# Uma ou mais contas da Duckfy (DUCKFY_CREDENTIALS); sem a lista, PUBLIC_KEY/SECRET_KEY
+DUCKFY_CREDENTIALS = parse_credentials(app.config['DUCKFY_CREDENTIALS'], PUBLIC_KEY, SECRET_KEY)
+if not DUCKFY_CREDENTIALS:
+    raise ValueError("Chaves PUBLIC_KEY e SECRET_KEY (ou DUCKFY_CREDENTIALS) devem estar definidas no arquivo .env")
 
-class DuckfyAPIError(Exception):
-    """Exceção customizada para erros da API Duckfy"""
-    def __init__(self, message, status_code=None, error_code=None, details=None):
-        super().__init__(message)
-        self.message = message
-        self.status_code = status_code
-        self.error_code = error_code
-        self.details = details
+# Sem salt, o hash do CPF guardado no banco e enviado na exportação de
+# conversões pode ser revertido por força bruta (são só 10^11 CPFs)
+if not app.config['CLIENT_HASH_SALT']:
+    if app.config['FLASK_ENV'] == 'production':
+        raise ValueError("CLIENT_HASH_SALT deve estar definido em produção (salt do hash do CPF dos clientes)")
+    app.config['CLIENT_HASH_SALT'] = hmac.new(
+        app.config['SECRET_KEY'].encode('utf-8'), b'client-hash-salt', hashlib.sha256
+    ).hexdigest()
+    logging.warning("CLIENT_HASH_SALT não definido: usando salt derivado de SECRET_KEY (apenas em desenvolvimento)")
 
-def generate_unique_identifier():
-    """Gera um identificador único para a transação"""
-    return str(uuid.uuid4())[:10]
+if not app.config['WEBHOOK_TOKEN']:
+    logging.warning("WEBHOOK_TOKEN não definido: /pix/webhook recusa as confirmações de pagamento")
+    if app.config['CHARGE_REUSE_ENABLED']:
+        logging.warning("CHARGE_REUSE_ENABLED ignorado: o reaproveitamento depende dos webhooks (WEBHOOK_TOKEN)")
+
+# callbackUrl de toda cobrança: o /pix/webhook desta API, com o token. Só a
+# partir de PUBLIC_BASE_URL: montado com o Host da requisição, um cliente
+# poderia desviar o webhook (e o token) para outro servidor
+WEBHOOK_CALLBACK_URL = None
+if app.config['WEBHOOK_TOKEN'] and app.config['PUBLIC_BASE_URL']:
+    WEBHOOK_CALLBACK_URL = (
+        f"{app.config['PUBLIC_BASE_URL']}/pix/webhook?{urlencode({'token': app.config['WEBHOOK_TOKEN']})}"
+    )
+elif app.config['WEBHOOK_TOKEN']:
+    logging.warning("PUBLIC_BASE_URL não definido: os PIX são criados sem callbackUrl e os webhooks não chegam")
+
+def request_log_context():
+    """(request_id, amostrada) da requisição atual, para os filtros de log"""
+    if has_request_context() and 'request_id' in g:
+        return g.request_id, g.log_sampled
+    return None
+
+# Logs em JSON escritos por uma thread de background; chaves e dados do cliente são mascarados
+log_handler = configure_logging(
+    level=app.config['LOG_LEVEL'],
+    sample_rate=app.config['LOG_SAMPLE_RATE'],
+    secrets=(PUBLIC_KEY, SECRET_KEY,
+             *(key for credential in DUCKFY_CREDENTIALS for key in (credential.public_key, credential.secret_key)),
+             app.config['WEBHOOK_TOKEN'], app.config['ANALYTICS_TOKEN'],
+             app.config['CONVERSION_EXPORT_TOKEN'], *parse_headers(app.config['TRACE_OTLP_HEADERS']).values()),
+    queue_size=app.config['LOG_QUEUE_SIZE'],
+    context=request_log_context
+)
+request_logger = logging.getLogger('api_pix.request')
+
+# Latências recentes da Duckfy (por worker) para o timeout adaptativo
+latency_tracker = LatencyTracker(
+    min_samples=app.config['ADAPTIVE_TIMEOUT_MIN_SAMPLES'],
+    multiplier=app.config['ADAPTIVE_TIMEOUT_MULTIPLIER'],
+    floor=app.config['ADAPTIVE_TIMEOUT_MIN_SECONDS'],
+    ceiling=app.config['DUCKFY_READ_TIMEOUT']
+)
+deadline_route_defaults = parse_route_defaults(app.config['DEADLINE_ROUTE_DEFAULTS'])
+
+# Vagas para chamar a Duckfy (por worker), com fila curta por prioridade da rota
+admission = AdmissionController(
+    max_in_flight=app.config['ADMISSION_MAX_IN_FLIGHT'],
+    max_queue=app.config['ADMISSION_MAX_QUEUE'],
+    max_queue_seconds=app.config['ADMISSION_MAX_QUEUE_SECONDS'],
+    class_shares=parse_class_shares(app.config['ADMISSION_CLASS_SHARES']),
+    on_result=metrics.record_admission
+)
+admission_priorities = parse_priorities(app.config['ADMISSION_PRIORITIES'])
+
+# Rate limiting (token bucket) por rota e por IP/CPF/e-mail, compartilhado entre workers
+if app.config['RATE_LIMIT_BACKEND'] == 'memory':
+    rate_limit_backend = MemoryBucketBackend()
+else:
+    rate_limit_backend = SharedBucketBackend(slots=app.config['RATE_LIMIT_SLOTS'],
+                                             directory=app.config['SHARED_STATE_DIR'])
+rate_limit_rules = parse_rate_limit_rules(app.config['RATE_LIMIT_RULES'])
+if app.config['RATE_LIMIT_ENABLED'] and not app.config['RATE_LIMIT_TRUSTED_PROXIES']:
+    # Sem proxies confiáveis o X-Forwarded-For é ignorado; atrás de um proxy todos os
+    # clientes teriam o IP dele e dividiriam um único balde por rota
+    if any(dimension == 'ip' for limits in rate_limit_rules.values() for dimension, _, _ in limits):
+        logging.warning("RATE_LIMIT_TRUSTED_PROXIES=0: limites por IP desativados "
+                        "(defina o número de proxies à frente da API; na Render, 1)")
+    rate_limit_rules = without_dimension(rate_limit_rules, 'ip')
+rate_limiter = RateLimiter(rate_limit_rules, rate_limit_backend)
+
+def precomputed_json(view):
+    """
+    Para endpoints de conteúdo fixo: executa a view uma vez, na importação,
+    e serve o JSON já codificado (e já comprimido, por codificação) com
+    ETag/304 e Cache-Control.
+    """
+    compression = None
+    if app.config['COMPRESSION_ENABLED']:
+        compression = {
+            'min_size': app.config['COMPRESSION_MIN_SIZE'],
+            'gzip_level': app.config['COMPRESSION_GZIP_LEVEL'],
+            'brotli_quality': app.config['COMPRESSION_BROTLI_QUALITY']
+        }
+    static = StaticJSON(view(), max_age=app.config['EXAMPLE_CACHE_MAX_AGE'], compression=compression)
+
+    @wraps(view)
+    def wrapper():
+        return static.response(request, app.response_class)
+    return wrapper
+
+# Validadores compilados por rota: /pix/create (e itens do lote) e produtos do catálogo
+pix_request_validator = RequestValidator()
+product_request_validator = RequestValidator(require_amount=False, passthrough=())
+
+# Catálogo de produtos de preço fixo (recarregado quando o arquivo muda)
+catalog = Catalog(app.config['CATALOG_PATH'], reload_interval=app.config['CATALOG_RELOAD_INTERVAL'])
+
+# Banco local: transações criadas e fila durável de webhooks
+database = SQLiteDatabase(app.config['DATABASE_PATH'], synchronous=app.config['DATABASE_SYNCHRONOUS'])
+transaction_store = TransactionStore(database, client_hash_salt=app.config['CLIENT_HASH_SALT'])
+transaction_cache = ReadThroughCache(
+    transaction_store.get,
+    max_entries=app.config['TRANSACTION_CACHE_MAX_ENTRIES'],
+    ttl=app.config['TRANSACTION_CACHE_TTL']
+)
+webhook_queue = WebhookQueue(database, max_attempts=app.config['WEBHOOK_MAX_ATTEMPTS'])
+# Idempotência da criação de PIX: chaves reservadas no banco, visíveis a todos os workers
+idempotency_cache = IdempotencyCache(
+    database,
+    max_entries=app.config['IDEMPOTENCY_MAX_ENTRIES'],
+    max_bytes=app.config['IDEMPOTENCY_MAX_BYTES'],
+    ttl=app.config['IDEMPOTENCY_TTL'],
+    pending_timeout=app.config['DEADLINE_MAX_SECONDS'] + 5,
+    wait_timeout=app.config['DEADLINE_DEFAULT_SECONDS']
+)
+# Cobranças pendentes reaproveitadas quando o mesmo CPF reenvia o checkout
+pending_charges = PendingChargeStore(
+    database,
+    window=app.config['CHARGE_REUSE_WINDOW'],
+    client_hash_salt=app.config['CLIENT_HASH_SALT']
+)
+# PNGs dos QR Codes servidos em /pix/<id>/qr.png (respostas lean)
+qr_images = QRImageStore(
+    database,
+    max_bytes=app.config['QR_IMAGE_CACHE_MAX_BYTES'],
+    retention_days=app.config['QR_IMAGE_RETENTION_DAYS']
+)
+# Criações assíncronas (Prefer: respond-async) e avisos de mudança de status
+pix_jobs = PixJobStore(database, retention_days=app.config['ASYNC_JOB_RETENTION_DAYS'])
+status_changes = StatusChanges(directory=app.config['SHARED_STATE_DIR'], poll_interval=app.config['ASYNC_POLL_INTERVAL'])
+job_executor = JobExecutor(workers=app.config['ASYNC_WORKERS'], max_pending=app.config['ASYNC_MAX_PENDING'])
+
+# Agregados de UTM (campanha, conjunto, anúncio, posicionamento) por bucket de tempo
+PAID_STATUSES = frozenset(
+    status.strip().upper() for status in app.config['PAID_STATUSES'].split(',') if status.strip()
+)
+CLOSED_STATUSES = frozenset(
+    status.strip().upper() for status in app.config['CLOSED_STATUSES'].split(',') if status.strip()
+)
+utm_aggregator = UTMAggregator(
+    UTMRollupStore(database),
+    bucket_seconds=app.config['UTM_BUCKET_SECONDS'],
+    flush_interval=app.config['UTM_FLUSH_INTERVAL'],
+    retention_days=app.config['UTM_RETENTION_DAYS']
+)
+# Eventos de conversão server-side (InitiateCheckout na criação, Purchase no pagamento)
+conversion_exporter = ConversionExporter(
+    app.config['CONVERSION_EXPORT_URL'],
+    token=app.config['CONVERSION_EXPORT_TOKEN'],
+    batch_size=app.config['CONVERSION_BATCH_SIZE'],
+    flush_interval=app.config['CONVERSION_FLUSH_INTERVAL'],
+    max_attempts=app.config['CONVERSION_MAX_ATTEMPTS'],
+    timeout=app.config['CONVERSION_TIMEOUT'],
+    queue_size=app.config['CONVERSION_QUEUE_SIZE'],
+    on_result=metrics.record_conversion_events
+)
+
+# Spans das rotas de criação (Server-Timing na resposta; exporter opcional)
+TRACED_ROUTES = frozenset(route.strip() for route in app.config['TRACE_ROUTES'].split(',') if route.strip())
+span_processor = BatchSpanProcessor(
+    build_span_exporter(app.config['TRACE_EXPORTER'], app.config),
+    batch_size=app.config['TRACE_BATCH_SIZE'],
+    flush_interval=app.config['TRACE_FLUSH_INTERVAL'],
+    queue_size=app.config['TRACE_QUEUE_SIZE']
+)
 
-def validate_pix_request(data):
-    """Valida os dados da requisição PIX"""
-    required_fields = ['amount', 'client']
-    missing_fields = [field for field in required_fields if field not in data]
+def build_checkout_conversion(pix_data, result, event_time):
+    """Monta o InitiateCheckout na thread do exporter (hash do cliente incluído)"""
+    client = pix_data.get('client') or {}
+    external_id = hash_client_document(client.get('cpf') or client.get('document'), app.config['CLIENT_HASH_SALT'])
+    return build_checkout_event(pix_data, result, external_id, event_time)
+
+utm_rollup_cache = ReadThroughCache(
+    lambda key: utm_aggregator.store.rollup(*key),
+    max_entries=256,
+    ttl=app.config['UTM_FLUSH_INTERVAL']
+)
+
+def apply_payment_updates(events):
+    """Handler do lote de webhooks: atualiza o status das transações"""
+    updated = transaction_store.update_statuses(events)
+    transaction_cache.invalidate(*(transaction['identifier'] for transaction in updated))
+    transaction_cache.invalidate(*(event['transaction_id'] for event in events))
+    # Acorda quem espera o pagamento em /pix/<id>/status?wait= e /pix/<id>/events
+    status_changes.notify(*(transaction['identifier'] for transaction in updated),
+                          *(event['transaction_id'] for event in events))
     
-    if missing_fields:
-        raise ValueError(f"Campos obrigatórios ausentes: {', '.join(missing_fields)}")
+    # Receita por campanha e evento Purchase: só na primeira vez que a transação fica paga
+    for transaction in updated:
+        if transaction['status'] in PAID_STATUSES and transaction['previous_status'] not in PAID_STATUSES:
+            utm_aggregator.record(transaction['utm'], transaction['amount'], paid=True)
+            conversion_exporter.submit(build_purchase_event, transaction, time.time())
+    logging.info(f"Applied {len(events)} payment status updates")
+
+webhook_processor = WebhookProcessor(
+    webhook_queue,
+    handlers=[apply_payment_updates],
+    workers=app.config['WEBHOOK_WORKERS'],
+    batch_size=app.config['WEBHOOK_BATCH_SIZE'],
+    poll_interval=app.config['WEBHOOK_POLL_INTERVAL']
+)
+
+# Rotas que recebem o primeiro PIX de um worker recém-criado
+WARMUP_ROUTES = ('/pix/create', '/pix/create/taxa-sedex', '/pix/create/<sku>')
+
+def warm_up_worker():
+    """
+    Prepara o worker antes da primeira requisição (post_worker_init do gunicorn).
     
-    # Validar campo client
-    if not isinstance(data['client'], dict):
-        raise ValueError("Campo 'client' deve ser um objeto")
+    Resolve o DNS e abre conexões com a Duckfy, abre o banco e os arquivos de
+    estado compartilhado do processo e calcula o vencimento dos produtos do
+    catálogo. Cada etapa é independente; uma falha só é registrada.
+    Retorna o tempo de cada etapa em ms.
+    """
+    steps = (
+        ('duckfy_pool', lambda: get_duckfy_pool().warm_up(app.config['WARMUP_CONNECTIONS'])),
+        ('database', lambda: database.execute('SELECT 1').fetchone()),
+        ('circuit_breaker', lambda: app.config['BREAKER_ENABLED'] and get_circuit_breaker(app.config)),
+        ('rate_limit', rate_limit_backend.open),
+        ('catalog', lambda: [product.due_date() for product in catalog.products()]),
+        ('metrics', lambda: metrics.prepare_routes(WARMUP_ROUTES))
+    )
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logging.warning(f"Worker warm-up step {name} failed: {str(e)}")
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+    logging.info('Worker warm-up finished', extra={'fields': {'event': 'warmup', 'steps_ms': timings}})
+    return timings
+
+def start_background_workers():
+    """Inicia as threads de background do worker (chamado no post_worker_init do gunicorn)"""
+    webhook_processor.start()
+    utm_aggregator.start()
+    conversion_exporter.start()
+    span_processor.start()
+
+@app.before_request
+def start_request_metrics():
+    """Registra o início da requisição para as métricas por rota e o log"""
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.request_start = time.perf_counter()
+    g.request_id = (request.headers.get('X-Request-Id') or uuid.uuid4().hex)[:64]
+    g.log_sampled = log_handler.sampling_filter.should_sample()
+    metrics.request_started(g.metrics_route)
+
+@app.before_request
+def start_trace():
+    """Abre o trace das rotas de criação (spans das etapas vêm de metrics.stage)"""
+    if g.metrics_route in TRACED_ROUTES and (app.config['SERVER_TIMING_ENABLED'] or span_processor.enabled):
+        g.trace = RequestTrace(
+            request.headers.get('traceparent'),
+            sample_rate=app.config['TRACE_SAMPLE_RATE'],
+            start=g.request_start
+        )
+
+@app.before_request
+def enforce_rate_limits():
+    """Recusa com 429 antes da view (e da Duckfy) quando um balde da rota esvaziou"""
+    if not app.config['RATE_LIMIT_ENABLED'] or request.method != 'POST':
+        return None
+    dimensions = rate_limiter.dimensions(g.metrics_route)
+    if not dimensions:
+        return None
     
-    required_client_fields = ['name', 'email', 'cpf']
-    missing_client_fields = [field for field in required_client_fields if field not in data['client']]
+    identities = {'ip': client_ip(request.remote_addr, request.headers.get('X-Forwarded-For'),
+                                  app.config['RATE_LIMIT_TRUSTED_PROXIES'])}
+    if 'cpf' in dimensions or 'email' in dimensions:
+        # O JSON fica em cache na requisição; a view não decodifica de novo
+        with metrics.stage('parse'):
+            data = request.get_json(silent=True)
+        client = data.get('client') if isinstance(data, dict) else None
+        if isinstance(client, dict):
+            document = client.get('cpf') or client.get('document')
+            identities['cpf'] = ''.join(ch for ch in str(document) if ch.isdigit()) if document else None
+            email = client.get('email')
+            identities['email'] = email.strip().lower() if isinstance(email, str) else None
     
-    if missing_client_fields:
-        raise ValueError(f"Campos obrigatórios do cliente ausentes: {', '.join(missing_client_fields)}")
+    retry_after, dimension = rate_limiter.check(g.metrics_route, identities)
+    if not retry_after:
+        return None
     
-    # Validar valor
-    if not isinstance(data['amount'], (int, float)) or data['amount'] <= 0:
-        raise ValueError("Campo 'amount' deve ser um número positivo")
+    metrics.record_rate_limited(g.metrics_route, dimension)
+    response = jsonify({
+        'status': 'error',
+        'message': 'Muitas requisições. Tente novamente em instantes.',
+        'errorCode': 'RATE_LIMITED'
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+@app.after_request
+def add_server_timing(response):
+    """Server-Timing com as etapas da requisição (registrado primeiro: roda por último)"""
+    trace = g.get('trace')
+    if trace is not None and app.config['SERVER_TIMING_ENABLED']:
+        response.headers['Server-Timing'] = server_timing_header(
+            g.get('stage_timings') or {},
+            time.perf_counter() - g.request_start,
+            trace.traceparent if trace.sampled and span_processor.enabled else None
+        )
+    return response
+
+@app.after_request
+def capture_response_status(response):
+    g.response_status = response.status_code
+    if 'request_id' in g:
+        response.headers['X-Request-Id'] = g.request_id
+    return response
+
+@app.after_request
+def compress_json_response(response):
+    """Comprime as respostas JSON com br/gzip conforme o Accept-Encoding"""
+    if not app.config['COMPRESSION_ENABLED'] or 'Content-Encoding' in response.headers:
+        return response
+    original_size = response.content_length
+    with metrics.stage('compress'):
+        compress_response(
+            response,
+            request.accept_encodings,
+            min_size=app.config['COMPRESSION_MIN_SIZE'],
+            gzip_level=app.config['COMPRESSION_GZIP_LEVEL'],
+            brotli_quality=app.config['COMPRESSION_BROTLI_QUALITY']
+        )
+    encoding = response.headers.get('Content-Encoding')
+    if encoding:
+        metrics.record_compression(encoding, original_size, response.content_length)
+    return response
 
-def create_pix_payment(pix_data):
-    """Faz a requisição para a API Duckfy para criar o pagamento PIX"""
-    headers = {
-        'x-public-key': PUBLIC_KEY,
-        'x-secret-key': SECRET_KEY,
-        'Content-Type': 'application/json'
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if 'request_start' not in g:
+        return
+    duration = time.perf_counter() - g.request_start
+    status = g.get('response_status', 500)
+    metrics.request_finished(g.metrics_route, request.method, status, duration)
+    
+    # Uma linha estruturada por requisição, com as etapas medidas
+    fields = {
+        'event': 'request',
+        'method': request.method,
+        'route': g.metrics_route,
+        'path': request.path,
+        'status': status,
+        'duration_ms': round(duration * 1000, 2)
     }
+    stage_timings = g.get('stage_timings')
+    if stage_timings:
+        fields['stages_ms'] = {name: round(value * 1000, 2) for name, value in stage_timings.items()}
+    if error is not None:
+        fields['error'] = f"{type(error).__name__}: {error}"
     
-    url = f"{DUCKFY_BASE_URL}/gateway/pix/receive"
+    trace = g.get('trace')
+    if trace is not None:
+        fields['trace_id'] = trace.trace_id
+        if trace.sampled and span_processor.enabled:
+            span_processor.submit(trace.spans(
+                f"{request.method} {g.metrics_route}",
+                duration,
+                {
+                    'http.method': request.method,
+                    'http.route': g.metrics_route,
+                    'http.status_code': status,
+                    'request_id': g.request_id
+                },
+                fields.get('error')
+            ))
+    request_logger.info('request', extra={'fields': fields})
+
+@app.before_request
+def assign_deadline():
+    """Associa a cada requisição o prazo máximo de resposta"""
+    route = request.url_rule.rule if request.url_rule else request.path
+    g.deadline = deadline_from_request(
+        request.headers,
+        route,
+        app.config['DEADLINE_DEFAULT_SECONDS'],
+        deadline_route_defaults,
+        app.config['DEADLINE_MAX_SECONDS']
+    )
+
+def get_duckfy_pool():
+    """Pool de credenciais da Duckfy do worker atual (um DuckfyClient por chave)"""
+    return get_credential_pool(
+        app.config,
+        response_hooks=[metrics.record_upstream_response],
+        on_result=metrics.record_credential_call
+    )
+
+# Identificadores ordenados pelo tempo (ULID), seguros entre workers e servidores
+identifier_generator = IdentifierGenerator()
+
+def generate_unique_identifier():
+    """Gera um identificador único para a transação"""
+    return identifier_generator.new()
+
+def request_priority():
+    """Classe de prioridade da rota atual no controle de admissão"""
+    if has_request_context() and 'metrics_route' in g:
+        return admission_priorities.get(g.metrics_route, 'normal')
+    return 'normal'
+
+def create_pix_payment(pix_data, deadline=None, priority=None, admit=True):
+    """
+    Faz a requisição para a API Duckfy para criar o pagamento PIX
     
-    # Log para debugging
-    if app.config.get('DEBUG'):
-        print(f"🔗 Fazendo requisição para: {url}")
-        print(f"📤 Dados enviados: {pix_data}")
-        print(f"🔑 Headers: {headers}")
+    A chamada espera uma vaga no controle de admissão (fila por prioridade,
+    limitada pelo deadline); os timeouts vêm do orçamento que sobrar e do
+    p99 observado da Duckfy. Sem orçamento ou sem vaga, falha antes de
+    chamar a gateway. admit=False é para quem já tem a vaga (itens do lote).
+    """
+    if deadline is None and has_request_context():
+        deadline = g.get('deadline')
+    
+    if not admit:
+        return call_duckfy(pix_data, deadline)
+    with admission_slot(priority or request_priority(), deadline):
+        return call_duckfy(pix_data, deadline)
+
+@contextmanager
+def admission_slot(priority, deadline, count=1):
+    """
+    Ocupa vagas do controle de admissão e entrega quantas foram obtidas:
+    uma, ou até count para o lote (sem ADMISSION_ENABLED, não faz nada e
+    entrega count).
+    """
+    if not app.config['ADMISSION_ENABLED']:
+        yield count
+        return
+    
+    queue_budget = None
+    if deadline is not None:
+        queue_budget = deadline.remaining() - app.config['DEADLINE_MIN_UPSTREAM_SECONDS']
+    with metrics.stage('admission'):
+        granted = admission.acquire_many(priority, count, queue_budget)
+    try:
+        yield granted
+    finally:
+        for _ in range(granted):
+            admission.release(priority)
+
+def call_duckfy(pix_data, deadline):
+    """Chamada à Duckfy (pool de credenciais + circuit breaker) e registro da transação"""
+    pool = get_duckfy_pool()
+    read_timeout = latency_tracker.read_timeout() if app.config['ADAPTIVE_TIMEOUT_ENABLED'] else pool.read_timeout
+    timeout = upstream_timeouts(
+        deadline,
+        pool.connect_timeout,
+        read_timeout,
+        app.config['DEADLINE_MIN_UPSTREAM_SECONDS']
+    )
+    
+    def send(client):
+        start = time.monotonic()
+        try:
+            with metrics.upstream_call():
+                return client.create_pix(pix_data, timeout=timeout)
+        finally:
+            latency_tracker.observe(time.monotonic() - start)
+    
+    # O pool escolhe a chave (e troca de chave em 401/403/429)
+    if app.config['BREAKER_ENABLED']:
+        credential, result = get_circuit_breaker(app.config).call(lambda: pool.call(send))
     else:
-        logging.info(f"Creating PIX payment for amount: {pix_data.get('amount')}")
+        credential, result = pool.call(send)
     
+    record_transaction(pix_data, result, credential)
+    return result
+
+def record_transaction(pix_data, result, credential=None):
+    """Registra a transação criada no banco local (falhas não afetam o PIX)"""
     try:
-        response = requests.post(url, json=pix_data, headers=headers, timeout=30)
-        
-        if app.config.get('DEBUG'):
-            print(f"📥 Status Code: {response.status_code}")
-            print(f"📥 Response Headers: {dict(response.headers)}")
-            print(f"📥 Response Text: {response.text}")
+        transaction_store.record_created(pix_data, result, credential)
+        transaction_cache.invalidate(str(pix_data['identifier']), result.get('transactionId'))
+        utm_aggregator.record((pix_data.get('metadata') or {}).get('tracking'), pix_data.get('amount'))
+        conversion_exporter.submit(build_checkout_conversion, pix_data, result, time.time())
+    except Exception as e:
+        logging.error(f"Failed to record transaction {pix_data.get('identifier')}: {str(e)}")
+
+def create_pix_payment_idempotent(route, data, pix_data):
+    """
+    Cria o PIX passando pelo cache de idempotência.
+
+    A chave vem do header Idempotency-Key ou, na falta dele, do identifier
+    enviado pelo cliente. Retorna (resultado, replayed).
+    """
+    key = request.headers.get('Idempotency-Key') or data.get('identifier')
+    if not key:
+        return create_pix_payment(pix_data), False
+
+    fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+    return idempotency_cache.execute(
+        f"{route}:{str(key)[:255]}",
+        fingerprint,
+        lambda: create_pix_payment(pix_data)
+    )
+
+def create_pix_payment_reusable(route, data, pix_data, scope):
+    """
+    Com CHARGE_REUSE_ENABLED, devolve a cobrança PENDING já criada para o
+    mesmo CPF/CNPJ e escopo (SKU ou valor) em vez de chamar a Duckfy de novo.
+    
+    Requisições com Idempotency-Key ou identifier próprio seguem só a
+    idempotência. Retorna (resultado, replayed, reused).
+    """
+    key = charge_reuse_key(data, pix_data, scope)
+    if key is None:
+        return (*create_pix_payment_idempotent(route, data, pix_data), False)
+    
+    with metrics.stage('reuse_lookup'):
+        reused = pending_charges.find(key)
+    if reused is not None:
+        metrics.record_charge_reused(route)
+        return reused, False, True
+    
+    result, replayed = create_pix_payment_idempotent(route, data, pix_data)
+    try:
+        pending_charges.remember(key, pix_data, result)
+    except Exception as e:
+        logging.error(f"Failed to store reusable charge {pix_data.get('identifier')}: {str(e)}")
+    return result, replayed, False
+
+def charge_reuse_key(data, pix_data, scope):
+    """
+    Chave de reaproveitamento da cobrança; None quando não se aplica à
+    requisição. Sem WEBHOOK_TOKEN nenhum pagamento é confirmado, então uma
+    cobrança já paga seria devolvida como pendente: o reaproveitamento fica
+    desligado.
+    """
+    if (not app.config['CHARGE_REUSE_ENABLED'] or not app.config['WEBHOOK_TOKEN'] or scope is None
+            or request.headers.get('Idempotency-Key') or data.get('identifier')):
+        return None
+    return pending_charges.key(pix_data['client'], scope)
+
+def idempotent_response(response_data, replayed, reused=False):
+    """Monta a resposta 201, sinalizando quando ela foi reaproveitada"""
+    with metrics.stage('serialize'):
+        response = jsonify(response_data)
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    if reused:
+        response.headers['Charge-Reused'] = 'true'
+    return response, 201
+
+def request_preferences():
+    """Preferências do header Prefer (RFC 7240), ex.: {'respond-async', 'return=minimal'}"""
+    return {item.split(';')[0].strip().lower() for item in request.headers.get('Prefer', '').split(',')}
+
+def lean_response_base_url():
+    """
+    Base da URL de pix.qrCodeUrl quando a requisição pede a resposta lean
+    (?response=lean ou Prefer: return=minimal); None para a resposta completa.
+    """
+    mode = request.args.get('response', '').lower()
+    if mode not in ('lean', 'full'):
+        preferences = request_preferences()
+        if 'return=minimal' in preferences:
+            mode = 'lean'
+        elif 'return=representation' in preferences:
+            mode = 'full'
         else:
-            logging.info(f"Duckfy API response status: {response.status_code}")
-        
-        if response.status_code in [200, 201]:
-            return response.json()
+            mode = app.config['PIX_RESPONSE_MODE']
+    if mode != 'lean':
+        return None
+    return app.config['PUBLIC_BASE_URL'] or request.host_url.rstrip('/')
+
+def lean_pix_result(result, pix_data, base_url):
+    """
+    Cópia do resultado da Duckfy sem pix.base64: o PNG vai para o
+    QRImageStore e a resposta leva só o código EMV e pix.qrCodeUrl.
+    """
+    pix = result.get('pix') if isinstance(result, dict) else None
+    if not isinstance(pix, dict) or 'base64' not in pix:
+        return result
+    
+    # Chave pelo transactionId: uma cobrança reaproveitada mantém a mesma URL
+    key = str(result.get('transactionId') or pix_data['identifier'])
+    try:
+        with metrics.stage('qr_store'):
+            stored = qr_images.put(key, str(pix_data['identifier']), pix['base64'])
+    except Exception as e:
+        logging.error(f"Failed to store QR image {key}: {str(e)}")
+        stored = False
+    
+    lean_pix = {name: value for name, value in pix.items() if name != 'base64'}
+    if stored:
+        lean_pix['qrCodeUrl'] = f"{base_url}/pix/{key}/qr.png"
+    return {**result, 'pix': lean_pix}
+
+def duckfy_error_response(error):
+    """Resposta de erro da gateway; circuito aberto responde 503 com Retry-After"""
+    response = jsonify({
+        'status': 'error',
+        'message': error.message,
+        'errorCode': error.error_code,
+        'details': error.details
+    })
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(retry_after)
+    return response, error.status_code or 500
+
+def prefers_async():
+    """A requisição pediu a criação assíncrona (Prefer: respond-async)"""
+    return app.config['ASYNC_ENABLED'] and 'respond-async' in request_preferences()
+
+def accept_pix_async(route, data, pix_data, reuse_scope=None, qr_base_url=None):
+    """
+    Prefer: respond-async: registra o job, agenda a chamada à Duckfy no
+    executor do worker e responde 202 com a URL de status, sem esperar a
+    gateway. Reenvios com a mesma Idempotency-Key (ou identifier) devolvem
+    o mesmo job; um job que falhou é executado de novo.
+    
+    Retorna None quando há cobrança pendente a reaproveitar: a rota segue o
+    caminho síncrono e responde 201 na hora.
+    """
+    reuse_key = charge_reuse_key(data, pix_data, reuse_scope)
+    if reuse_key is not None:
+        with metrics.stage('reuse_lookup'):
+            if pending_charges.find(reuse_key) is not None:
+                return None
+    
+    key = request.headers.get('Idempotency-Key') or data.get('identifier')
+    request_key = f"{route}:{str(key)[:255]}" if key else None
+    fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+    with metrics.stage('job_store'):
+        job, created = pix_jobs.create(str(pix_data['identifier']), route, request_key, fingerprint)
+    
+    if not created:
+        if job['request_key'] != request_key or job['fingerprint'] != fingerprint:
+            raise IdempotencyConflict("Chave de idempotência já utilizada com dados diferentes")
+        state = job_status(job)['state']
+        if state != 'failed' or not pix_jobs.retry(job):
+            metrics.record_async_job('replayed')
+            response, status_code = accepted_response(job['identifier'], state)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response, status_code
+    
+    # Em um reenvio sem identifier do cliente, pix_data traz um identifier
+    # novo: a nova tentativa precisa criar o PIX com o do job
+    identifier = job['identifier']
+    pix_data['identifier'] = identifier
+    deadline = Deadline(time.time() + app.config['ASYNC_JOB_TIMEOUT'])
+    if not job_executor.submit(run_pix_job, identifier, pix_data, deadline, request_priority(), reuse_key, qr_base_url):
+        if created:
+            pix_jobs.discard(identifier)
         else:
-            error_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
-            raise DuckfyAPIError(
-                message=error_data.get('message', f'Erro da gateway (Status: {response.status_code}). Response: {response.text}'),
-                status_code=response.status_code,
-                error_code=error_data.get('errorCode'),
-                details=error_data.get('details')
-            )
+            pix_jobs.fail(identifier, {'message': 'Fila de criação assíncrona cheia', 'errorCode': 'OVERLOADED'})
+        metrics.record_async_job('rejected')
+        raise AdmissionRejected('async_queue_full')
+    
+    metrics.record_async_job('accepted')
+    return accepted_response(identifier, 'pending')
+
+def run_pix_job(identifier, pix_data, deadline, priority, reuse_key=None, qr_base_url=None):
+    """Executa um job assíncrono no executor: cria o PIX e grava o resultado (ou o erro) no job"""
+    try:
+        result = create_pix_payment(pix_data, deadline, priority)
+        if reuse_key is not None:
+            try:
+                pending_charges.remember(reuse_key, pix_data, result)
+            except Exception as e:
+                logging.error(f"Failed to store reusable charge {identifier}: {str(e)}")
+        if qr_base_url:
+            result = lean_pix_result(result, pix_data, qr_base_url)
+        pix_jobs.complete(identifier, result)
+        metrics.record_async_job('created')
+        status_changes.notify(identifier, result.get('transactionId'))
+        return
+    except DuckfyAPIError as e:
+        error = {
+            'message': e.message,
+            'errorCode': e.error_code,
+            'details': e.details,
+            'statusCode': e.status_code or 500
+        }
+    except Exception as e:
+        logging.error(f"Async PIX job {identifier} failed: {str(e)}")
+        error = {'message': f'Erro interno do servidor: {str(e)}', 'statusCode': 500}
+    
+    try:
+        pix_jobs.fail(identifier, error)
+    except Exception as e:
+        logging.error(f"Failed to store async PIX job error {identifier}: {str(e)}")
+    metrics.record_async_job('failed')
+    status_changes.notify(identifier)
+
+def accepted_response(identifier, state):
+    """Resposta 202 da criação assíncrona, com as URLs de status (long-poll) e de eventos (SSE)"""
+    base_url = app.config['PUBLIC_BASE_URL'] or request.host_url.rstrip('/')
+    status_url = f"{base_url}/pix/{identifier}/status"
+    response = jsonify({
+        'status': 'accepted',
+        'message': 'PIX em processamento',
+        'data': {
+            'identifier': identifier,
+            'state': state,
+            'statusUrl': status_url,
+            'eventsUrl': f"{base_url}/pix/{identifier}/events"
+        }
+    })
+    response.headers['Location'] = status_url
+    response.headers['Preference-Applied'] = 'respond-async'
+    response.headers['Retry-After'] = '1'
+    return response, 202
+
+def job_status(job):
+    """Estado de um job; 'pending' além do prazo (worker reiniciado no meio) conta como falha"""
+    if job['state'] == 'pending' and time.time() - job['updated_at'] > app.config['ASYNC_JOB_TIMEOUT'] + 5:
+        return {'state': 'failed', 'error': {
+            'message': 'A criação do PIX não foi concluída; tente novamente',
+            'errorCode': 'JOB_EXPIRED',
+            'statusCode': 504
+        }}
+    if job['error']:
+        return {'state': job['state'], 'error': job['error']}
+    return {'state': job['state']}
+
+def load_pix_status(identifier):
+    """
+    Estado atual de um PIX: pending -> created -> paid (ou closed, para
+    cobranças vencidas/canceladas), ou failed. Junta o job da criação
+    assíncrona, quando houver, ao status da transação, que os webhooks
+    atualizam. Lê direto do banco (o cache de /pix/<id> atrasa até o TTL).
+    None se o identifier não existe.
+    """
+    job = pix_jobs.get(identifier)
+    status = {'identifier': identifier, 'state': 'created'}
+    if job is not None:
+        status.update(job_status(job))
+        if status['state'] != 'created':
+            return status
+        status['data'] = job['result']
+    
+    record = transaction_store.get(identifier)
+    if record is None:
+        return status if job is not None else None
+    
+    payment_status = record['status']
+    status['identifier'] = record['identifier']
+    status['transactionId'] = record['transaction_id']
+    status['paymentStatus'] = payment_status
+    if payment_status in PAID_STATUSES:
+        status['state'] = 'paid'
+    elif payment_status in CLOSED_STATUSES:
+        status['state'] = 'closed'
+    # Status desconhecido não encerra o PIX: o cliente continua esperando o pagamento
+    return status
+
+def wait_for_pix_status(identifier, known_state, timeout):
+    """Long-poll: espera o estado do PIX deixar de ser known_state, por no máximo timeout segundos"""
+    end = time.monotonic() + timeout
+    while True:
+        version = status_changes.version(identifier)
+        status = load_pix_status(identifier)
+        remaining = end - time.monotonic()
+        if status is None or status['state'] != known_state or remaining <= 0:
+            return status
+        status_changes.wait(identifier, version, remaining)
+
+def pix_status_events(identifier, last_state, max_seconds):
+    """
+    Stream SSE de /pix/<id>/events: um evento por mudança de estado (o nome
+    e o id do evento são o estado), comentário de keep-alive a cada
+    ASYNC_HEARTBEAT_SECONDS e fim no estado final ou após max_seconds (o
+    EventSource reconecta com Last-Event-ID).
+    """
+    end = time.monotonic() + max_seconds
+    yield 'retry: 2000\n\n'
+    while True:
+        version = status_changes.version(identifier)
+        status = load_pix_status(identifier)
+        if status is None:
+            return
+        if status['state'] != last_state:
+            last_state = status['state']
+            yield f"id: {last_state}\nevent: {last_state}\ndata: {dumps_bytes(status).decode('utf-8')}\n\n"
+            if last_state in TERMINAL_STATES:
+                return
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            return
+        if status_changes.wait(identifier, version, min(app.config['ASYNC_HEARTBEAT_SECONDS'], remaining)) == version:
+            yield ': keep-alive\n\n'
+
+def build_pix_data(pix_request, utm_tracking):
+    """Monta o payload da Duckfy a partir de uma requisição já validada"""
+    pix_data = {
+        'identifier': pix_request.identifier if pix_request.identifier is not None else generate_unique_identifier(),
+        'amount': pix_request.amount,
+        'client': pix_request.client.to_payload()
+    }
+    
+    # Campos opcionais
+    pix_data.update(pix_request.fields)
     
-    except requests.RequestException as e:
-        logging.error(f"Connection error with Duckfy API: {str(e)}")
-        raise DuckfyAPIError(f"Erro de conexão com a gateway: {str(e)}")
+    # As confirmações de pagamento sempre voltam para o webhook desta API
+    if WEBHOOK_CALLBACK_URL:
+        pix_data['callbackUrl'] = WEBHOOK_CALLBACK_URL
+    
+    # Combinar metadata existente com tracking UTM
+    pix_data['metadata'] = {
+        **(pix_request.metadata or {}),
+        'tracking': utm_tracking
+    }
+    
+    # Se não foi fornecida uma data de vencimento, usar 1 dia a partir de hoje
+    if 'dueDate' not in pix_data:
+        pix_data['dueDate'] = default_due_date()
+    
+    return pix_data
+
+_due_date_cache = (None, None)
+
+def default_due_date():
+    """Vencimento padrão (amanhã), recalculado só quando o dia muda (como CatalogProduct.due_date)"""
+    global _due_date_cache
+    today = datetime.now().date()
+    cached_day, cached_value = _due_date_cache
+    if cached_day != today:
+        cached_value = (today + timedelta(days=1)).strftime('%Y-%m-%d')
+        _due_date_cache = (today, cached_value)
+    return cached_value
+
+def build_tracking_summary(utm_tracking):
+    """Resumo do tracking UTM incluído nas respostas de criação"""
+    return {
+        'utm_captured': True,
+        'parameters': list(utm_tracking.keys()),
+        'campaign': utm_tracking.get('utm_campaign', 'unknown'),
+        'source': utm_tracking.get('utm_source', 'unknown')
+    }
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint para verificar se a API está funcionando"""
-    return jsonify({
+    health = {
         'status': 'OK',
         'message': 'API PIX Duckfy funcionando',
         'timestamp': datetime.now().isoformat()
-    })
+    }
+    if app.config['BREAKER_ENABLED']:
+        health['circuit_breaker'] = get_circuit_breaker(app.config).snapshot()
+    health['credentials'] = get_duckfy_pool().snapshot()
+    if app.config['ADMISSION_ENABLED']:
+        health['admission'] = admission.snapshot()
+    if app.config['ASYNC_ENABLED']:
+        health['async_jobs'] = job_executor.snapshot()
+    health['upstream'] = {
+        'p99_seconds': latency_tracker.p99,
+        'read_timeout_seconds': latency_tracker.read_timeout()
+    }
+    return jsonify(health)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métricas no formato Prometheus (agregadas entre os workers)"""
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
 
 @app.route('/pix/create', methods=['POST'])
 def create_pix():
@@ -133,7 +945,7 @@ def create_pix():
             "name": "João da Silva",
             "email": "joao@example.com",
             "phone": "(11) 99999-9999",
-            "cpf": "123.456.789-00"
+            "cpf": "123.456.789-09"
         },
         "products": [
             {
@@ -152,7 +964,8 @@ def create_pix():
     }
     """
     try:
-        data = request.get_json()
+        with metrics.stage('parse'):
+            data = request.get_json()
         
         if not data:
             return jsonify({
@@ -160,48 +973,32 @@ def create_pix():
                 'status': 'error'
             }), 400
         
-        # Validar dados
-        validate_pix_request(data)
+        # Validar dados (uma passada: cliente, CPF/CNPJ, valor, UTM)
+        with metrics.stage('validation'):
+            pix_request = pix_request_validator.parse(data)
         
         # Processar parâmetros UTM do Facebook Ads
-        utm_tracking = process_utm_parameters(data)
+        with metrics.stage('utm'):
+            utm_tracking = process_utm_parameters(pix_request.utm)
         
         # Preparar dados para a Duckfy
-        pix_data = {
-            'identifier': data.get('identifier', generate_unique_identifier()),
-            'amount': data['amount'],
-            'client': data['client']
-        }
+        with metrics.stage('payload'):
+            pix_data = build_pix_data(pix_request, utm_tracking)
         
-        # Campos opcionais
-        optional_fields = ['shippingFee', 'extraFee', 'discount', 'products', 'splits', 'dueDate', 'callbackUrl']
-        for field in optional_fields:
-            if field in data:
-                pix_data[field] = data[field]
+        reuse_scope = f"amount:{pix_request.amount}" if app.config['CHARGE_REUSE_CUSTOM_AMOUNT'] else None
+        qr_base_url = lean_response_base_url()
         
-        # Combinar metadata existente com tracking UTM
-        existing_metadata = data.get('metadata', {})
-        if isinstance(existing_metadata, str):
-            try:
-                existing_metadata = json.loads(existing_metadata)
-            except:
-                existing_metadata = {'original_metadata': existing_metadata}
-        
-        # Criar metadata final com tracking
-        final_metadata = {
-            **existing_metadata,
-            'tracking': utm_tracking
-        }
-        
-        pix_data['metadata'] = final_metadata
+        # Prefer: respond-async: 202 com a URL de status, a Duckfy é chamada em background
+        if prefers_async():
+            accepted = accept_pix_async('/pix/create', data, pix_data, reuse_scope, qr_base_url)
+            if accepted is not None:
+                return accepted
         
-        # Se não foi fornecida uma data de vencimento, usar 1 dia a partir de hoje
-        if 'dueDate' not in pix_data:
-            tomorrow = datetime.now() + timedelta(days=1)
-            pix_data['dueDate'] = tomorrow.strftime('%Y-%m-%d')
+        # Fazer requisição para a Duckfy (ou reaproveitar a cobrança pendente do mesmo valor)
+        result, replayed, reused = create_pix_payment_reusable('/pix/create', data, pix_data, reuse_scope)
         
-        # Fazer requisição para a Duckfy
-        result = create_pix_payment(pix_data)
+        if qr_base_url:
+            result = lean_pix_result(result, pix_data, qr_base_url)
         
         # Preparar resposta com informações de tracking
         response_data = {
@@ -212,14 +1009,9 @@ def create_pix():
         
         # Adicionar informações de tracking se capturado
         if utm_tracking:
-            response_data['tracking'] = {
-                'utm_captured': True,
-                'parameters': list(utm_tracking.keys()),
-                'campaign': utm_tracking.get('utm_campaign', 'unknown'),
-                'source': utm_tracking.get('utm_source', 'unknown')
-            }
+            response_data['tracking'] = build_tracking_summary(utm_tracking)
         
-        return jsonify(response_data), 201
+        return idempotent_response(response_data, replayed, reused)
     
     except ValueError as e:
         return jsonify({
@@ -227,13 +1019,14 @@ def create_pix():
             'message': str(e)
         }), 400
     
-    except DuckfyAPIError as e:
+    except IdempotencyConflict as e:
         return jsonify({
             'status': 'error',
-            'message': e.message,
-            'errorCode': e.error_code,
-            'details': e.details
-        }), e.status_code or 500
+            'message': str(e)
+        }), 409
+    
+    except DuckfyAPIError as e:
+        return duckfy_error_response(e)
     
     except Exception as e:
         return jsonify({
@@ -252,7 +1045,7 @@ def create_pix_taxa_sedex():
             "name": "João da Silva",
             "email": "joao@example.com",
             "phone": "(11) 99999-9999",
-            "cpf": "123.456.789-00"
+            "cpf": "123.456.789-09"
         },
         "utm_source": "FB",
         "utm_campaign": "Campanha Black Friday|123456789",
@@ -261,8 +1054,26 @@ def create_pix_taxa_sedex():
         "utm_term": "feed"
     }
     """
+    return create_pix_product('taxa-sedex')
+
+@app.route('/pix/create/<sku>', methods=['POST'])
+def create_pix_product(sku):
+    """
+    Endpoint genérico para produtos de preço fixo do catálogo (catalog.json)
+    
+    Mesmo body de /pix/create/taxa-sedex: dados do cliente + parâmetros UTM.
+    Valor, produto e metadata vêm do catálogo.
+    """
     try:
-        data = request.get_json()
+        product = catalog.get(sku)
+        if product is None:
+            return jsonify({
+                'status': 'error',
+                'message': f"Produto '{sku}' não encontrado no catálogo"
+            }), 404
+        
+        with metrics.stage('parse'):
+            data = request.get_json()
         
         if not data:
             return jsonify({
@@ -270,97 +1081,433 @@ def create_pix_taxa_sedex():
                 'status': 'error'
             }), 400
         
-        # Validar apenas dados do cliente
-        if 'client' not in data or not isinstance(data['client'], dict):
+        # Validar apenas dados do cliente e UTM
+        with metrics.stage('validation'):
+            product_request = product_request_validator.parse(data)
+        
+        # Processar parâmetros UTM
+        with metrics.stage('utm'):
+            utm_tracking = process_utm_parameters(product_request.utm)
+        
+        # Payload pré-montado do produto; só entram cliente, UTM e identifier
+        with metrics.stage('payload'):
+            pix_data = product.build_pix_data(
+                generate_unique_identifier(), product_request.client.to_payload(), utm_tracking
+            )
+            if WEBHOOK_CALLBACK_URL:
+                pix_data['callbackUrl'] = WEBHOOK_CALLBACK_URL
+        
+        if utm_tracking:
+            logging.debug(f"{product.name} PIX created with UTM: {utm_tracking.get('utm_campaign', 'unknown')}")
+        
+        reuse_scope = f"sku:{product.sku}:{product.price}"
+        qr_base_url = lean_response_base_url()
+        
+        # Prefer: respond-async: 202 com a URL de status, a Duckfy é chamada em background
+        if prefers_async():
+            accepted = accept_pix_async(f'/pix/create/{sku}', data, pix_data, reuse_scope, qr_base_url)
+            if accepted is not None:
+                return accepted
+        
+        # Fazer requisição para a Duckfy (ou reaproveitar a cobrança pendente do mesmo produto)
+        result, replayed, reused = create_pix_payment_reusable(f'/pix/create/{sku}', data, pix_data, reuse_scope)
+        
+        if qr_base_url:
+            result = lean_pix_result(result, pix_data, qr_base_url)
+        
+        response_data = product.build_response(result)
+        
+        # Adicionar informações de tracking se capturado
+        if utm_tracking:
+            response_data['tracking'] = build_tracking_summary(utm_tracking)
+        
+        return idempotent_response(response_data, replayed, reused)
+    
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    except IdempotencyConflict as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 409
+    
+    except DuckfyAPIError as e:
+        return duckfy_error_response(e)
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Erro interno do servidor: {str(e)}'
+        }), 500
+
+def create_batch_item(index, data, utm_tracking, pix_data, deadline, qr_base_url=None):
+    """
+    Cria um item do lote, convertendo erros em um resultado por item. O lote
+    já ocupa uma vaga da admissão para cada thread que cria os itens.
+    """
+    try:
+        identifier = data.get('identifier')
+        if identifier:
+            fingerprint = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+            result, _ = idempotency_cache.execute(
+                f"/pix/create/batch:{str(identifier)[:255]}",
+                fingerprint,
+                lambda: create_pix_payment(pix_data, deadline, admit=False)
+            )
+        else:
+            result = create_pix_payment(pix_data, deadline, admit=False)
+        
+        if qr_base_url:
+            result = lean_pix_result(result, pix_data, qr_base_url)
+        
+        item = {
+            'index': index,
+            'status': 'success',
+            'identifier': pix_data['identifier'],
+            'data': result
+        }
+        if utm_tracking:
+            item['tracking'] = build_tracking_summary(utm_tracking)
+        return item
+    
+    except DuckfyAPIError as e:
+        return {
+            'index': index,
+            'status': 'error',
+            'identifier': pix_data['identifier'],
+            'message': e.message,
+            'errorCode': e.error_code,
+            'details': e.details,
+            'statusCode': e.status_code or 500
+        }
+    
+    except Exception as e:
+        return {
+            'index': index,
+            'status': 'error',
+            'identifier': pix_data['identifier'],
+            'message': f'Erro interno do servidor: {str(e)}',
+            'statusCode': 500
+        }
+
+@app.route('/pix/create/batch', methods=['POST'])
+def create_pix_batch():
+    """
+    Endpoint para criar vários pagamentos PIX em uma única requisição
+    
+    Body esperado: uma lista de objetos no mesmo formato de /pix/create,
+    ou {"items": [...]}. Todos os itens são validados antes de qualquer
+    chamada à Duckfy; as chamadas são feitas em paralelo, limitadas por
+    BATCH_CONCURRENCY, e os resultados voltam na ordem enviada. O lote
+    inteiro ocupa uma única vaga do controle de admissão: sem vaga, nenhum
+    item é criado e a resposta é 503.
+    """
+    try:
+        with metrics.stage('parse'):
+            data = request.get_json()
+        items = data.get('items') if isinstance(data, dict) else data
+        
+        if not isinstance(items, list) or not items:
             return jsonify({
                 'status': 'error',
-                'message': 'Campo "client" é obrigatório e deve ser um objeto'
+                'message': 'Envie uma lista de PIX (ou {"items": [...]}) com ao menos um item'
             }), 400
         
-        required_client_fields = ['name', 'email', 'cpf']
-        missing_client_fields = [field for field in required_client_fields if field not in data['client']]
-        
-        if missing_client_fields:
+        max_items = app.config['BATCH_MAX_ITEMS']
+        if len(items) > max_items:
             return jsonify({
                 'status': 'error',
-                'message': f"Campos obrigatórios do cliente ausentes: {', '.join(missing_client_fields)}"
+                'message': f'Lote excede o limite de {max_items} itens'
             }), 400
         
-        # Processar parâmetros UTM
-        utm_tracking = process_utm_parameters(data)
-        
-        # Dados fixos do produto Taxa Sedex
-        produto_taxa_sedex = {
-            "id": "Z29J23C",
-            "name": "Taxa Sedex",
-            "quantity": 1,
-            "price": 28.97
-        }
+        # Validar todos os itens antes de chamar a Duckfy
+        errors = []
+        pix_requests = []
+        for index, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError("Item deve ser um objeto")
+                with metrics.stage('validation'):
+                    pix_requests.append(pix_request_validator.parse(item))
+            except ValueError as e:
+                errors.append({'index': index, 'message': str(e)})
         
-        # Preparar dados completos para a Duckfy
-        pix_data = {
-            'identifier': f"SEDEX_{generate_unique_identifier()}",
-            'amount': 28.97,
-            'client': data['client'],
-            'products': [produto_taxa_sedex],
-            'metadata': {
-                'product_type': 'taxa_sedex',
-                'product_code': 'Z29J23C',
-                'auto_generated': True,
-                'api_endpoint': '/pix/create/taxa-sedex',
-                'tracking': utm_tracking
-            }
-        }
+        if errors:
+            return jsonify({
+                'status': 'error',
+                'message': 'Itens inválidos no lote; nenhum PIX foi criado',
+                'errors': errors
+            }), 400
         
-        # Adicionar data de vencimento (1 dia)
-        tomorrow = datetime.now() + timedelta(days=1)
-        pix_data['dueDate'] = tomorrow.strftime('%Y-%m-%d')
+        qr_base_url = lean_response_base_url()
+        prepared = []
+        for index, (item, pix_request) in enumerate(zip(items, pix_requests)):
+            with metrics.stage('utm'):
+                utm_tracking = process_utm_parameters(pix_request.utm)
+            prepared.append((index, item, utm_tracking, build_pix_data(pix_request, utm_tracking), g.deadline,
+                             qr_base_url))
         
-        # Log específico para Taxa Sedex
-        if utm_tracking:
-            logging.info(f"Taxa Sedex PIX created with UTM: {utm_tracking.get('utm_campaign', 'unknown')}")
+        # Fan-out com uma vaga da admissão por chamada simultânea; map preserva a ordem dos itens
+        workers = min(app.config['BATCH_CONCURRENCY'], len(prepared))
+        with admission_slot(request_priority(), g.deadline, count=workers) as slots:
+            with ThreadPoolExecutor(max_workers=slots) as executor:
+                results = list(executor.map(lambda args: create_batch_item(*args), prepared))
         
-        # Fazer requisição para a Duckfy
-        result = create_pix_payment(pix_data)
+        succeeded = sum(1 for r in results if r['status'] == 'success')
+        failed = len(results) - succeeded
         
-        # Preparar resposta específica
         response_data = {
-            'status': 'success',
-            'message': 'PIX Taxa Sedex criado com sucesso',
-            'product': {
-                'name': 'Taxa Sedex',
-                'code': 'Z29J23C',
-                'price': 28.97
+            'status': 'success' if failed == 0 else ('partial' if succeeded else 'error'),
+            'message': f'{succeeded} de {len(results)} PIX criados com sucesso',
+            'summary': {
+                'total': len(results),
+                'succeeded': succeeded,
+                'failed': failed
             },
-            'data': result
+            'results': results
         }
         
-        # Adicionar informações de tracking se capturado
-        if utm_tracking:
-            response_data['tracking'] = {
-                'utm_captured': True,
-                'parameters': list(utm_tracking.keys()),
-                'campaign': utm_tracking.get('utm_campaign', 'unknown'),
-                'source': utm_tracking.get('utm_source', 'unknown')
-            }
-        
-        return jsonify(response_data), 201
+        return jsonify(response_data), 201 if failed == 0 else 207
     
-    except DuckfyAPIError as e:
+    except AdmissionRejected as e:
+        return duckfy_error_response(e)
+    
+    except Exception as e:
         return jsonify({
             'status': 'error',
-            'message': e.message,
-            'errorCode': e.error_code,
-            'details': e.details
-        }), e.status_code or 500
+            'message': f'Erro interno do servidor: {str(e)}'
+        }), 500
+
+@app.route('/pix/webhook', methods=['POST'])
+def pix_webhook():
+    """
+    Recebe confirmações de pagamento da Duckfy (callbackUrl)
+    
+    O payload é validado, gravado na fila durável e a resposta sai
+    imediatamente; o processamento acontece em lotes em background.
+    O WEBHOOK_TOKEN deve vir no header X-Webhook-Token ou no parâmetro
+    ?token= da URL (o callbackUrl enviado à Duckfy já o inclui). Sem
+    WEBHOOK_TOKEN configurado, todo webhook é recusado: o evento marca
+    transações como pagas e dispara o Purchase.
+    """
+    expected_token = app.config['WEBHOOK_TOKEN']
+    if not expected_token:
+        return jsonify({
+            'status': 'error',
+            'message': 'Webhook não configurado (defina WEBHOOK_TOKEN)'
+        }), 503
     
+    received_token = request.headers.get('X-Webhook-Token') or request.args.get('token', '')
+    if not hmac.compare_digest(received_token.encode(), expected_token.encode()):
+        return jsonify({
+            'status': 'error',
+            'message': 'Token do webhook inválido'
+        }), 401
+    
+    try:
+        event = parse_webhook_payload(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    try:
+        event_id = webhook_queue.enqueue(event)
     except Exception as e:
+        logging.error(f"Failed to enqueue webhook: {str(e)}")
         return jsonify({
             'status': 'error',
-            'message': f'Erro interno do servidor: {str(e)}'
+            'message': 'Não foi possível registrar o webhook'
         }), 500
+    
+    webhook_processor.start()
+    webhook_processor.notify()
+    
+    return jsonify({
+        'status': 'received',
+        'eventId': event_id
+    }), 200
+
+@app.route('/pix/<identifier>', methods=['GET'])
+def get_pix_status(identifier):
+    """
+    Consulta o status de um PIX pelo identifier (ou transactionId)
+    
+    Servido do cache em memória do worker, com fallback para o banco local;
+    não consulta a Duckfy.
+    """
+    record = transaction_cache.get(identifier[:100])
+    if record is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Transação não encontrada'
+        }), 404
+    
+    response = jsonify({
+        'status': 'success',
+        'data': {
+            'identifier': record['identifier'],
+            'transactionId': record['transaction_id'],
+            'status': record['status'],
+            'amount': record['amount'],
+            'dueDate': record['due_date'],
+            'createdAt': datetime.fromtimestamp(record['created_at']).isoformat(),
+            'updatedAt': datetime.fromtimestamp(record['updated_at']).isoformat(),
+            'tracking': record['utm']
+        }
+    })
+    response.headers['Cache-Control'] = f"private, max-age={int(app.config['TRANSACTION_CACHE_TTL'])}"
+    return response
+
+@app.route('/pix/<identifier>/status', methods=['GET'])
+def get_pix_state(identifier):
+    """
+    Estado de um PIX (criado com Prefer: respond-async ou não): pending,
+    created (com o resultado da Duckfy, na criação assíncrona), paid,
+    closed ou failed (com o erro).
+    
+    Long-poll: com ?wait=<segundos>&state=<estado conhecido>, a resposta só
+    sai quando o estado mudar ou o tempo acabar (até ASYNC_MAX_WAIT_SECONDS).
+    """
+    identifier = identifier[:100]
+    try:
+        wait = min(float(request.args.get('wait') or 0), app.config['ASYNC_MAX_WAIT_SECONDS'])
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Parâmetro wait deve ser um número de segundos'
+        }), 400
+    
+    known_state = request.args.get('state')
+    if wait > 0 and known_state:
+        status = wait_for_pix_status(identifier, known_state, wait)
+    else:
+        status = load_pix_status(identifier)
+    
+    if status is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Transação não encontrada'
+        }), 404
+    
+    response = jsonify({'status': 'success', 'data': status})
+    response.headers['Cache-Control'] = 'no-store'
+    if status['state'] == 'pending':
+        response.headers['Retry-After'] = '1'
+    return response
+
+@app.route('/pix/<identifier>/events', methods=['GET'])
+def get_pix_events(identifier):
+    """
+    Server-Sent Events com o estado do PIX: um evento quando o código é
+    criado (com o resultado da Duckfy) e outro quando o pagamento é
+    confirmado. Reconexões com Last-Event-ID só recebem o que mudou; depois
+    do estado final, a reconexão recebe 204 e o EventSource para.
+    """
+    identifier = identifier[:100]
+    status = load_pix_status(identifier)
+    if status is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Transação não encontrada'
+        }), 404
+    
+    last_state = request.headers.get('Last-Event-ID')
+    if last_state == status['state'] and last_state in TERMINAL_STATES:
+        return Response(status=204)
+    
+    response = Response(
+        stream_with_context(pix_status_events(identifier, last_state, app.config['ASYNC_STREAM_MAX_SECONDS'])),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/pix/<identifier>/qr.png', methods=['GET'])
+def get_pix_qr_image(identifier):
+    """
+    PNG do QR Code de um PIX criado com a resposta lean, pelo transactionId
+    (ou identifier). A imagem de uma cobrança nunca muda: cache longo com ETag.
+    """
+    entry = qr_images.get(identifier[:100])
+    if entry is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'QR Code não encontrado'
+        }), 404
+    
+    png, etag = entry
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(png, mimetype='image/png')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"public, max-age={app.config['QR_IMAGE_MAX_AGE']}, immutable"
+    return response
+
+@app.route('/analytics/utm', methods=['GET'])
+def utm_analytics():
+    """
+    Totais por campanha, conjunto de anúncios, anúncio e posicionamento
+    
+    Lê os agregados por bucket (utm_rollups), sem percorrer as transações.
+    Query string: window (ex.: 1h, 24h, 7d; padrão 24h), dimension
+    (campaign, adset, ad ou placement; padrão todas) e limit (padrão 50).
+    Exige ANALYTICS_TOKEN no header X-Analytics-Token; sem ANALYTICS_TOKEN
+    definido a rota fica desativada (503).
+    """
+    expected_token = app.config['ANALYTICS_TOKEN']
+    if not expected_token:
+        return jsonify({
+            'status': 'error',
+            'message': 'Analytics não configurado (defina ANALYTICS_TOKEN)'
+        }), 503
+    
+    received_token = request.headers.get('X-Analytics-Token', '')
+    if not hmac.compare_digest(received_token.encode(), expected_token.encode()):
+        return jsonify({
+            'status': 'error',
+            'message': 'Token de analytics inválido'
+        }), 401
+    
+    try:
+        window = parse_window(request.args.get('window'), maximum=app.config['UTM_RETENTION_DAYS'] * 86400)
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Parâmetros window/limit inválidos (ex.: window=24h&limit=50)'
+        }), 400
+    
+    dimension = request.args.get('dimension')
+    if dimension and dimension not in DIMENSION_NAMES:
+        return jsonify({
+            'status': 'error',
+            'message': f"Dimensão inválida; use uma de: {', '.join(DIMENSION_NAMES)}"
+        }), 400
+    dimensions = (dimension,) if dimension else DIMENSION_NAMES
+    
+    # Início alinhado ao bucket: a mesma consulta é reaproveitada pelo cache
+    since = utm_aggregator.bucket_start(time.time() - window)
+    rollups = utm_rollup_cache.get((since, dimensions, limit))
+    
+    return jsonify({
+        'status': 'success',
+        'window_seconds': window,
+        'since': datetime.fromtimestamp(since).isoformat(),
+        'bucket_seconds': utm_aggregator.bucket_seconds,
+        'flush_interval_seconds': utm_aggregator.flush_interval,
+        'data': rollups
+    })
 
 @app.route('/pix/example', methods=['GET'])
+@precomputed_json
 def pix_example():
     """Endpoint que retorna um exemplo de como usar a API"""
     example = {
@@ -376,7 +1523,7 @@ def pix_example():
                     "name": "João da Silva",
                     "email": "joao@example.com",
                     "phone": "(11) 99999-9999",
-                    "cpf": "123.456.789-00"
+                    "cpf": "123.456.789-09"
                 },
                 "products": [
                     {
@@ -411,9 +1558,10 @@ def pix_example():
         }
     }
     
-    return jsonify(example)
+    return example
 
 @app.route('/pix/example/utm', methods=['GET'])
+@precomputed_json
 def pix_utm_example():
     """Endpoint que retorna exemplos específicos para tracking UTM do Facebook Ads"""
     example = {
@@ -529,9 +1677,10 @@ async function createPixWithTracking(clientData, productData, amount) {
         ]
     }
     
-    return jsonify(example)
+    return example
 
 @app.route('/pix/example/taxa-sedex', methods=['GET'])
+@precomputed_json
 def pix_taxa_sedex_example():
     """Endpoint que retorna exemplo específico para o produto Taxa Sedex"""
     example = {
@@ -556,7 +1705,7 @@ def pix_taxa_sedex_example():
                     "name": "Maria Silva",
                     "email": "maria@email.com", 
                     "phone": "(11) 99999-8888",
-                    "cpf": "12345678901"
+                    "cpf": "12345678909"
                 },
                 "utm_source": "FB",
                 "utm_campaign": "Taxa Sedex Promo|123456789",
@@ -667,7 +1816,7 @@ document.getElementById('checkout-sedex').addEventListener('submit', async (e) =
         ]
     }
     
-    return jsonify(example)
+    return example
 
 @app.errorhandler(404)
 def not_found(error):
@@ -676,8 +1825,17 @@ def not_found(error):
         'message': 'Endpoint não encontrado',
         'available_endpoints': [
             'GET /health - Verificar status da API',
+            'GET /metrics - Métricas no formato Prometheus',
             'POST /pix/create - Criar pagamento PIX (com suporte a UTM)',
             'POST /pix/create/taxa-sedex - Criar PIX Taxa Sedex (R$ 28,97)',
+            'POST /pix/create/<sku> - Criar PIX de um produto do catálogo',
+            'POST /pix/create/batch - Criar vários PIX em paralelo',
+            'GET /analytics/utm - Totais por campanha/conjunto/anúncio/posicionamento',
+            'POST /pix/webhook - Receber confirmações de pagamento',
+            'GET /pix/<identifier> - Consultar status de um PIX',
+            'GET /pix/<identifier>/status - Estado do PIX (long-poll com ?wait=)',
+            'GET /pix/<identifier>/events - Estado do PIX via Server-Sent Events',
+            'GET /pix/<identifier>/qr.png - Imagem do QR Code (resposta lean)',
             'GET /pix/example - Ver exemplo básico de uso',
             'GET /pix/example/utm - Ver exemplos com tracking UTM',
             'GET /pix/example/taxa-sedex - Ver exemplo Taxa Sedex'
@@ -691,16 +1849,13 @@ def internal_error(error):
         'message': 'Erro interno do servidor'
     }), 500
 
-def process_utm_parameters(data):
-    """Processa parâmetros UTM específicos do Facebook Ads"""
-    utm_data = {}
-    
-    # Parâmetros UTM específicos que vamos capturar
-    utm_params = ['utm_source', 'utm_campaign', 'utm_medium', 'utm_content', 'utm_term']
+def process_utm_parameters(utm_params):
+    """
+    Processa parâmetros UTM específicos do Facebook Ads
     
-    for param in utm_params:
-        if param in data and data[param]:
-            utm_data[param] = str(data[param])[:200]  # Limitar tamanho
+    Recebe os utm_* já extraídos e truncados pelo validador (PixRequest.utm).
+    """
+    utm_data = dict(utm_params)
     
     # Adicionar timestamp de conversão se há dados UTM
     if utm_data:
@@ -711,6 +1866,7 @@ def process_utm_parameters(data):
 
 if __name__ == '__main__':
     print("🚀 Iniciando API PIX Duckfy...")
-    print(f"📋 Chaves configuradas: PUBLIC_KEY={PUBLIC_KEY[:10]}...")
+    print(f"📋 {len(DUCKFY_CREDENTIALS)} credencial(is) da Duckfy configurada(s)")
     print("📖 Acesse /pix/example para ver como usar a API")
+    start_background_workers()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
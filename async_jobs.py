@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import zlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from shared_state import SharedRecords
+
+# Estados de um PIX vistos por /pix/<id>/status e /pix/<id>/events:
+# pending -> created -> paid | closed, ou pending -> failed
+TERMINAL_STATES = frozenset({'paid', 'closed', 'failed'})
+
+
+class PixJobStore:
+    """
+    Criações de PIX aceitas com Prefer: respond-async (SQLite, tabela
+    pix_jobs, compartilhada entre os workers).
+
+    Cada job nasce 'pending' e termina 'created' (com o resultado da Duckfy)
+    ou 'failed' (com o erro). request_key (rota + Idempotency-Key ou
+    identifier do cliente) faz o reenvio da mesma requisição devolver o
+    mesmo job em vez de criar outro PIX.
+    """
+
+    COLUMNS = ('identifier', 'route', 'request_key', 'fingerprint', 'state',
+               'result', 'error', 'created_at', 'updated_at')
+
+    def __init__(self, db, retention_days=2):
+        self.db = db
+        self.retention_seconds = retention_days * 86400
+        self._last_prune = 0.0
+        self._create_schema()
+
+    def _create_schema(self):
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS pix_jobs (
+                identifier TEXT PRIMARY KEY,
+                route TEXT NOT NULL,
+                request_key TEXT UNIQUE,
+                fingerprint TEXT,
+                state TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+
+    def create(self, identifier, route, request_key=None, fingerprint=None):
+        """
+        Registra um job 'pending'. Retorna (job, criado); se já existe um job
+        com o mesmo identifier ou request_key, retorna esse job e False.
+        """
+        now = time.time()
+        cursor = self.db.execute(
+            'INSERT OR IGNORE INTO pix_jobs (identifier, route, request_key, fingerprint, state, created_at, updated_at) '
+            "VALUES (?, ?, ?, ?, 'pending', ?, ?)",
+            (identifier, route, request_key, fingerprint, now, now)
+        )
+        if now - self._last_prune > 3600:
+            self._last_prune = now
+            self.db.execute('DELETE FROM pix_jobs WHERE updated_at < ?', (now - self.retention_seconds,))
+        if cursor.rowcount:
+            return self._row_to_job((identifier, route, request_key, fingerprint, 'pending', None, None, now, now)), True
+
+        existing = self.find(request_key) if request_key else None
+        return existing or self.get(identifier), False
+
+    def retry(self, job):
+        """Volta um job que falhou para 'pending'; False se outra requisição já o reiniciou"""
+        cursor = self.db.execute(
+            "UPDATE pix_jobs SET state = 'pending', error = NULL, updated_at = ? "
+            'WHERE identifier = ? AND updated_at = ?',
+            (time.time(), job['identifier'], job['updated_at'])
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, identifier, result):
+        self.db.execute(
+            "UPDATE pix_jobs SET state = 'created', result = ?, updated_at = ? WHERE identifier = ?",
+            (json.dumps(result, ensure_ascii=False), time.time(), identifier)
+        )
+
+    def fail(self, identifier, error):
+        self.db.execute(
+            "UPDATE pix_jobs SET state = 'failed', error = ?, updated_at = ? WHERE identifier = ?",
+            (json.dumps(error, ensure_ascii=False), time.time(), identifier)
+        )
+
+    def discard(self, identifier):
+        """Remove um job que não chegou a ser agendado"""
+        self.db.execute("DELETE FROM pix_jobs WHERE identifier = ? AND state = 'pending'", (identifier,))
+
+    def get(self, identifier):
+        row = self.db.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM pix_jobs WHERE identifier = ?", (identifier,)
+        ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def find(self, request_key):
+        row = self.db.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM pix_jobs WHERE request_key = ?", (request_key,)
+        ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def _row_to_job(self, row):
+        job = dict(zip(self.COLUMNS, row))
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['error'] = json.loads(job['error']) if job['error'] else None
+        return job
+
+
+class StatusChanges:
+    """
+    Aviso de que o status de um PIX mudou, entre threads e entre workers.
+
+    Cada identifier cai em um dos slots de contadores em SharedRecords; quem
+    muda um status (job concluído, webhook aplicado) incrementa o contador,
+    e quem espera (long-poll e SSE) só relê o banco quando o contador do seu
+    slot muda. No mesmo worker a espera acorda na hora; vindo de outro
+    worker, em até poll_interval.
+    """
+
+    def __init__(self, slots=4096, directory=None, poll_interval=0.25):
+        self.slots = slots
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._records = None
+        self._records_pid = None
+        self._records_lock = threading.Lock()
+        self._condition = threading.Condition()
+
+    def _storage(self):
+        # Aberto no próprio worker (flock por descritor, ver SharedRecords)
+        pid = os.getpid()
+        if self._records is None or self._records_pid != pid:
+            # Long-poll, SSE e webhooks podem chegar juntos no primeiro uso: só um abre o arquivo
+            with self._records_lock:
+                if self._records is None or self._records_pid != pid:
+                    self._records = SharedRecords('pix_status_changes.v1', '<Q', slots=self.slots,
+                                                  directory=self.directory)
+                    self._records_pid = pid
+        return self._records
+
+    def _slot(self, identifier):
+        return zlib.crc32(str(identifier).encode('utf-8')) % self.slots
+
+    def version(self, identifier):
+        return self._storage().read(self._slot(identifier))[0]
+
+    def notify(self, *identifiers):
+        storage = self._storage()
+        slots = {self._slot(identifier) for identifier in identifiers if identifier}
+        with storage.locked():
+            for slot in slots:
+                storage.write(((storage.read(slot)[0] + 1) % 2 ** 64,), slot)
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait(self, identifier, version, timeout):
+        """Espera o contador do identifier sair de version (ou o timeout); retorna o valor atual"""
+        end = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                current = self.version(identifier)
+                remaining = end - time.monotonic()
+                if current != version or remaining <= 0:
+                    return current
+                self._condition.wait(min(self.poll_interval, remaining))
+
+
+class JobExecutor:
+    """
+    Threads do worker que fazem as chamadas à Duckfy dos jobs assíncronos.
+
+    No máximo max_pending jobs (em andamento + na fila) por worker; acima
+    disso submit() recusa e a rota responde 503. O executor é criado no
+    próprio worker (threads não sobrevivem ao fork do --preload).
+    """
+
+    def __init__(self, workers=10, max_pending=100):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        """Agenda func(*args); False se o worker já tem max_pending jobs"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                return False
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='pix-job')
+                self._executor_pid = os.getpid()
+                self.pending = 0
+            self.pending += 1
+            future = self._executor.submit(func, *args)
+        future.add_done_callback(self._done)
+        return True
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    def snapshot(self):
+        """Ocupação atual (usado em /health)"""
+        return {'pending': self.pending, 'max_pending': self.max_pending, 'workers': self.workers}
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Mede o custo de um boot frio da API: tempo de import do app e, para cada
+modo de inicialização do gunicorn, o tempo até o worker responder e até o
+primeiro PIX criado com sucesso.
+
+O stub da Duckfy fala HTTPS (certificado autoassinado gerado com o
+openssl) e atrasa cada handshake TLS (--connect-latency), simulando o DNS +
+TLS da gateway real; sem aquecimento, esse custo cai no primeiro PIX de
+cada worker.
+
+    python bench/cold_start.py
+    python bench/cold_start.py --connect-latency 0.3 --runs 5 --json cold_start.json
+
+Modos:
+    cold      WARMUP_ENABLED=false
+    warm      WARMUP_ENABLED=true (padrão de produção)
+    preload   WARMUP_ENABLED=true + GUNICORN_PRELOAD=true
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+import duckfy_stub  # noqa: E402
+from run_benchmark import PAYLOADS, free_port  # noqa: E402
+
+MODES = {
+    'cold': {'WARMUP_ENABLED': 'false'},
+    'warm': {'WARMUP_ENABLED': 'true'},
+    'preload': {'WARMUP_ENABLED': 'true', 'GUNICORN_PRELOAD': 'true'}
+}
+
+ROUTE = '/pix/create/taxa-sedex'
+
+
+def start_tls_stub(workdir, latency, connect_latency):
+    """Stub HTTPS com certificado autoassinado para 127.0.0.1; retorna (server, url, cert)"""
+    cert, key = os.path.join(workdir, 'stub-cert.pem'), os.path.join(workdir, 'stub-key.pem')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-keyout', key, '-out', cert, '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1'
+    ], check=True, capture_output=True)
+    duckfy_stub.configure(latency=latency, connect_latency=connect_latency)
+    port = free_port()
+    server = duckfy_stub.make_server(port=port, tls_cert=cert, tls_key=key)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"https://127.0.0.1:{port}/api/v1", cert
+
+
+def base_env(workdir, stub_url, ca_bundle):
+    return dict(
+        os.environ,
+        REQUESTS_CA_BUNDLE=ca_bundle,
+        FLASK_ENV='production',
+        PUBLIC_KEY=os.environ.get('PUBLIC_KEY', 'bench-public-key'),
+        SECRET_KEY=os.environ.get('SECRET_KEY', 'bench-secret-key'),
+        CLIENT_HASH_SALT=os.environ.get('CLIENT_HASH_SALT', 'bench-client-hash-salt'),
+        DUCKFY_BASE_URL=stub_url,
+        DATABASE_PATH=os.path.join(workdir, 'bench.db'),
+        SHARED_STATE_DIR=workdir,
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'),
+        # O benchmark repete o mesmo CPF; limites e reaproveitamento distorceriam a medição
+        RATE_LIMIT_ENABLED='false',
+        CHARGE_REUSE_ENABLED='false'
+    )
+
+
+def measure_import(env, runs):
+    """Tempo de `import app` em processos novos (ms)"""
+    code = 'import time; t = time.perf_counter(); import app; print("import_ms", (time.perf_counter() - t) * 1000)'
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        samples.extend(float(line.split()[1]) for line in output.splitlines() if line.startswith('import_ms '))
+    return samples
+
+
+def boot(mode, env, workers, steady_requests):
+    """Sobe o gunicorn e mede ready (s), primeiro PIX (ms) e PIX seguintes (ms)"""
+    port = free_port()
+    env = dict(env, PORT=str(port), WEB_CONCURRENCY=str(workers), **MODES[mode])
+    base_url = f"http://127.0.0.1:{port}"
+    command = [
+        sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+        '--access-logfile', '/dev/null', '--log-level', 'warning', 'app:app'
+    ]
+
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn ({mode}) encerrou: {process.stderr.read().decode()[-2000:]}")
+            if time.perf_counter() - started > 30:
+                raise RuntimeError(f"gunicorn ({mode}) não respondeu a /health")
+            try:
+                if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                time.sleep(0.02)
+        ready = time.perf_counter() - started
+
+        # Sem keep-alive do lado do cliente: mede só o custo dentro da API
+        latencies = []
+        for _ in range(1 + steady_requests):
+            start = time.perf_counter()
+            response = requests.post(f"{base_url}{ROUTE}", json=PAYLOADS[ROUTE], timeout=35)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 201:
+                raise RuntimeError(f"{ROUTE} respondeu {response.status_code}: {response.text[:500]}")
+        first_pix_at = ready + latencies[0] / 1000
+        return {
+            'ready_s': ready,
+            'first_pix_ms': latencies[0],
+            'time_to_first_pix_s': first_pix_at,
+            'steady_pix_ms': statistics.median(latencies[1:]) if steady_requests else None
+        }
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de boot frio da API PIX')
+    parser.add_argument('--modes', default='cold,warm,preload', help='subconjunto de cold,warm,preload')
+    parser.add_argument('--runs', type=int, default=3, help='boots por modo (reporta a mediana)')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--connect-latency', type=float, default=0.15,
+                        help='atraso do handshake TLS do stub (DNS + TLS simulados)')
+    parser.add_argument('--stub-latency', default='fixed:0.02')
+    parser.add_argument('--steady-requests', type=int, default=5)
+    parser.add_argument('--json', help='grava os resultados neste arquivo')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='cold_start_')
+    os.makedirs(os.path.join(workdir, 'metrics'))
+    server, stub_url, cert = start_tls_stub(workdir, args.stub_latency, args.connect_latency)
+    env = base_env(workdir, stub_url, cert)
+
+    results = {'connect_latency_s': args.connect_latency}
+    imports = measure_import(env, args.runs)
+    results['import_ms'] = statistics.median(imports)
+    print(f"import app: mediana {results['import_ms']:.0f} ms ({', '.join(f'{v:.0f}' for v in imports)})\n")
+
+    print(f"{'modo':<10}{'ready (s)':>11}{'1º PIX (ms)':>13}{'até 1º PIX (s)':>16}{'PIX seguinte (ms)':>19}")
+    for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+        runs = [boot(mode, env, args.workers, args.steady_requests) for _ in range(args.runs)]
+        summary = {key: statistics.median(run[key] for run in runs) for key in runs[0] if runs[0][key] is not None}
+        results[mode] = summary
+        print(f"{mode:<10}{summary['ready_s']:>11.2f}{summary['first_pix_ms']:>13.1f}"
+              f"{summary['time_to_first_pix_s']:>16.2f}{summary.get('steady_pix_ms', 0):>19.1f}")
+
+    server.shutdown()
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Receptor local de eventos de conversão, no lugar da API da plataforma de
+anúncios, para testar a exportação server-side sem credenciais reais.
+
+Aceita POST em qualquer caminho com corpo {"data": [...]} (gzip ou não),
+conta os eventos por nome e pode falhar uma fração das requisições para
+exercitar os retries do exporter:
+
+    python bench/conversion_receiver.py --port 8090 --error-rate 0.2 --output /tmp/events.jsonl
+    CONVERSION_EXPORT_URL=http://127.0.0.1:8090/events python app.py
+
+GET /stats retorna os contadores.
+"""
+
+import sys
+import gzip
+import json
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class ReceiverConfig:
+    error_rate = 0.0
+    error_status = 503
+    retry_after = None
+    token = None
+    output = None
+    lock = threading.Lock()
+    batches = 0
+    failed = 0
+    events = Counter()
+
+
+class ConversionReceiverHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'ConversionReceiver/1.0'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/stats':
+            return self._send(404, {'message': 'Not found'})
+        with ReceiverConfig.lock:
+            self._send(200, stats())
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        if ReceiverConfig.token and self.headers.get('Authorization') != f'Bearer {ReceiverConfig.token}':
+            return self._send(401, {'message': 'Unauthorized'})
+
+        try:
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            events = json.loads(body)['data']
+        except (OSError, ValueError, KeyError, TypeError):
+            return self._send(400, {'message': 'Invalid payload'})
+
+        if random.random() < ReceiverConfig.error_rate:
+            with ReceiverConfig.lock:
+                ReceiverConfig.failed += 1
+            headers = {'Retry-After': str(ReceiverConfig.retry_after)} if ReceiverConfig.retry_after else {}
+            return self._send(ReceiverConfig.error_status, {'message': 'Receiver: erro simulado'}, headers)
+
+        with ReceiverConfig.lock:
+            ReceiverConfig.batches += 1
+            ReceiverConfig.events.update(event.get('event_name', 'unknown') for event in events)
+            if ReceiverConfig.output:
+                with open(ReceiverConfig.output, 'a', encoding='utf-8') as output:
+                    for event in events:
+                        output.write(json.dumps(event) + '\n')
+
+        self._send(200, {'events_received': len(events)})
+
+    def _send(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def stats():
+    return {
+        'batches': ReceiverConfig.batches,
+        'failed_requests': ReceiverConfig.failed,
+        'events': dict(ReceiverConfig.events),
+        'total_events': sum(ReceiverConfig.events.values())
+    }
+
+
+def configure(error_rate=0.0, error_status=503, retry_after=None, token=None, output=None):
+    ReceiverConfig.error_rate = error_rate
+    ReceiverConfig.error_status = error_status
+    ReceiverConfig.retry_after = retry_after
+    ReceiverConfig.token = token
+    ReceiverConfig.output = output
+    with ReceiverConfig.lock:
+        ReceiverConfig.batches = 0
+        ReceiverConfig.failed = 0
+        ReceiverConfig.events = Counter()
+
+
+def make_server(host='127.0.0.1', port=8090):
+    server = ThreadingHTTPServer((host, port), ConversionReceiverHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Receptor local de eventos de conversão')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fração de lotes respondidos com erro')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--retry-after', type=int, default=None, help='Retry-After (s) nas respostas de erro')
+    parser.add_argument('--token', default=None, help='exige Authorization: Bearer <token>')
+    parser.add_argument('--output', default=None, help='arquivo JSONL com os eventos recebidos')
+    args = parser.parse_args(argv)
+
+    configure(args.error_rate, args.error_status, args.retry_after, args.token, args.output)
+    server = make_server(args.host, args.port)
+    print(f"📈 Receptor de conversões em http://{args.host}:{args.port} (stats em /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Stub local da API Duckfy para testes e benchmarks offline.
+
+Implementa POST /api/v1/gateway/pix/receive com latência, taxa de erro e
+tamanho de resposta configuráveis. Para usar com a API:
+
+    python bench/duckfy_stub.py --port 8081 --latency lognormal:0.12,0.4
+    python bench/duckfy_stub.py --port 8081 --connect-latency 0.15   # custo de DNS + TLS por conexão
+    python bench/duckfy_stub.py --port 8443 --tls-cert cert.pem --tls-key key.pem --connect-latency 0.15
+    DUCKFY_BASE_URL=http://127.0.0.1:8081/api/v1 python app.py
+
+Com --key-rate-limit cada x-public-key tem um limite de requisições por
+segundo (acima dele, 429 com Retry-After), como o limite por conta da
+gateway; --reject-keys responde 401 para as chaves listadas:
+
+    python bench/duckfy_stub.py --port 8081 --key-rate-limit 20 --reject-keys chave-revogada
+
+Com --tls-cert/--tls-key o stub fala HTTPS e o --connect-latency atrasa o
+handshake TLS, bloqueando o connect() do cliente como uma gateway real
+(use REQUESTS_CA_BUNDLE=cert.pem na API). Sem TLS, o atraso acontece
+depois que a conexão TCP já foi aceita.
+
+Distribuições de latência (segundos):
+    fixed:0.1               sempre 100 ms
+    uniform:0.05,0.3        uniforme entre 50 e 300 ms
+    normal:0.15,0.05        normal (média, desvio), truncada em 0
+    lognormal:0.12,0.4      log-normal com mediana 120 ms e sigma 0.4
+    exponential:0.1         exponencial com média 100 ms
+"""
+
+import os
+import sys
+import json
+import time
+import math
+import ssl
+import base64
+import random
+import argparse
+import itertools
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+RECEIVE_PATH = '/api/v1/gateway/pix/receive'
+
+
+def parse_latency(spec):
+    """Converte 'tipo:parametros' em uma função sem argumentos que retorna segundos"""
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',') if v]
+
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    if kind == 'exponential':
+        return lambda: random.expovariate(1 / values[0])
+    raise ValueError(f"Distribuição de latência desconhecida: {spec}")
+
+
+def build_qr_base64(size):
+    """PNG fake (cabeçalho válido + bytes aleatórios) codificado em data URI"""
+    raw = b'\x89PNG\r\n\x1a\n' + os.urandom(max(0, size - 8))
+    return 'data:image/png;base64,' + base64.b64encode(raw).decode()
+
+
+class StubConfig:
+    latency = staticmethod(lambda: 0.0)
+    connect_latency = 0.0
+    error_rate = 0.0
+    error_status = 500
+    timeout_rate = 0.0
+    qr_base64 = build_qr_base64(2048)
+    status = 'PENDING'
+    counter = itertools.count(1)
+    key_rate_limit = 0
+    reject_keys = frozenset()
+    key_windows = {}  # public key -> [segundo, requisições]
+    key_lock = threading.Lock()
+
+
+def over_key_limit(public_key):
+    """Janela fixa de 1 s por chave pública; True se a chave passou do limite"""
+    if not StubConfig.key_rate_limit:
+        return False
+    second = int(time.time())
+    with StubConfig.key_lock:
+        window = StubConfig.key_windows.setdefault(public_key, [second, 0])
+        if window[0] != second:
+            window[0], window[1] = second, 0
+        window[1] += 1
+        return window[1] > StubConfig.key_rate_limit
+
+
+class DuckfyStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'DuckfyStub/1.0'
+    # Cabeçalho e corpo saem em writes separados; sem TCP_NODELAY o Nagle +
+    # delayed ACK somaria ~40 ms artificiais a cada resposta
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # Uma vez por conexão: simula o DNS + handshake TLS de uma gateway real
+        if StubConfig.connect_latency:
+            time.sleep(StubConfig.connect_latency)
+        if isinstance(self.request, ssl.SSLSocket):
+            self.request.do_handshake()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        if self.path.split('?')[0] != RECEIVE_PATH:
+            return self._send(404, {'message': 'Not found'})
+
+        public_key = self.headers.get('x-public-key')
+        if not public_key or not self.headers.get('x-secret-key') or public_key in StubConfig.reject_keys:
+            return self._send(401, {'message': 'Unauthorized', 'errorCode': 'UNAUTHORIZED'})
+
+        if over_key_limit(public_key):
+            return self._send(429, {'message': 'Too many requests', 'errorCode': 'RATE_LIMITED'},
+                              {'Retry-After': '1'})
+
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return self._send(400, {'message': 'Invalid JSON', 'errorCode': 'INVALID_JSON'})
+
+        time.sleep(StubConfig.latency())
+
+        roll = random.random()
+        if roll < StubConfig.timeout_rate:
+            # Simula a gateway travada: segura a conexão além do timeout do cliente
+            time.sleep(120)
+            return
+        if roll < StubConfig.timeout_rate + StubConfig.error_rate:
+            return self._send(StubConfig.error_status, {
+                'message': 'Stub: erro simulado da gateway',
+                'errorCode': 'STUB_ERROR'
+            })
+
+        number = next(StubConfig.counter)
+        transaction_id = f"stub{number:021d}"
+        self._send(201, {
+            'transactionId': transaction_id,
+            'status': StubConfig.status,
+            'fee': 0,
+            'order': {
+                'id': f"order{number:020d}",
+                'url': f"https://stub.local/order/{transaction_id}"
+            },
+            'pix': {
+                'code': f"00020101021126580014BR.GOV.BCB.PIX0136{transaction_id}5204000053039865406"
+                        f"{payload.get('amount', 0):.2f}5802BR6304ABCD",
+                'base64': StubConfig.qr_base64,
+                'image': f"https://stub.local/pix/qr/{transaction_id}.png"
+            },
+            'details': {'identifier': payload.get('identifier')}
+        })
+
+    def _send(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def configure(latency='fixed:0', error_rate=0.0, error_status=500, timeout_rate=0.0,
+              qr_size=2048, status='PENDING', connect_latency=0.0, key_rate_limit=0, reject_keys=()):
+    StubConfig.latency = staticmethod(parse_latency(latency))
+    StubConfig.connect_latency = connect_latency
+    StubConfig.error_rate = error_rate
+    StubConfig.error_status = error_status
+    StubConfig.timeout_rate = timeout_rate
+    StubConfig.qr_base64 = build_qr_base64(qr_size)
+    StubConfig.status = status
+    StubConfig.key_rate_limit = key_rate_limit
+    StubConfig.reject_keys = frozenset(reject_keys)
+    with StubConfig.key_lock:
+        StubConfig.key_windows = {}
+
+
+def make_server(host='127.0.0.1', port=8081, tls_cert=None, tls_key=None):
+    server = ThreadingHTTPServer((host, port), DuckfyStubHandler)
+    server.daemon_threads = True
+    if tls_cert:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(tls_cert, tls_key)
+        # Handshake na thread da conexão (setup), não no accept do servidor
+        server.socket = context.wrap_socket(server.socket, server_side=True, do_handshake_on_connect=False)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stub local da API Duckfy')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', default='fixed:0.1', help='ex.: fixed:0.1, lognormal:0.12,0.4')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fração de respostas de erro')
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='fração de requisições que travam')
+    parser.add_argument('--qr-size', type=int, default=2048, help='tamanho em bytes do PNG em pix.base64')
+    parser.add_argument('--status', default='PENDING', help='status retornado nas transações')
+    parser.add_argument('--connect-latency', type=float, default=0.0,
+                        help='atraso (s) em cada nova conexão, simulando DNS + TLS')
+    parser.add_argument('--key-rate-limit', type=int, default=0,
+                        help='requisições por segundo por x-public-key (0 = sem limite); acima, 429')
+    parser.add_argument('--reject-keys', default='', help='chaves públicas (separadas por vírgula) que recebem 401')
+    parser.add_argument('--tls-cert', default=None, help='certificado PEM: serve HTTPS')
+    parser.add_argument('--tls-key', default=None, help='chave privada PEM do certificado')
+    args = parser.parse_args(argv)
+
+    configure(args.latency, args.error_rate, args.error_status, args.timeout_rate,
+              args.qr_size, args.status, args.connect_latency, args.key_rate_limit,
+              [key.strip() for key in args.reject_keys.split(',') if key.strip()])
+    server = make_server(args.host, args.port, args.tls_cert, args.tls_key)
+    scheme = 'https' if args.tls_cert else 'http'
+    print(f"🦆 Duckfy stub em {scheme}://{args.host}:{args.port}/api/v1 (latência {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos identificadores de transação: taxa de geração do formato
+antigo (str(uuid4())[:10]) x IdentifierGenerator e teste de colisões com
+milhões de identificadores, em um processo e em vários processos criados
+por fork (como os workers do gunicorn).
+
+Não importa o app nem chama a Duckfy.
+
+    python bench/identifier_benchmark.py
+    python bench/identifier_benchmark.py --count 5000000 --processes 8
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+import timeit
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from identifiers import IdentifierGenerator, identifier_time  # noqa: E402
+
+generator = IdentifierGenerator()
+
+
+def legacy_identifier():
+    return str(uuid.uuid4())[:10]
+
+
+def measure(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=3))
+    per_call_ns = seconds / number * 1e9
+    print(f"{label:<44}{per_call_ns:>10.0f} ns{number / seconds:>14.0f} ids/s")
+    return per_call_ns
+
+
+def collisions(identifiers):
+    return len(identifiers) - len(set(identifiers))
+
+
+def check_order(identifiers):
+    """Gerados em sequência, os identificadores nunca voltam no tempo (comparação de strings)"""
+    return all(a[:10] <= b[:10] for a, b in zip(identifiers, identifiers[1:]))
+
+
+def _generate(count):
+    new = generator.new
+    return [new() for _ in range(count)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark dos identificadores de transação')
+    parser.add_argument('--number', type=int, default=200000, help='iterações por medição de taxa')
+    parser.add_argument('--count', type=int, default=2000000, help='identificadores no teste de colisão')
+    parser.add_argument('--processes', type=int, default=4, help='processos (fork) no teste entre workers')
+    args = parser.parse_args(argv)
+
+    print('-- geração --')
+    legacy = measure('str(uuid4())[:10] (antigo)', legacy_identifier, args.number)
+    measure('str(uuid4())', lambda: str(uuid.uuid4()), args.number)
+    current = measure('IdentifierGenerator.new()', generator.new, args.number)
+    measure("IdentifierGenerator.new('SEDEX_')", lambda: generator.new('SEDEX_'), args.number)
+    print(f"ganho sobre o antigo: {legacy / current:.1f}x")
+
+    print(f"\n-- colisões em {args.count:,} identificadores (um processo) --")
+    start = time.perf_counter()
+    identifiers = _generate(args.count)
+    elapsed = time.perf_counter() - start
+    print(f"IdentifierGenerator: {collisions(identifiers)} colisões, "
+          f"ordem temporal {'ok' if check_order(identifiers) else 'QUEBRADA'}, "
+          f"{args.count / elapsed:,.0f} ids/s, "
+          f"{identifier_time(identifiers[-1]) - identifier_time(identifiers[0]):.2f}s cobertos")
+    del identifiers
+
+    legacy_identifiers = [legacy_identifier() for _ in range(args.count)]
+    # Aniversário com 36 bits: os 10 caracteres incluem o hífen, sobram 9 hexadecimais
+    expected = args.count ** 2 / 2 ** 37
+    print(f"str(uuid4())[:10]:   {collisions(legacy_identifiers)} colisões (esperado ~{expected:.1f})")
+    del legacy_identifiers
+
+    print(f"\n-- colisões entre {args.processes} processos (fork), {args.count:,} no total --")
+    generator.new()  # bloco aleatório já carregado no pai: os filhos não podem herdá-lo
+    context = multiprocessing.get_context('fork')
+    per_process = args.count // args.processes
+    with context.Pool(args.processes) as pool:
+        chunks = pool.map(_generate, [per_process] * args.processes)
+    merged = [identifier for chunk in chunks for identifier in chunk]
+    print(f"IdentifierGenerator: {collisions(merged)} colisões em {len(merged):,}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
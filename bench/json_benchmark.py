@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark da serialização JSON da API (stdlib json x orjson) e dos
+endpoints de exemplo pré-codificados (200 com corpo e 304 por ETag).
+
+Não chama a Duckfy: usa o Flask test client dentro do processo.
+
+    python bench/json_benchmark.py
+    python bench/json_benchmark.py --number 20000
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_workdir = tempfile.mkdtemp(prefix='json_bench_')
+os.environ.setdefault('PUBLIC_KEY', 'bench-public-key')
+os.environ.setdefault('SECRET_KEY', 'bench-secret-key')
+os.environ.setdefault('CLIENT_HASH_SALT', 'bench-client-hash-salt')
+os.environ.setdefault('FLASK_ENV', 'production')
+os.environ.setdefault('DATABASE_PATH', os.path.join(_workdir, 'bench.db'))
+os.environ.setdefault('SHARED_STATE_DIR', _workdir)
+
+import logging  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import app as api  # noqa: E402
+import fast_json  # noqa: E402
+
+logging.disable(logging.INFO)
+
+# Payload típico enviado à Duckfy em /pix/create/taxa-sedex
+PIX_DATA = api.catalog.get('taxa-sedex').build_pix_data(
+    'bench-identifier',
+    {'name': 'Cliente Benchmark', 'email': 'benchmark@example.com',
+     'phone': '(11) 99999-9999', 'cpf': '529.982.247-25'},
+    {'utm_source': 'FB', 'utm_campaign': 'Benchmark|123', 'utm_medium': 'Publico|456',
+     'utm_content': 'Anuncio|789', 'utm_term': 'feed', 'tracking_source': 'facebook_ads'}
+)
+
+
+def register_dynamic_example():
+    """Rota equivalente ao endpoint antigo: monta o dict e serializa (stdlib) a cada hit"""
+    stdlib_provider = DefaultJSONProvider(api.app)
+
+    @api.app.route('/bench/example/utm/dynamic')
+    def dynamic_utm_example():
+        return stdlib_provider.response(api.pix_utm_example.__wrapped__())
+
+
+def measure(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=3))
+    per_call_us = seconds / number * 1e6
+    print(f"{label:<52}{per_call_us:>10.2f} µs{number / seconds:>14.0f} ops/s")
+    return per_call_us
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de serialização JSON da API PIX')
+    parser.add_argument('--number', type=int, default=5000, help='iterações por medição')
+    args = parser.parse_args(argv)
+
+    print(f"orjson: {'disponível' if fast_json.orjson else 'não instalado (fallback stdlib)'}\n")
+    register_dynamic_example()  # antes da primeira requisição ao app
+    example = api.pix_utm_example.__wrapped__()
+    results = {}
+
+    print('-- codificação --')
+    results['stdlib_example'] = measure(
+        'json.dumps (exemplo UTM)', lambda: json.dumps(example, separators=(',', ':')).encode(), args.number)
+    results['fast_example'] = measure(
+        'fast_json.dumps_bytes (exemplo UTM)', lambda: fast_json.dumps_bytes(example), args.number)
+    results['stdlib_upstream'] = measure(
+        'json.dumps (corpo para a Duckfy)', lambda: json.dumps(PIX_DATA).encode(), args.number)
+    results['fast_upstream'] = measure(
+        'fast_json.dumps_bytes (corpo para a Duckfy)', lambda: fast_json.dumps_bytes(PIX_DATA), args.number)
+
+    print('\n-- jsonify (app context) --')
+    with api.app.app_context():
+        stdlib_provider = DefaultJSONProvider(api.app)
+        results['jsonify_stdlib'] = measure(
+            'DefaultJSONProvider.response', lambda: stdlib_provider.response(example), args.number)
+        results['jsonify_fast'] = measure(
+            'FastJSONProvider.response', lambda: api.app.json.response(example), args.number)
+
+    print('\n-- GET /pix/example/utm (test client) --')
+    client = api.app.test_client()
+    etag = client.get('/pix/example/utm').headers['ETag']
+    results['endpoint_dynamic'] = measure(
+        'montado + jsonify stdlib a cada hit', lambda: client.get('/bench/example/utm/dynamic'), args.number // 5)
+    results['endpoint_static'] = measure(
+        'pré-codificado (200)', lambda: client.get('/pix/example/utm'), args.number // 5)
+    results['endpoint_304'] = measure(
+        'If-None-Match (304)', lambda: client.get('/pix/example/utm', headers={'If-None-Match': etag}),
+        args.number // 5)
+
+    print('\n-- ganho --')
+    print(f"codificação do exemplo:   {results['stdlib_example'] / results['fast_example']:.1f}x")
+    print(f"corpo para a Duckfy:      {results['stdlib_upstream'] / results['fast_upstream']:.1f}x")
+    print(f"jsonify:                  {results['jsonify_stdlib'] / results['jsonify_fast']:.1f}x")
+    print(f"endpoint de exemplo:      {results['endpoint_dynamic'] / results['endpoint_static']:.1f}x (200), "
+          f"{results['endpoint_dynamic'] / results['endpoint_304']:.1f}x (304)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latência e throughput da API PIX contra o stub local da Duckfy.
+
+Para cada classe de worker do gunicorn, sobe a API apontando para o stub
+(bench/duckfy_stub.py), dispara requisições em cada nível de concorrência
+e reporta throughput e p50/p95/p99 por rota.
+
+Exemplos:
+    python bench/run_benchmark.py
+    python bench/run_benchmark.py --worker-classes sync,gevent --concurrency 1,16,64 \\
+        --requests 500 --stub-latency lognormal:0.15,0.5
+    python bench/run_benchmark.py --url http://localhost:5000   # API já em execução
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+import duckfy_stub  # noqa: E402
+
+# CPF válido (dígitos verificadores corretos) usado apenas em testes
+TEST_CLIENT = {
+    'name': 'Cliente Benchmark',
+    'email': 'benchmark@example.com',
+    'phone': '(11) 99999-9999',
+    'cpf': '529.982.247-25'
+}
+
+PAYLOADS = {
+    '/pix/create': {
+        'amount': 49.90,
+        'client': TEST_CLIENT,
+        'products': [{'id': 'bench', 'name': 'Produto Benchmark', 'quantity': 1, 'price': 49.90}],
+        'utm_source': 'FB',
+        'utm_campaign': 'Benchmark|123',
+        'utm_medium': 'Publico|456',
+        'utm_content': 'Anuncio|789',
+        'utm_term': 'feed'
+    },
+    '/pix/create/taxa-sedex': {
+        'client': TEST_CLIENT,
+        'utm_source': 'FB',
+        'utm_campaign': 'Benchmark Sedex|123',
+        'utm_term': 'feed'
+    }
+}
+
+# Argumentos extras do gunicorn por classe de worker
+WORKER_CLASSES = {
+    'sync': ['--worker-class', 'sync'],
+    'gthread': ['--worker-class', 'gthread', '--threads', '16'],
+    'gevent': ['--worker-class', 'gevent', '--worker-connections', '1000']
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def start_stub(latency, error_rate, qr_size):
+    duckfy_stub.configure(latency=latency, error_rate=error_rate, qr_size=qr_size)
+    port = free_port()
+    server = duckfy_stub.make_server(port=port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{port}/api/v1"
+
+
+def start_api(worker_class, workers, stub_url, workdir):
+    port = free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(workers),
+        FLASK_ENV='production',
+        PUBLIC_KEY=os.environ.get('PUBLIC_KEY', 'bench-public-key'),
+        SECRET_KEY=os.environ.get('SECRET_KEY', 'bench-secret-key'),
+        CLIENT_HASH_SALT=os.environ.get('CLIENT_HASH_SALT', 'bench-client-hash-salt'),
+        # Todas as requisições usam o mesmo CPF e IP: com o rate limit ligado quase tudo seria 429
+        RATE_LIMIT_ENABLED='false',
+        DUCKFY_BASE_URL=stub_url,
+        DUCKFY_POOL_SIZE='100',
+        DATABASE_PATH=os.path.join(workdir, 'bench.db'),
+        SHARED_STATE_DIR=workdir,
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics')
+    )
+    command = [
+        sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+        '--access-logfile', '/dev/null', '--log-level', 'warning',
+        *WORKER_CLASSES[worker_class], 'app:app'
+    ]
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    base_url = f"http://127.0.0.1:{port}"
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn ({worker_class}) encerrou: {process.stderr.read().decode()[-2000:]}")
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn ({worker_class}) não respondeu a /health")
+
+
+def stop_api(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_load(base_url, route, concurrency, total, timeout=35):
+    """Dispara total requisições com concurrency clientes; cada cliente usa keep-alive"""
+    payload = json.dumps(PAYLOADS[route])
+    local = threading.local()
+
+    def one(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}{route}", data=payload, timeout=timeout,
+                                    headers={'Content-Type': 'application/json'})
+            status = response.status_code
+        except requests.RequestException:
+            status = 'error'
+        return time.perf_counter() - start, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(r[0] for r in results)
+    statuses = Counter(str(r[1]) for r in results)
+    ok = statuses['201']
+    return {
+        'route': route,
+        'concurrency': concurrency,
+        'requests': total,
+        'ok': ok,
+        'errors': total - ok,
+        'statuses': dict(statuses),
+        'throughput': total / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000
+    }
+
+
+class BenchmarkError(Exception):
+    """Respostas de erro demais: as latências medidas não seriam das criações de PIX"""
+
+
+def check_errors(label, row, max_error_rate):
+    if row['requests'] and row['errors'] / row['requests'] > max_error_rate:
+        raise BenchmarkError(
+            f"{label} {row['route']} (concorrência {row['concurrency']}): {row['errors']} de {row['requests']} "
+            f"requisições sem 201 (limite {max_error_rate:.0%}); status: {row['statuses']}"
+        )
+
+
+def print_table(worker_class, rows):
+    print(f"\n== worker class: {worker_class} ==")
+    print(f"{'rota':<26}{'conc':>6}{'req':>7}{'ok':>7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for r in rows:
+        print(f"{r['route']:<26}{r['concurrency']:>6}{r['requests']:>7}{r['ok']:>7}"
+              f"{r['throughput']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark da API PIX contra o stub da Duckfy')
+    parser.add_argument('--worker-classes', default='sync,gevent',
+                        help=f"lista separada por vírgula ({', '.join(WORKER_CLASSES)})")
+    parser.add_argument('--workers', type=int, default=4, help='workers do gunicorn')
+    parser.add_argument('--concurrency', default='1,8,32', help='níveis de concorrência')
+    parser.add_argument('--requests', type=int, default=200, help='requisições por nível e rota')
+    parser.add_argument('--routes', default=','.join(PAYLOADS))
+    parser.add_argument('--stub-latency', default='lognormal:0.1,0.3')
+    parser.add_argument('--stub-error-rate', type=float, default=0.0)
+    parser.add_argument('--stub-qr-size', type=int, default=2048)
+    parser.add_argument('--max-error-rate', type=float,
+                        help='fração máxima de respostas sem 201 por rota (padrão: erro do stub + 5%%)')
+    parser.add_argument('--url', help='usar uma API já em execução (ignora --worker-classes)')
+    parser.add_argument('--json', help='grava os resultados neste arquivo')
+    args = parser.parse_args(argv)
+
+    routes = [r for r in args.routes.split(',') if r]
+    levels = [int(c) for c in args.concurrency.split(',') if c]
+    max_error_rate = args.max_error_rate
+    if max_error_rate is None:
+        max_error_rate = min(1.0, args.stub_error_rate + 0.05)
+    results = {}
+
+    def bench(label, base_url):
+        rows = []
+        for route in routes:
+            run_load(base_url, route, min(levels), min(20, args.requests))  # aquecimento
+            for level in levels:
+                row = run_load(base_url, route, level, args.requests)
+                check_errors(label, row, max_error_rate)
+                rows.append(row)
+        results[label] = rows
+        print_table(label, rows)
+
+    try:
+        if args.url:
+            bench('external', args.url.rstrip('/'))
+        else:
+            stub, stub_url = start_stub(args.stub_latency, args.stub_error_rate, args.stub_qr_size)
+            print(f"Stub Duckfy: {stub_url} (latência {args.stub_latency}, erro {args.stub_error_rate:.0%})")
+            try:
+                for worker_class in [w for w in args.worker_classes.split(',') if w]:
+                    with tempfile.TemporaryDirectory() as workdir:
+                        process, base_url = start_api(worker_class, args.workers, stub_url, workdir)
+                        try:
+                            bench(worker_class, base_url)
+                        finally:
+                            stop_api(process)
+            finally:
+                stub.shutdown()
+    except BenchmarkError as e:
+        print(f"\n❌ Benchmark inválido: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark da validação de /pix/create: caminho antigo (várias
+passadas sobre o dict + cópia manual dos campos) x RequestValidator
+(uma passada para um PixRequest com __slots__).
+
+O caminho novo faz mais trabalho que o antigo (dígitos verificadores do
+CPF/CNPJ e formato do e-mail); a comparação justa é com o caminho antigo
+acrescido das mesmas verificações em passadas separadas.
+
+    python bench/validation_benchmark.py
+    python bench/validation_benchmark.py --number 50000
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_workdir = tempfile.mkdtemp(prefix='validation_bench_')
+os.environ.setdefault('PUBLIC_KEY', 'bench-public-key')
+os.environ.setdefault('SECRET_KEY', 'bench-secret-key')
+os.environ.setdefault('CLIENT_HASH_SALT', 'bench-client-hash-salt')
+os.environ.setdefault('FLASK_ENV', 'production')
+os.environ.setdefault('DATABASE_PATH', os.path.join(_workdir, 'bench.db'))
+os.environ.setdefault('SHARED_STATE_DIR', _workdir)
+
+import logging  # noqa: E402
+
+import app as api  # noqa: E402
+from validation import EMAIL_RE, normalize_document  # noqa: E402
+
+logging.disable(logging.INFO)
+
+BODY = {
+    'amount': 197.90,
+    'client': {
+        'name': 'Cliente Benchmark',
+        'email': 'benchmark@example.com',
+        'phone': '(11) 99999-9999',
+        'cpf': '529.982.247-25'
+    },
+    'products': [{'id': 'curso_001', 'name': 'Curso Online', 'quantity': 1, 'price': 197.90}],
+    'utm_source': 'FB',
+    'utm_campaign': 'Black Friday 2024|123456789',
+    'utm_medium': 'Audiencia Lookalike|987654321',
+    'utm_content': 'Video VSL 30s|456789123',
+    'utm_term': 'feed',
+    'metadata': {'orderId': 'ORDER-12345', 'source': 'facebook_ads'}
+}
+
+
+# Implementação anterior ao RequestValidator, mantida aqui só para comparação
+def legacy_validate_pix_request(data):
+    required_fields = ['amount', 'client']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        raise ValueError(f"Campos obrigatórios ausentes: {', '.join(missing_fields)}")
+    if not isinstance(data['client'], dict):
+        raise ValueError("Campo 'client' deve ser um objeto")
+    required_client_fields = ['name', 'email', 'cpf']
+    missing_client_fields = [field for field in required_client_fields if field not in data['client']]
+    if missing_client_fields:
+        raise ValueError(f"Campos obrigatórios do cliente ausentes: {', '.join(missing_client_fields)}")
+    if not isinstance(data['amount'], (int, float)) or data['amount'] <= 0:
+        raise ValueError("Campo 'amount' deve ser um número positivo")
+
+
+def legacy_validate_with_checks(data):
+    """Caminho antigo + as mesmas garantias do validador novo, em passadas extras"""
+    legacy_validate_pix_request(data)
+    client = data['client']
+    if not EMAIL_RE.match(client['email']):
+        raise ValueError("E-mail do cliente inválido")
+    return {**client, 'cpf': normalize_document(client['cpf'])}
+
+
+def legacy_process_utm_parameters(data):
+    utm_data = {}
+    for param in ['utm_source', 'utm_campaign', 'utm_medium', 'utm_content', 'utm_term']:
+        if param in data and data[param]:
+            utm_data[param] = str(data[param])[:200]
+    if utm_data:
+        utm_data['conversion_timestamp'] = datetime.now().isoformat()
+        utm_data['tracking_source'] = 'facebook_ads'
+    return utm_data
+
+
+def legacy_build_pix_data(data, utm_tracking):
+    pix_data = {
+        'identifier': data.get('identifier', api.generate_unique_identifier()),
+        'amount': data['amount'],
+        'client': data['client']
+    }
+    for field in ['shippingFee', 'extraFee', 'discount', 'products', 'splits', 'dueDate', 'callbackUrl']:
+        if field in data:
+            pix_data[field] = data[field]
+    existing_metadata = data.get('metadata', {})
+    if isinstance(existing_metadata, str):
+        try:
+            existing_metadata = json.loads(existing_metadata)
+        except ValueError:
+            existing_metadata = {'original_metadata': existing_metadata}
+    pix_data['metadata'] = {**existing_metadata, 'tracking': utm_tracking}
+    if 'dueDate' not in pix_data:
+        pix_data['dueDate'] = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    return pix_data
+
+
+def legacy_path(data):
+    legacy_validate_pix_request(data)
+    utm_tracking = legacy_process_utm_parameters(data)
+    return legacy_build_pix_data(data, utm_tracking)
+
+
+def legacy_path_with_checks(data):
+    client = legacy_validate_with_checks(data)
+    utm_tracking = legacy_process_utm_parameters(data)
+    pix_data = legacy_build_pix_data(data, utm_tracking)
+    pix_data['client'] = client
+    return pix_data
+
+
+def compiled_path(data):
+    pix_request = api.pix_request_validator.parse(data)
+    utm_tracking = api.process_utm_parameters(pix_request.utm)
+    return api.build_pix_data(pix_request, utm_tracking)
+
+
+def validate_only_legacy(data):
+    legacy_validate_pix_request(data)
+    legacy_process_utm_parameters(data)
+
+
+def validate_only_legacy_with_checks(data):
+    legacy_validate_with_checks(data)
+    legacy_process_utm_parameters(data)
+
+
+def validate_only_compiled(data):
+    api.pix_request_validator.parse(data)
+
+
+def measure(label, func, number):
+    seconds = min(timeit.repeat(lambda: func(BODY), number=number, repeat=5))
+    per_call_us = seconds / number * 1e6
+    print(f"{label:<46}{per_call_us:>10.2f} µs{number / seconds:>14.0f} ops/s")
+    return per_call_us
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark da validação de requisições PIX')
+    parser.add_argument('--number', type=int, default=20000, help='iterações por medição')
+    args = parser.parse_args(argv)
+
+    print('-- validação + UTM --')
+    measure('antigo (sem checksum de CPF/e-mail)', validate_only_legacy, args.number)
+    legacy_validate = measure('antigo + checksum/e-mail', validate_only_legacy_with_checks, args.number)
+    compiled_validate = measure('RequestValidator (com checksum/e-mail)', validate_only_compiled, args.number)
+
+    print('\n-- validação + UTM + payload da Duckfy --')
+    measure('antigo (sem checksum de CPF/e-mail)', legacy_path, args.number)
+    legacy = measure('antigo + checksum/e-mail', legacy_path_with_checks, args.number)
+    compiled = measure('RequestValidator + build_pix_data', compiled_path, args.number)
+
+    print('\n-- ganho sobre o caminho antigo com as mesmas verificações --')
+    print(f"validação:          {legacy_validate / compiled_validate:.2f}x")
+    print(f"caminho completo:   {legacy / compiled:.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
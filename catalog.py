@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+
+class CatalogProduct:
+    """
+    Produto de preço fixo com payload e resposta pré-montados.
+
+    Tudo o que não depende da requisição (lista de produtos, metadata,
+    esqueleto da resposta) é montado uma vez no carregamento; por requisição
+    só entram identifier, cliente, UTM e a data de vencimento.
+    """
+    __slots__ = ('sku', 'code', 'name', 'price', 'identifier_prefix', 'due_days',
+                 '_products', '_metadata', '_response', '_due_date_cache')
+
+    def __init__(self, sku, spec):
+        self.sku = sku
+        self.code = str(spec['code'])
+        self.name = str(spec['name'])
+        self.price = float(spec['price'])
+        if self.price <= 0:
+            raise ValueError(f"Produto '{sku}': price deve ser positivo")
+        self.identifier_prefix = str(spec.get('identifier_prefix', ''))
+        self.due_days = int(spec.get('due_days', 1))
+
+        # Estruturas compartilhadas entre requisições: só são lidas, nunca alteradas
+        self._products = [{
+            'id': self.code,
+            'name': self.name,
+            'quantity': 1,
+            'price': self.price
+        }]
+        self._metadata = {
+            'product_type': spec.get('product_type', sku.replace('-', '_')),
+            'product_code': self.code,
+            'auto_generated': True,
+            'api_endpoint': f'/pix/create/{sku}',
+            **spec.get('metadata', {})
+        }
+        self._response = {
+            'status': 'success',
+            'message': spec.get('message', f'PIX {self.name} criado com sucesso'),
+            'product': {
+                'name': self.name,
+                'code': self.code,
+                'price': self.price
+            }
+        }
+        self._due_date_cache = (None, None)
+
+    def due_date(self):
+        """Data de vencimento (hoje + due_days), recalculada só quando o dia muda"""
+        today = datetime.now().date()
+        cached_day, cached_value = self._due_date_cache
+        if cached_day != today:
+            cached_value = (today + timedelta(days=self.due_days)).strftime('%Y-%m-%d')
+            self._due_date_cache = (today, cached_value)
+        return cached_value
+
+    def build_pix_data(self, identifier, client, utm_tracking):
+        metadata = dict(self._metadata)
+        metadata['tracking'] = utm_tracking
+        return {
+            'identifier': f"{self.identifier_prefix}{identifier}",
+            'amount': self.price,
+            'client': client,
+            'products': self._products,
+            'metadata': metadata,
+            'dueDate': self.due_date()
+        }
+
+    def build_response(self, result):
+        response_data = dict(self._response)
+        response_data['data'] = result
+        return response_data
+
+
+class Catalog:
+    """
+    Catálogo de produtos de preço fixo carregado de um arquivo JSON.
+
+    O arquivo é verificado (mtime) no máximo a cada reload_interval segundos;
+    se mudou, o catálogo é recompilado e trocado sem reiniciar os workers.
+    Um arquivo inválido mantém o catálogo anterior.
+    """
+
+    def __init__(self, path, reload_interval=5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._products = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reload(force=True)
+
+    def get(self, sku):
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+        return self._products.get(sku)
+
+    def products(self):
+        return list(self._products.values())
+
+    def reload(self, force=False):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError as e:
+                if force:
+                    logging.error(f"Catalog file not found: {self.path} ({str(e)})")
+                return False
+
+            if not force and mtime == self._mtime:
+                return False
+
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    spec = json.load(f)
+                products = {
+                    sku: CatalogProduct(sku, product_spec)
+                    for sku, product_spec in spec.get('products', {}).items()
+                }
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                logging.error(f"Invalid catalog file {self.path}, keeping previous version: {str(e)}")
+                self._mtime = mtime
+                return False
+
+            self._products = products
+            self._mtime = mtime
+            logging.info(f"Catalog loaded: {len(products)} products ({', '.join(products)})")
+            return True
@@ -0,0 +1,87 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+from transaction_store import hash_client_document
+
+
+def due_date_deadline(due_date):
+    """Fim do dia de vencimento ('2025-06-11' ou ISO com hora), em epoch; None se inválido"""
+    try:
+        day = datetime.strptime(str(due_date)[:10], '%Y-%m-%d')
+    except ValueError:
+        return None
+    return (day + timedelta(days=1)).timestamp()
+
+
+class PendingChargeStore:
+    """
+    Cobranças recentes que podem ser devolvidas de novo ao mesmo cliente
+    (SQLite, tabela reusable_charges, compartilhada entre os workers).
+
+    A chave é o hash do CPF/CNPJ + escopo (SKU e preço do catálogo, ou
+    valor). Uma cobrança só é reaproveitada dentro de window segundos da
+    criação, antes do fim do dia de vencimento, enquanto o status dela na
+    tabela transactions (atualizado pelos webhooks) continuar pendente e se
+    nenhum webhook dela estiver na fila (webhook_events) esperando para ser
+    aplicado: um pagamento recém-confirmado nunca é devolvido como pendente.
+
+    Sem webhooks configurados o status nunca sai de pendente, e a rota não
+    deve usar o reaproveitamento (ver charge_reuse_key no app).
+    """
+
+    def __init__(self, db, window=900, client_hash_salt='', pending_statuses=('PENDING',)):
+        self.db = db
+        self.window = window
+        self.client_hash_salt = client_hash_salt
+        self.pending_statuses = tuple(pending_statuses)
+        self._last_prune = 0.0
+        self._create_schema()
+
+    def _create_schema(self):
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS reusable_charges (
+                reuse_key TEXT PRIMARY KEY,
+                identifier TEXT NOT NULL,
+                result TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+
+    def key(self, client, scope):
+        """Chave de reaproveitamento; None se o cliente não tem documento"""
+        client_hash = hash_client_document(client.get('cpf') or client.get('document'), self.client_hash_salt)
+        return f"{client_hash}|{scope}" if client_hash else None
+
+    def find(self, key, now=None):
+        """Resultado da Duckfy da cobrança ainda pendente para a chave, ou None"""
+        now = time.time() if now is None else now
+        row = self.db.execute(
+            'SELECT r.result FROM reusable_charges r JOIN transactions t ON t.identifier = r.identifier '
+            f"WHERE r.reuse_key = ? AND r.expires_at > ? AND t.status IN ({', '.join('?' for _ in self.pending_statuses)}) "
+            "AND NOT EXISTS (SELECT 1 FROM webhook_events w WHERE w.state != 'done' "
+            'AND (w.identifier = t.identifier OR w.transaction_id = t.transaction_id))',
+            (key, now, *self.pending_statuses)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def remember(self, key, pix_data, result, now=None):
+        """Guarda uma cobrança recém-criada (registrada como PENDING em transactions)"""
+        now = time.time() if now is None else now
+        expires_at = now + self.window
+        deadline = due_date_deadline(pix_data.get('dueDate'))
+        if deadline is not None:
+            expires_at = min(expires_at, deadline)
+        if expires_at <= now:
+            return False
+
+        self.db.execute(
+            'INSERT OR REPLACE INTO reusable_charges (reuse_key, identifier, result, expires_at, created_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (key, str(pix_data['identifier']), json.dumps(result, ensure_ascii=False), expires_at, now)
+        )
+        if now - self._last_prune > 3600:
+            self._last_prune = now
+            self.db.execute('DELETE FROM reusable_charges WHERE expires_at < ?', (now,))
+        return True
@@ -0,0 +1,178 @@
+import os
+import math
+import time
+import logging
+import threading
+from duckfy_client import DuckfyAPIError
+from shared_state import SharedRecords
+
+CLOSED = 0
+OPEN = 1
+HALF_OPEN = 2
+
+STATE_NAMES = {CLOSED: 'closed', OPEN: 'open', HALF_OPEN: 'half_open'}
+
+# state, opened_at, window_start, probe_started, total, failures, slow
+_RECORD_FORMAT = '<i4xdddqqq'
+
+
+class CircuitOpenError(DuckfyAPIError):
+    """Circuito aberto: a chamada à Duckfy nem é tentada"""
+    def __init__(self, retry_after):
+        super().__init__(
+            message='Gateway de pagamento temporariamente indisponível. Tente novamente em instantes.',
+            status_code=503,
+            error_code='CIRCUIT_OPEN'
+        )
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker para a Duckfy com estado compartilhado entre workers.
+
+    - closed: chamadas normais; erros e chamadas lentas são contados em uma
+      janela fixa de window_seconds
+    - open: ao ultrapassar error_rate ou slow_rate (com pelo menos
+      min_requests na janela), falha imediatamente por open_seconds
+    - half_open: depois de open_seconds uma única chamada de teste é
+      liberada; sucesso fecha o circuito, falha o reabre
+    """
+
+    def __init__(self, storage, window_seconds=30, min_requests=10, error_rate=0.5,
+                 slow_call_seconds=5, slow_rate=0.8, open_seconds=30, probe_timeout=30):
+        self.storage = storage
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.probe_timeout = probe_timeout
+
+    def call(self, func):
+        """Executa func() protegida pelo circuito"""
+        probe = self._before_call()
+        start = time.monotonic()
+        try:
+            result = func()
+        except DuckfyAPIError as e:
+            # Erros 4xx são do cliente; só conexão/timeout e 5xx indicam falha da gateway
+            failed = e.status_code is None or e.status_code >= 500
+            self._record(failed, time.monotonic() - start, probe)
+            raise
+        except Exception:
+            self._record(True, time.monotonic() - start, probe)
+            raise
+        self._record(False, time.monotonic() - start, probe)
+        return result
+
+    def _before_call(self):
+        now = time.time()
+        with self.storage.locked():
+            state, opened_at, window_start, probe_started, total, failures, slow = self.storage.read()
+
+            if state == CLOSED:
+                return False
+
+            if state == OPEN and now - opened_at < self.open_seconds:
+                raise CircuitOpenError(self._retry_after(opened_at, now))
+
+            # Meio aberto: libera uma chamada de teste por vez
+            if state == HALF_OPEN and now - probe_started < self.probe_timeout:
+                raise CircuitOpenError(1)
+
+            self.storage.write((HALF_OPEN, opened_at, window_start, now, total, failures, slow))
+            logging.warning("Duckfy circuit breaker half-open: sending probe request")
+            return True
+
+    def _record(self, failed, duration, probe):
+        now = time.time()
+        is_slow = duration >= self.slow_call_seconds
+        with self.storage.locked():
+            state, opened_at, window_start, probe_started, total, failures, slow = self.storage.read()
+
+            if probe or state == HALF_OPEN:
+                if not probe:
+                    return
+                if failed or is_slow:
+                    self.storage.write((OPEN, now, now, 0.0, 0, 0, 0))
+                    logging.warning("Duckfy circuit breaker re-opened after failed probe")
+                else:
+                    self.storage.write((CLOSED, 0.0, now, 0.0, 0, 0, 0))
+                    logging.warning("Duckfy circuit breaker closed")
+                return
+
+            if state == OPEN:
+                return
+
+            if now - window_start >= self.window_seconds:
+                window_start, total, failures, slow = now, 0, 0, 0
+
+            total += 1
+            failures += 1 if failed else 0
+            slow += 1 if is_slow else 0
+
+            if total >= self.min_requests and (
+                failures / total >= self.error_rate or slow / total >= self.slow_rate
+            ):
+                self.storage.write((OPEN, now, now, 0.0, 0, 0, 0))
+                logging.warning(
+                    f"Duckfy circuit breaker opened: {failures}/{total} failures, {slow}/{total} slow calls"
+                )
+                return
+
+            self.storage.write((CLOSED, opened_at, window_start, probe_started, total, failures, slow))
+
+    def _retry_after(self, opened_at, now):
+        return max(1, math.ceil(self.open_seconds - (now - opened_at)))
+
+    def snapshot(self):
+        """Estado atual do circuito (usado em /health)"""
+        now = time.time()
+        state, opened_at, window_start, probe_started, total, failures, slow = self.storage.read()
+        data = {
+            'state': STATE_NAMES.get(state, 'closed'),
+            'window': {
+                'requests': total,
+                'failures': failures,
+                'slow_calls': slow
+            }
+        }
+        if state == OPEN:
+            data['retry_after'] = self._retry_after(opened_at, now)
+        return data
+
+
+_breaker = None
+_breaker_pid = None
+_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker(app_config):
+    """Retorna o circuit breaker do worker atual (arquivo de estado compartilhado)"""
+    global _breaker, _breaker_pid
+
+    pid = os.getpid()
+    if _breaker is None or _breaker_pid != pid:
+        # Threads do mesmo worker (gevent, executores) podem chegar juntas no
+        # primeiro uso: só uma cria o breaker
+        with _breaker_lock:
+            if _breaker is None or _breaker_pid != pid:
+                storage = SharedRecords(
+                    'duckfy_circuit_breaker.v1',
+                    _RECORD_FORMAT,
+                    directory=app_config['SHARED_STATE_DIR']
+                )
+                _breaker = CircuitBreaker(
+                    storage,
+                    window_seconds=app_config['BREAKER_WINDOW_SECONDS'],
+                    min_requests=app_config['BREAKER_MIN_REQUESTS'],
+                    error_rate=app_config['BREAKER_ERROR_RATE'],
+                    slow_call_seconds=app_config['BREAKER_SLOW_CALL_SECONDS'],
+                    slow_rate=app_config['BREAKER_SLOW_RATE'],
+                    open_seconds=app_config['BREAKER_OPEN_SECONDS'],
+                    probe_timeout=app_config['DUCKFY_CONNECT_TIMEOUT'] + app_config['DUCKFY_READ_TIMEOUT']
+                )
+                _breaker_pid = pid
+    return _breaker
@@ -0,0 +1,49 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele só gzip é oferecido
+    brotli = None
+
+
+def available_encodings():
+    """Codificações suportadas, em ordem de preferência"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress_body(body, encoding, gzip_level=6, brotli_quality=4):
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality, mode=brotli.MODE_TEXT)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def compress_response(response, accept_encodings, min_size=512, gzip_level=6, brotli_quality=4,
+                      mimetypes=('application/json',)):
+    """
+    Comprime o corpo de uma resposta JSON com br ou gzip, conforme o
+    Accept-Encoding do cliente (request.accept_encodings).
+
+    Respostas pequenas (< min_size), em streaming, sem corpo ou já
+    codificadas passam sem alteração. Retorna a própria resposta.
+    """
+    if (response.mimetype not in mimetypes or response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    response.set_data(compress_body(body, encoding, gzip_level, brotli_quality))
+    response.headers['Content-Encoding'] = encoding
+    # O ETag forte identifica os bytes não comprimidos
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -1,11 +1,206 @@
 import os
+from dotenv import load_dotenv
+
+# Carregar .env antes de ler as variáveis das classes de configuração
+load_dotenv()
 
 class Config:
     """Configuração base da aplicação"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    DUCKFY_BASE_URL = "https://app.duckfyoficial.com/api/v1"
+    # Pode apontar para o stub local (bench/duckfy_stub.py) em testes e benchmarks
+    DUCKFY_BASE_URL = os.environ.get('DUCKFY_BASE_URL', "https://app.duckfyoficial.com/api/v1")
     PUBLIC_KEY = os.environ.get('PUBLIC_KEY')
     DUCKFY_SECRET_KEY = os.environ.get('SECRET_KEY')
+
+    # Modo de serviço do gunicorn ('sync' ou 'async'), ver gunicorn.conf.py
+    SERVER_MODE = os.environ.get('SERVER_MODE', 'sync').lower()
+
+    # Pool de conexões com a Duckfy (por worker); no modo async cada worker
+    # mantém muitas chamadas simultâneas, então o pool padrão é maior
+    DUCKFY_POOL_SIZE = int(os.environ.get('DUCKFY_POOL_SIZE', 100 if SERVER_MODE == 'async' else 10))
+    DUCKFY_CONNECT_TIMEOUT = float(os.environ.get('DUCKFY_CONNECT_TIMEOUT', 3.05))
+    DUCKFY_READ_TIMEOUT = float(os.environ.get('DUCKFY_READ_TIMEOUT', 25))
+    DUCKFY_TCP_KEEPALIVE = os.environ.get('DUCKFY_TCP_KEEPALIVE', 'true').lower() == 'true'
+    
+    # Várias contas da Duckfy: nome:public_key:secret_key[:peso],... (vazio = PUBLIC_KEY/SECRET_KEY)
+    # Cada chave tem pool de conexões próprio (DUCKFY_POOL_SIZE por chave)
+    DUCKFY_CREDENTIALS = os.environ.get('DUCKFY_CREDENTIALS', '')
+    DUCKFY_KEY_STRATEGY = os.environ.get('DUCKFY_KEY_STRATEGY', 'least_in_flight')  # least_in_flight | weighted
+    DUCKFY_KEY_EJECT_FAILURES = int(os.environ.get('DUCKFY_KEY_EJECT_FAILURES', 5))
+    DUCKFY_KEY_EJECT_SECONDS = float(os.environ.get('DUCKFY_KEY_EJECT_SECONDS', 30))
+    DUCKFY_KEY_MAX_EJECT_SECONDS = float(os.environ.get('DUCKFY_KEY_MAX_EJECT_SECONDS', 300))
+    
+    # Aquecimento do worker no post_worker_init do gunicorn (DNS + conexões com a Duckfy)
+    WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'true').lower() == 'true'
+    WARMUP_CONNECTIONS = int(os.environ.get('WARMUP_CONNECTIONS', 4 if SERVER_MODE == 'async' else 1))
+    
+    # Deadline por requisição (headers X-Request-Deadline / X-Request-Timeout)
+    # O máximo deve ficar abaixo do timeout do worker do gunicorn (30s)
+    DEADLINE_DEFAULT_SECONDS = float(os.environ.get('DEADLINE_DEFAULT_SECONDS', 25))
+    DEADLINE_MAX_SECONDS = float(os.environ.get('DEADLINE_MAX_SECONDS', 28))
+    DEADLINE_ROUTE_DEFAULTS = os.environ.get('DEADLINE_ROUTE_DEFAULTS', '/pix/create/batch=28')
+    DEADLINE_MIN_UPSTREAM_SECONDS = float(os.environ.get('DEADLINE_MIN_UPSTREAM_SECONDS', 0.5))
+    
+    # Timeout de leitura adaptado ao p99 observado da Duckfy
+    ADAPTIVE_TIMEOUT_ENABLED = os.environ.get('ADAPTIVE_TIMEOUT_ENABLED', 'true').lower() == 'true'
+    ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.environ.get('ADAPTIVE_TIMEOUT_MULTIPLIER', 2.0))
+    ADAPTIVE_TIMEOUT_MIN_SECONDS = float(os.environ.get('ADAPTIVE_TIMEOUT_MIN_SECONDS', 2))
+    ADAPTIVE_TIMEOUT_MIN_SAMPLES = int(os.environ.get('ADAPTIVE_TIMEOUT_MIN_SAMPLES', 50))
+    
+    # Controle de admissão: chamadas simultâneas à Duckfy por worker, fila curta
+    # por prioridade (high, normal, low) e recusa imediata (503) do excedente.
+    # O limite é por worker: no modo sync cada worker atende uma requisição por
+    # vez e o controle não tem o que limitar, então só vem ligado no modo async
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'true' if SERVER_MODE == 'async' else 'false').lower() == 'true'
+    ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', DUCKFY_POOL_SIZE))
+    ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 50 if SERVER_MODE == 'async' else 10))
+    ADMISSION_MAX_QUEUE_SECONDS = float(os.environ.get('ADMISSION_MAX_QUEUE_SECONDS', 2.0))
+    ADMISSION_PRIORITIES = os.environ.get(
+        'ADMISSION_PRIORITIES',
+        '/pix/create/taxa-sedex=high,/pix/create/<sku>=high,/pix/create=normal,/pix/create/batch=low'
+    )
+    # Fração máxima das vagas por classe (lotes, um por vaga, nunca ocupam mais da metade)
+    ADMISSION_CLASS_SHARES = os.environ.get('ADMISSION_CLASS_SHARES', 'low=0.5')
+    
+    # Diretório dos arquivos de estado compartilhado entre workers
+    SHARED_STATE_DIR = os.environ.get('SHARED_STATE_DIR') or None
+    
+    # Reaproveitamento de cobranças PENDING do mesmo CPF/CNPJ (produtos do catálogo
+    # e, opcionalmente, /pix/create pelo valor) dentro da janela e antes do vencimento
+    CHARGE_REUSE_ENABLED = os.environ.get('CHARGE_REUSE_ENABLED', 'false').lower() == 'true'
+    CHARGE_REUSE_WINDOW = int(os.environ.get('CHARGE_REUSE_WINDOW', 900))
+    CHARGE_REUSE_CUSTOM_AMOUNT = os.environ.get('CHARGE_REUSE_CUSTOM_AMOUNT', 'false').lower() == 'true'
+    
+    # Rate limiting por rota e por IP/CPF/e-mail (token bucket)
+    # Formato: rota=dimensão:requisições/segundos,...;rota=...
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'shared')  # shared | memory
+    RATE_LIMIT_RULES = os.environ.get(
+        'RATE_LIMIT_RULES',
+        '/pix/create/taxa-sedex=ip:30/60,cpf:5/600,email:5/600;'
+        '/pix/create/<sku>=ip:30/60,cpf:5/600,email:5/600;'
+        '/pix/create=ip:60/60,cpf:10/600,email:10/600;'
+        '/pix/create/batch=ip:10/60'
+    )
+    RATE_LIMIT_SLOTS = int(os.environ.get('RATE_LIMIT_SLOTS', 65536))
+    # Proxies à frente da API que acrescentam X-Forwarded-For (Render: 1)
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', 0))
+    
+    # Circuit breaker da Duckfy (estado compartilhado entre workers)
+    BREAKER_ENABLED = os.environ.get('BREAKER_ENABLED', 'true').lower() == 'true'
+    BREAKER_WINDOW_SECONDS = float(os.environ.get('BREAKER_WINDOW_SECONDS', 30))
+    BREAKER_MIN_REQUESTS = int(os.environ.get('BREAKER_MIN_REQUESTS', 10))
+    BREAKER_ERROR_RATE = float(os.environ.get('BREAKER_ERROR_RATE', 0.5))
+    BREAKER_SLOW_CALL_SECONDS = float(os.environ.get('BREAKER_SLOW_CALL_SECONDS', 5))
+    BREAKER_SLOW_RATE = float(os.environ.get('BREAKER_SLOW_RATE', 0.8))
+    BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 30))
+    
+    # Idempotência da criação de PIX (identifier / header Idempotency-Key), no banco
+    # local; IDEMPOTENCY_MAX_ENTRIES / IDEMPOTENCY_MAX_BYTES limitam o cache em memória de cada worker
+    IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 600))
+    IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 10000))
+    IDEMPOTENCY_MAX_BYTES = int(os.environ.get('IDEMPOTENCY_MAX_BYTES', 8 * 1024 * 1024))
+    
+    # Criação de PIX em lote (/pix/create/batch)
+    BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 100))
+    BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 10))
+    
+    # Formato da resposta de criação: full (com pix.base64) ou lean (só o código
+    # EMV + pix.qrCodeUrl). Pode ser escolhido por requisição com ?response=
+    # ou Prefer: return=minimal
+    PIX_RESPONSE_MODE = os.environ.get('PIX_RESPONSE_MODE', 'full').lower()
+    # URL pública da API usada em pix.qrCodeUrl e no callbackUrl do webhook
+    # (na Render, RENDER_EXTERNAL_URL já vem definido; vazio = host da requisição,
+    # e os PIX são criados sem callbackUrl)
+    PUBLIC_BASE_URL = (os.environ.get('PUBLIC_BASE_URL') or os.environ.get('RENDER_EXTERNAL_URL', '')).rstrip('/')
+    
+    # Criação assíncrona (Prefer: respond-async): 202 com URL de status, que
+    # aceita long-poll (?wait=) e Server-Sent Events (/pix/<id>/events)
+    ASYNC_ENABLED = os.environ.get('ASYNC_ENABLED', 'true').lower() == 'true'
+    ASYNC_WORKERS = int(os.environ.get('ASYNC_WORKERS', DUCKFY_POOL_SIZE))
+    ASYNC_MAX_PENDING = int(os.environ.get('ASYNC_MAX_PENDING', 1000 if SERVER_MODE == 'async' else 100))
+    ASYNC_JOB_TIMEOUT = float(os.environ.get('ASYNC_JOB_TIMEOUT', 25))
+    ASYNC_JOB_RETENTION_DAYS = int(os.environ.get('ASYNC_JOB_RETENTION_DAYS', 2))
+    # Long-poll e SSE seguram a conexão: no modo sync ocupam o worker inteiro
+    ASYNC_MAX_WAIT_SECONDS = float(os.environ.get('ASYNC_MAX_WAIT_SECONDS', 25 if SERVER_MODE == 'async' else 5))
+    ASYNC_STREAM_MAX_SECONDS = float(os.environ.get('ASYNC_STREAM_MAX_SECONDS', 300 if SERVER_MODE == 'async' else 10))
+    ASYNC_HEARTBEAT_SECONDS = float(os.environ.get('ASYNC_HEARTBEAT_SECONDS', 15))
+    # Intervalo de checagem de mudanças feitas em outro worker
+    ASYNC_POLL_INTERVAL = float(os.environ.get('ASYNC_POLL_INTERVAL', 0.25))
+    
+    # Imagens dos QR Codes (/pix/<id>/qr.png)
+    QR_IMAGE_CACHE_MAX_BYTES = int(os.environ.get('QR_IMAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    QR_IMAGE_RETENTION_DAYS = int(os.environ.get('QR_IMAGE_RETENTION_DAYS', 2))
+    QR_IMAGE_MAX_AGE = int(os.environ.get('QR_IMAGE_MAX_AGE', 86400))
+    
+    # Compressão das respostas JSON (br quando o pacote Brotli está instalado, senão gzip)
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 512))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+    
+    # Cache HTTP dos endpoints de exemplo (/pix/example*)
+    EXAMPLE_CACHE_MAX_AGE = int(os.environ.get('EXAMPLE_CACHE_MAX_AGE', 3600))
+    
+    # Catálogo de produtos de preço fixo (/pix/create/<sku>)
+    CATALOG_PATH = os.environ.get('CATALOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalog.json'))
+    CATALOG_RELOAD_INTERVAL = float(os.environ.get('CATALOG_RELOAD_INTERVAL', 5))
+    
+    # Banco local (SQLite em modo WAL)
+    DATABASE_PATH = os.environ.get('DATABASE_PATH', os.path.join('data', 'api_pix.db'))
+    DATABASE_SYNCHRONOUS = os.environ.get('DATABASE_SYNCHRONOUS', 'FULL')
+    
+    # Registro local de transações e cache de consultas de status
+    CLIENT_HASH_SALT = os.environ.get('CLIENT_HASH_SALT', '')
+    TRANSACTION_CACHE_TTL = float(os.environ.get('TRANSACTION_CACHE_TTL', 2))
+    TRANSACTION_CACHE_MAX_ENTRIES = int(os.environ.get('TRANSACTION_CACHE_MAX_ENTRIES', 10000))
+    
+    # Webhook de confirmação de pagamento (/pix/webhook)
+    WEBHOOK_TOKEN = os.environ.get('WEBHOOK_TOKEN')
+    WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', 2))
+    WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', 50))
+    WEBHOOK_POLL_INTERVAL = float(os.environ.get('WEBHOOK_POLL_INTERVAL', 1.0))
+    WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 5))
+    
+    # Agregados de UTM (/analytics/utm)
+    UTM_BUCKET_SECONDS = int(os.environ.get('UTM_BUCKET_SECONDS', 300))
+    UTM_FLUSH_INTERVAL = float(os.environ.get('UTM_FLUSH_INTERVAL', 10))
+    UTM_RETENTION_DAYS = int(os.environ.get('UTM_RETENTION_DAYS', 30))
+    PAID_STATUSES = os.environ.get('PAID_STATUSES', 'PAID,COMPLETED,APPROVED,CONFIRMED')
+    # Status que encerram a cobrança sem pagamento; qualquer outro é tratado como pendente
+    CLOSED_STATUSES = os.environ.get('CLOSED_STATUSES', 'EXPIRED,CANCELED,CANCELLED,REFUNDED')
+    ANALYTICS_TOKEN = os.environ.get('ANALYTICS_TOKEN')
+    
+    # Exportação server-side de eventos de conversão (vazio = desabilitada)
+    CONVERSION_EXPORT_URL = os.environ.get('CONVERSION_EXPORT_URL', '')
+    CONVERSION_EXPORT_TOKEN = os.environ.get('CONVERSION_EXPORT_TOKEN')
+    CONVERSION_BATCH_SIZE = int(os.environ.get('CONVERSION_BATCH_SIZE', 50))
+    CONVERSION_FLUSH_INTERVAL = float(os.environ.get('CONVERSION_FLUSH_INTERVAL', 2.0))
+    CONVERSION_MAX_ATTEMPTS = int(os.environ.get('CONVERSION_MAX_ATTEMPTS', 5))
+    CONVERSION_TIMEOUT = float(os.environ.get('CONVERSION_TIMEOUT', 5.0))
+    CONVERSION_QUEUE_SIZE = int(os.environ.get('CONVERSION_QUEUE_SIZE', 10000))
+    
+    # Server-Timing e traces por requisição nas rotas de criação de PIX
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+    TRACE_ROUTES = os.environ.get(
+        'TRACE_ROUTES', '/pix/create,/pix/create/taxa-sedex,/pix/create/<sku>,/pix/create/batch'
+    )
+    # Exporter dos spans: vazio/none, file, otlp ou modulo:fabrica
+    TRACE_EXPORTER = os.environ.get('TRACE_EXPORTER', '')
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 1.0))
+    TRACE_FILE_PATH = os.environ.get('TRACE_FILE_PATH', os.path.join('data', 'traces.jsonl'))
+    TRACE_OTLP_ENDPOINT = os.environ.get('TRACE_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+    TRACE_OTLP_HEADERS = os.environ.get('TRACE_OTLP_HEADERS', '')
+    TRACE_SERVICE_NAME = os.environ.get('TRACE_SERVICE_NAME', 'api-pix')
+    TRACE_EXPORT_TIMEOUT = float(os.environ.get('TRACE_EXPORT_TIMEOUT', 5.0))
+    TRACE_BATCH_SIZE = int(os.environ.get('TRACE_BATCH_SIZE', 100))
+    TRACE_FLUSH_INTERVAL = float(os.environ.get('TRACE_FLUSH_INTERVAL', 2.0))
+    TRACE_QUEUE_SIZE = int(os.environ.get('TRACE_QUEUE_SIZE', 10000))
+    
+    # Logs estruturados (JSON, thread própria); registros DEBUG são amostrados
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.01))
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
     
     # Configurações de produção
     JSON_SORT_KEYS = False
@@ -15,6 +210,8 @@ class DevelopmentConfig(Config):
     """Configuração para desenvolvimento"""
     DEBUG = True
     FLASK_ENV = 'development'
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG').upper()
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
 
 class ProductionConfig(Config):
     """Configuração para produção"""
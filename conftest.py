@@ -0,0 +1,127 @@
+"""
+Ambiente dos testes automatizados: o app é importado com banco e estado
+compartilhado em um diretório temporário, a Duckfy é o stub local
+(bench/duckfy_stub.py) e a exportação de conversões vai para o receptor
+local (bench/conversion_receiver.py), ambos em threads deste processo.
+
+test_api.py e test_taxa_sedex.py continuam sendo exemplos contra a API
+publicada e não usam estas fixtures.
+"""
+
+import os
+import sys
+import random
+import tempfile
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+import duckfy_stub  # noqa: E402
+import conversion_receiver  # noqa: E402
+
+WEBHOOK_TOKEN = 'test-webhook-token'
+ANALYTICS_TOKEN = 'test-analytics-token'
+
+
+def _serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+duckfy_stub.configure(status='OK')
+_stub_port = _serve(duckfy_stub.make_server('127.0.0.1', 0))
+_receiver_port = _serve(conversion_receiver.make_server('127.0.0.1', 0))
+_workdir = tempfile.mkdtemp(prefix='api_pix_tests_')
+
+# Lidas pelo config.py na importação do app
+os.environ.update({
+    'FLASK_ENV': 'development',
+    'LOG_LEVEL': 'WARNING',
+    'PUBLIC_KEY': 'test-public-key',
+    'SECRET_KEY': 'test-secret-key',
+    'CLIENT_HASH_SALT': 'test-client-hash-salt',
+    'DUCKFY_BASE_URL': f'http://127.0.0.1:{_stub_port}/api/v1',
+    'DATABASE_PATH': os.path.join(_workdir, 'api_pix.db'),
+    'SHARED_STATE_DIR': _workdir,
+    'PUBLIC_BASE_URL': 'http://testserver',
+    'WEBHOOK_TOKEN': WEBHOOK_TOKEN,
+    'ANALYTICS_TOKEN': ANALYTICS_TOKEN,
+    'RATE_LIMIT_ENABLED': 'false',
+    'CHARGE_REUSE_ENABLED': 'true',
+    'CONVERSION_EXPORT_URL': f'http://127.0.0.1:{_receiver_port}/events',
+    'CONVERSION_FLUSH_INTERVAL': '0.05',
+    'ADMISSION_ENABLED': 'true',
+    'TRACE_EXPORTER': 'file',
+    'TRACE_FILE_PATH': os.path.join(_workdir, 'traces.jsonl'),
+    'TRACE_FLUSH_INTERVAL': '0.05',
+    'ASYNC_STREAM_MAX_SECONDS': '10',
+})
+
+
+@pytest.fixture(scope='session')
+def api():
+    """Módulo app, importado uma vez com o ambiente acima"""
+    import app
+    return app
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
+
+
+@pytest.fixture
+def stub():
+    """Stub da Duckfy; a configuração volta ao padrão (status 'OK', sem latência) ao fim do teste"""
+    yield duckfy_stub
+    duckfy_stub.configure(status='OK')
+
+
+@pytest.fixture
+def receiver():
+    """Receptor de conversões, com os contadores zerados"""
+    conversion_receiver.configure()
+    yield conversion_receiver
+    conversion_receiver.configure()
+
+
+@pytest.fixture
+def trace_file():
+    return os.environ['TRACE_FILE_PATH']
+
+
+@pytest.fixture
+def receiver_url():
+    return f'http://127.0.0.1:{_receiver_port}/events'
+
+
+def make_cpf(rng=random):
+    """CPF aleatório com dígitos verificadores válidos"""
+    digits = [rng.randrange(10) for _ in range(9)]
+    for weight in (10, 11):
+        remainder = sum(d * w for d, w in zip(digits, range(weight, 1, -1))) % 11
+        digits.append(0 if remainder < 2 else 11 - remainder)
+    return ''.join(map(str, digits))
+
+
+@pytest.fixture
+def pix_client():
+    """Dados de um cliente novo a cada teste (CPF próprio, sem reaproveitar cobranças de outros testes)"""
+    return {
+        'name': 'Cliente Teste',
+        'email': 'cliente@example.com',
+        'phone': '(11) 99999-9999',
+        'cpf': make_cpf()
+    }
+
+
+@pytest.fixture
+def created_pix(api, client, pix_client):
+    """PIX criado pela rota síncrona: (identifier, transactionId)"""
+    identifier = api.generate_unique_identifier()
+    response = client.post('/pix/create', json={'identifier': identifier, 'amount': 30, 'client': pix_client})
+    assert response.status_code == 201
+    return identifier, response.get_json()['data']['transactionId']
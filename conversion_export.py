@@ -0,0 +1,231 @@
+import os
+import gzip
+import time
+import queue
+import atexit
+import random
+import hashlib
+import logging
+import threading
+
+import requests
+
+from fast_json import dumps_bytes
+
+logger = logging.getLogger('api_pix.conversions')
+
+
+def _sha256(value):
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def hashed_user_data(client, external_id=None):
+    """user_data no formato das APIs de conversão: e-mail/telefone normalizados e em SHA-256"""
+    user_data = {}
+    email = str(client.get('email') or '').strip().lower()
+    if email:
+        user_data['em'] = [_sha256(email)]
+    phone = ''.join(ch for ch in str(client.get('phone') or '') if ch.isdigit())
+    if phone:
+        user_data['ph'] = [_sha256(phone if phone.startswith('55') else f'55{phone}')]
+    if external_id:
+        user_data['external_id'] = [external_id]
+    return user_data
+
+
+def build_checkout_event(pix_data, result, external_id, event_time):
+    """Evento InitiateCheckout para um PIX recém-criado com tracking UTM"""
+    tracking = (pix_data.get('metadata') or {}).get('tracking')
+    if not tracking:
+        return None
+    return {
+        'event_name': 'InitiateCheckout',
+        'event_time': int(event_time),
+        'event_id': str(pix_data['identifier']),
+        'action_source': 'website',
+        'user_data': hashed_user_data(pix_data.get('client') or {}, external_id),
+        'custom_data': {
+            'currency': 'BRL',
+            'value': pix_data.get('amount'),
+            'content_ids': [str(p.get('id')) for p in pix_data.get('products') or [] if isinstance(p, dict)],
+            'transaction_id': result.get('transactionId'),
+            **{key: value for key, value in tracking.items() if key.startswith('utm_')}
+        }
+    }
+
+
+def build_purchase_event(transaction, event_time):
+    """Evento Purchase para uma transação confirmada pelo webhook"""
+    tracking = transaction.get('utm')
+    if not tracking:
+        return None
+    return {
+        'event_name': 'Purchase',
+        'event_time': int(event_time),
+        'event_id': str(transaction['identifier']),
+        'action_source': 'website',
+        'user_data': {'external_id': [transaction['client_hash']]} if transaction.get('client_hash') else {},
+        'custom_data': {
+            'currency': 'BRL',
+            'value': transaction.get('amount'),
+            'status': transaction.get('status'),
+            **{key: value for key, value in tracking.items() if key.startswith('utm_')}
+        }
+    }
+
+
+class ConversionExporter:
+    """
+    Envia eventos de conversão (server-side) para um endpoint configurável.
+
+    submit() só enfileira uma função que monta o evento: nada é montado,
+    serializado ou enviado na thread da requisição. Uma thread por worker
+    agrupa até batch_size eventos (ou o que chegou em flush_interval),
+    comprime com gzip e faz POST {"data": [...]}. Erros de rede, 429 e 5xx
+    são repetidos com backoff exponencial até max_attempts; outros 4xx
+    descartam o lote. Com a fila cheia o evento é descartado.
+    """
+
+    def __init__(self, endpoint, token=None, batch_size=50, flush_interval=2.0, max_attempts=5,
+                 timeout=5.0, queue_size=10000, compress=True, on_result=None):
+        self.endpoint = endpoint
+        self.token = token
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.queue_size = queue_size
+        self.compress = compress
+        self.on_result = on_result
+        self.dropped = 0
+        self._queue = None
+        self._session = None
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+
+    @property
+    def enabled(self):
+        return bool(self.endpoint)
+
+    def start(self):
+        """Inicia a thread de envio no processo atual (no-op se já iniciada ou desabilitado)"""
+        if not self.enabled:
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.queue_size)
+            self._session = self._build_session()
+            self._started_pid = os.getpid()
+            threading.Thread(target=self._run, name='conversion-exporter', daemon=True).start()
+            atexit.register(self._drain)
+
+    def _build_session(self):
+        session = requests.Session()
+        session.headers.update({'Content-Type': 'application/json'})
+        if self.compress:
+            session.headers['Content-Encoding'] = 'gzip'
+        if self.token:
+            session.headers['Authorization'] = f'Bearer {self.token}'
+        return session
+
+    def submit(self, build_event, *args):
+        """Agenda build_event(*args) -> evento (ou None) para o próximo lote"""
+        if not self.enabled:
+            return False
+        if self._started_pid != os.getpid():
+            self.start()
+        try:
+            self._queue.put_nowait((build_event, args))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self._report('dropped', 1)
+            return False
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                self._send(batch)
+
+    def _collect(self):
+        """Espera o primeiro evento e junta os que chegarem até flush_interval"""
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(items) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return self._build_events(items)
+
+    def _build_events(self, items):
+        events = []
+        for build_event, args in items:
+            try:
+                event = build_event(*args)
+            except Exception as e:
+                logger.error(f"Failed to build conversion event: {str(e)}")
+                continue
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _send(self, events):
+        body = dumps_bytes({'data': events})
+        if self.compress:
+            body = gzip.compress(body, compresslevel=5)
+
+        for attempt in range(1, self.max_attempts + 1):
+            retry_after = None
+            try:
+                response = self._session.post(self.endpoint, data=body, timeout=self.timeout)
+                if response.status_code < 300:
+                    self._report('exported', len(events))
+                    return True
+                if response.status_code != 429 and response.status_code < 500:
+                    logger.error(f"Conversion batch rejected ({response.status_code}): {response.text[:500]}")
+                    self._report('rejected', len(events))
+                    return False
+                retry_after = response.headers.get('Retry-After')
+                error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+
+            if attempt == self.max_attempts or self._stopping:
+                break
+            delay = min(60.0, 0.5 * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            logger.warning(f"Conversion batch failed ({error}); retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s")
+            time.sleep(delay)
+
+        logger.error(f"Conversion batch of {len(events)} events dropped after {attempt} attempts: {error}")
+        self._report('failed', len(events))
+        return False
+
+    def _drain(self):
+        """No encerramento do worker: tenta enviar o que ainda estiver na fila, sem retries longos"""
+        if self._queue is None or self._started_pid != os.getpid():
+            return
+        self._stopping = True
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(items), self.batch_size):
+            events = self._build_events(items[start:start + self.batch_size])
+            if events:
+                self._send(events)
+
+    def _report(self, result, count):
+        if self.on_result is not None:
+            self.on_result(result, count)
@@ -0,0 +1,288 @@
+import os
+import time
+import random
+import hashlib
+import logging
+import threading
+
+from duckfy_client import DuckfyAPIError, DuckfyClient
+from shared_state import SharedRecords
+
+# name_hash, falhas consecutivas, ejeções seguidas, ejetada até (epoch)
+_HEALTH_FORMAT = '<Qqqd'
+
+# Respostas que garantem que a cobrança não foi criada: o PIX pode ir para outra chave
+_FAILOVER_STATUSES = frozenset({401, 403, 429})
+
+
+class Credential:
+    __slots__ = ('name', 'public_key', 'secret_key', 'weight')
+
+    def __init__(self, name, public_key, secret_key, weight=1.0):
+        self.name = name
+        self.public_key = public_key
+        self.secret_key = secret_key
+        self.weight = weight
+
+
+def parse_credentials(value, public_key=None, secret_key=None):
+    """
+    Converte 'conta-a:PUBLIC:SECRET:2,conta-b:PUBLIC:SECRET' em credenciais
+    (o peso é opcional, padrão 1). Vazio = só PUBLIC_KEY/SECRET_KEY, com o
+    nome 'default'.
+    """
+    credentials = []
+    for item in (value or '').split(','):
+        parts = [part.strip() for part in item.split(':')]
+        if len(parts) not in (3, 4) or not all(parts[:3]):
+            if item.strip():
+                raise ValueError("DUCKFY_CREDENTIALS deve seguir o formato nome:public_key:secret_key[:peso],...")
+            continue
+        weight = float(parts[3]) if len(parts) == 4 and parts[3] else 1.0
+        if weight <= 0:
+            raise ValueError(f"Peso inválido para a credencial {parts[0]}")
+        credentials.append(Credential(parts[0], parts[1], parts[2], weight))
+
+    if not credentials and public_key and secret_key:
+        credentials.append(Credential('default', public_key, secret_key))
+    if len({credential.name for credential in credentials}) != len(credentials):
+        raise ValueError("Nomes repetidos em DUCKFY_CREDENTIALS")
+    return credentials
+
+
+def _name_hash(name):
+    return int.from_bytes(hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest(), 'little') | 1
+
+
+class PoolMember:
+    """Uma credencial do pool: cliente (pool de conexões) próprio e chamadas em andamento no worker"""
+
+    __slots__ = ('credential', 'client', 'slot', 'in_flight')
+
+    def __init__(self, credential, client, slot):
+        self.credential = credential
+        self.client = client
+        self.slot = slot
+        self.in_flight = 0
+
+    @property
+    def name(self):
+        return self.credential.name
+
+
+class CredentialPool:
+    """
+    Várias contas da Duckfy atrás da mesma API.
+
+    Cada credencial tem seu DuckfyClient (sessão e pool de conexões
+    próprios). A escolha por chamada é 'least_in_flight' (menos chamadas em
+    andamento no worker, proporcional ao peso) ou 'weighted' (sorteio pelo
+    peso).
+
+    A saúde de cada chave fica em SharedRecords, compartilhada entre os
+    workers: eject_failures falhas seguidas (conexão, timeout, 5xx, 401/403)
+    ou um 429 tiram a chave do rodízio por eject_seconds, dobrando a cada
+    ejeção seguida até max_eject_seconds (429 respeita o Retry-After).
+    Passado o prazo a chave volta, e um sucesso zera o histórico. Se todas
+    estiverem ejetadas, usa a que volta primeiro.
+    """
+
+    def __init__(self, credentials, client_factory, storage, strategy='least_in_flight',
+                 eject_failures=5, eject_seconds=30, max_eject_seconds=300, on_result=None):
+        if not credentials:
+            raise ValueError("Nenhuma credencial da Duckfy configurada")
+        if strategy not in ('least_in_flight', 'weighted'):
+            raise ValueError(f"Estratégia de credenciais inválida: {strategy}")
+        self.members = [PoolMember(credential, client_factory(credential), slot)
+                        for slot, credential in enumerate(credentials)]
+        self.storage = storage
+        self.strategy = strategy
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.on_result = on_result
+        self._hashes = [_name_hash(member.name) for member in self.members]
+        self._lock = threading.Lock()
+
+    @property
+    def connect_timeout(self):
+        return self.members[0].client.connect_timeout
+
+    @property
+    def read_timeout(self):
+        return self.members[0].client.read_timeout
+
+    def _health(self, member):
+        """(falhas, ejeções, ejetada_até); registro de outra credencial no slot conta como novo"""
+        name_hash, failures, ejections, ejected_until = self.storage.read(member.slot)
+        if name_hash != self._hashes[member.slot]:
+            return 0, 0, 0.0
+        return failures, ejections, ejected_until
+
+    def _choose(self, exclude, now):
+        candidates = [member for member in self.members if member.name not in exclude]
+        if not candidates:
+            return None
+        health = {member.slot: self._health(member) for member in candidates}
+        healthy = [member for member in candidates if health[member.slot][2] <= now]
+        if not healthy:
+            # Todas ejetadas: melhor tentar a que volta primeiro do que recusar o PIX
+            return min(candidates, key=lambda member: health[member.slot][2])
+
+        if self.strategy == 'weighted' or len(healthy) == 1:
+            return random.choices(healthy, weights=[member.credential.weight for member in healthy])[0]
+        scores = [(member.in_flight + 1) / member.credential.weight for member in healthy]
+        best = min(scores)
+        return random.choice([member for member, score in zip(healthy, scores) if score == best])
+
+    def acquire(self, exclude=()):
+        with self._lock:
+            member = self._choose(exclude, time.time())
+            if member is not None:
+                member.in_flight += 1
+            return member
+
+    def release(self, member, failed=False, eject_for=None):
+        """Devolve a chave e registra o resultado da chamada na saúde compartilhada"""
+        with self._lock:
+            member.in_flight -= 1
+        if not failed and eject_for is None:
+            # Caminho comum: só escreve se havia falhas a zerar
+            if self._health(member)[:2] == (0, 0):
+                return
+        now = time.time()
+        with self.storage.locked():
+            failures, ejections, ejected_until = self._health(member)
+            if not failed and eject_for is None:
+                self.storage.write((self._hashes[member.slot], 0, 0, ejected_until), member.slot)
+                return
+
+            if ejected_until > now:
+                return  # Já ejetada (chamada iniciada antes, ou todas as chaves fora)
+            failures += 1
+            if eject_for is None and failures >= self.eject_failures:
+                eject_for = min(self.max_eject_seconds, self.eject_seconds * 2 ** ejections)
+            if eject_for is not None:
+                ejections += 1
+                ejected_until = now + eject_for
+                failures = 0
+                logging.warning(f"Duckfy credential {member.name} ejected for {eject_for:.0f}s")
+            self.storage.write((self._hashes[member.slot], failures, ejections, ejected_until), member.slot)
+
+    def _classify(self, error):
+        """(falhou, ejetar por segundos) para um erro da Duckfy"""
+        status = error.status_code
+        if status == 429:
+            retry_after = getattr(error, 'retry_after', None)
+            return True, float(retry_after) if retry_after else self.eject_seconds
+        if status in (401, 403):
+            return True, self.max_eject_seconds
+        return status is None or status >= 500, None
+
+    def call(self, func):
+        """
+        Executa func(client) com uma chave do pool e retorna (nome da chave, resultado).
+
+        Em 401/403/429 (cobrança com certeza não criada) tenta uma vez com
+        outra chave; demais erros são propagados sem repetir o POST.
+        """
+        tried = []
+        while True:
+            member = self.acquire(exclude=tried)
+            if member is None:
+                raise last_error
+            tried.append(member.name)
+            try:
+                result = func(member.client)
+            except DuckfyAPIError as e:
+                failed, eject_for = self._classify(e)
+                self.release(member, failed, eject_for)
+                self._report(member, 'error' if failed else 'client_error')
+                if e.status_code not in _FAILOVER_STATUSES or len(tried) >= min(2, len(self.members)):
+                    raise
+                last_error = e
+                continue
+            except Exception:
+                self.release(member, True)
+                self._report(member, 'error')
+                raise
+            self.release(member)
+            self._report(member, 'success')
+            return member.name, result
+
+    def _report(self, member, result):
+        if self.on_result is not None:
+            self.on_result(member.name, result)
+
+    def warm_up(self, connections=1):
+        """Abre conexões de cada chave (DuckfyClient.warm_up); retorna o total aberto"""
+        return sum(member.client.warm_up(connections) for member in self.members)
+
+    def snapshot(self):
+        """Estado das chaves (usado em /health)"""
+        now = time.time()
+        keys = []
+        for member in self.members:
+            failures, ejections, ejected_until = self._health(member)
+            entry = {
+                'name': member.name,
+                'weight': member.credential.weight,
+                'in_flight': member.in_flight,
+                'consecutive_failures': failures,
+                'state': 'ejected' if ejected_until > now else 'active'
+            }
+            if ejected_until > now:
+                entry['retry_after'] = round(ejected_until - now, 1)
+            keys.append(entry)
+        return {'strategy': self.strategy, 'keys': keys}
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_credential_pool(app_config, response_hooks=(), on_result=None):
+    """
+    Retorna o pool de credenciais do worker atual, criando-o no primeiro uso.
+
+    Como get_circuit_breaker, verifica o PID para que um worker criado por
+    fork (gunicorn --preload) nunca reutilize sockets do processo pai.
+    """
+    global _pool, _pool_pid
+
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        # Como em get_circuit_breaker: só uma thread cria o pool do worker
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                credentials = parse_credentials(
+                    app_config['DUCKFY_CREDENTIALS'], app_config['PUBLIC_KEY'], app_config['DUCKFY_SECRET_KEY']
+                )
+
+                def client_factory(credential):
+                    return DuckfyClient(
+                        base_url=app_config['DUCKFY_BASE_URL'],
+                        public_key=credential.public_key,
+                        secret_key=credential.secret_key,
+                        pool_size=app_config['DUCKFY_POOL_SIZE'],
+                        connect_timeout=app_config['DUCKFY_CONNECT_TIMEOUT'],
+                        read_timeout=app_config['DUCKFY_READ_TIMEOUT'],
+                        tcp_keepalive=app_config['DUCKFY_TCP_KEEPALIVE'],
+                        debug=app_config.get('DEBUG', False),
+                        response_hooks=response_hooks
+                    )
+
+                _pool = CredentialPool(
+                    credentials,
+                    client_factory,
+                    SharedRecords('duckfy_credentials.v1', _HEALTH_FORMAT, slots=max(1, len(credentials)),
+                                  directory=app_config['SHARED_STATE_DIR']),
+                    strategy=app_config['DUCKFY_KEY_STRATEGY'],
+                    eject_failures=app_config['DUCKFY_KEY_EJECT_FAILURES'],
+                    eject_seconds=app_config['DUCKFY_KEY_EJECT_SECONDS'],
+                    max_eject_seconds=app_config['DUCKFY_KEY_MAX_EJECT_SECONDS'],
+                    on_result=on_result
+                )
+                _pool_pid = pid
+    return _pool
@@ -0,0 +1,52 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteDatabase:
+    """
+    Acesso ao banco local SQLite em modo WAL.
+
+    Cada thread (e cada processo, após o fork do gunicorn) abre sua própria
+    conexão; o modo WAL permite leituras concorrentes com um escritor.
+    Conexões ficam em autocommit; use transaction() para agrupar escritas.
+    """
+
+    def __init__(self, path, synchronous='FULL'):
+        self.path = path
+        self.synchronous = synchronous
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def execute(self, sql, params=()):
+        return self.connect().execute(sql, params)
+
+    def executemany(self, sql, params):
+        return self.connect().executemany(sql, params)
+
+    def transaction(self):
+        """Context manager de transação IMMEDIATE (reserva o lock de escrita)"""
+        return _Transaction(self.connect())
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
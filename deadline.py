@@ -0,0 +1,132 @@
+import time
+import threading
+from collections import deque
+from duckfy_client import DuckfyAPIError
+
+
+class DeadlineExceeded(DuckfyAPIError):
+    """O orçamento de tempo da requisição acabou antes da chamada à Duckfy"""
+    def __init__(self):
+        super().__init__(
+            message='Tempo limite da requisição esgotado antes de chamar a gateway',
+            status_code=504,
+            error_code='DEADLINE_EXCEEDED'
+        )
+
+
+class Deadline:
+    """Instante (epoch em segundos) até o qual o chamador aceita esperar"""
+    __slots__ = ('expires_at',)
+
+    def __init__(self, expires_at):
+        self.expires_at = expires_at
+
+    def remaining(self):
+        return self.expires_at - time.time()
+
+
+def parse_route_defaults(value):
+    """Converte '/pix/create=20,/pix/create/batch=28' em {rota: segundos}"""
+    defaults = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            route, seconds = item.split('=', 1)
+            defaults[route.strip()] = float(seconds)
+    return defaults
+
+
+def _parse_request_start(value):
+    """
+    Interpreta X-Request-Start (formato 't=1718000000123' ou '1718000000.123'),
+    em segundos, milissegundos ou microssegundos desde a época.
+    """
+    try:
+        started = float(value.strip().lstrip('t='))
+    except (AttributeError, ValueError):
+        return None
+    while started > 1e11:  # ms / µs -> s
+        started /= 1000
+    return started
+
+
+def deadline_from_request(headers, route, default_seconds, route_defaults, max_seconds):
+    """
+    Calcula o deadline da requisição.
+
+    Ordem de precedência: X-Request-Deadline (epoch absoluto), X-Request-Timeout
+    (segundos relativos), padrão da rota, padrão global. O início é o
+    X-Request-Start do proxy, quando existe, para descontar o tempo de fila.
+    O orçamento nunca passa de max_seconds (o timeout do worker).
+    """
+    now = time.time()
+    started = _parse_request_start(headers.get('X-Request-Start')) or now
+    started = min(started, now)
+    latest = started + max_seconds
+
+    try:
+        if headers.get('X-Request-Deadline'):
+            return Deadline(min(float(headers['X-Request-Deadline']), latest))
+        if headers.get('X-Request-Timeout'):
+            return Deadline(min(started + float(headers['X-Request-Timeout']), latest))
+    except ValueError:
+        pass
+
+    budget = route_defaults.get(route, default_seconds)
+    return Deadline(min(started + budget, latest))
+
+
+class LatencyTracker:
+    """
+    Janela das latências recentes da Duckfy, usada para adaptar o timeout
+    de leitura ao p99 observado.
+    """
+
+    def __init__(self, size=1000, min_samples=50, multiplier=2.0,
+                 floor=2.0, ceiling=25.0, recompute_every=50):
+        self.min_samples = min_samples
+        self.multiplier = multiplier
+        self.floor = floor
+        self.ceiling = ceiling
+        self.recompute_every = recompute_every
+        self._samples = deque(maxlen=size)
+        self._since_recompute = 0
+        self._p99 = None
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._since_recompute += 1
+            if self._since_recompute >= self.recompute_every and len(self._samples) >= self.min_samples:
+                ordered = sorted(self._samples)
+                self._p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+                self._since_recompute = 0
+
+    @property
+    def p99(self):
+        return self._p99
+
+    def read_timeout(self):
+        """Timeout de leitura adaptado: p99 * multiplier, limitado a [floor, ceiling]"""
+        if self._p99 is None:
+            return self.ceiling
+        return max(self.floor, min(self.ceiling, self._p99 * self.multiplier))
+
+
+def upstream_timeouts(deadline, connect_timeout, read_timeout, min_budget):
+    """
+    Divide o orçamento restante entre connect e read.
+
+    Levanta DeadlineExceeded se sobrar menos que min_budget segundos.
+    """
+    if deadline is None:
+        return (connect_timeout, read_timeout)
+
+    remaining = deadline.remaining()
+    if remaining < min_budget:
+        raise DeadlineExceeded()
+
+    # connect + read nunca passa do orçamento; o connect fica com no máximo 1/4
+    connect = min(connect_timeout, remaining / 4)
+    read = min(read_timeout, remaining - connect)
+    return (connect, read)
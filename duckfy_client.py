@@ -0,0 +1,203 @@
+import ssl
+import time
+import socket
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.wait import wait_for_read
+from fast_json import dumps_bytes, loads
+
+logger = logging.getLogger('api_pix.duckfy')
+
+
+class DuckfyAPIError(Exception):
+    """Exceção customizada para erros da API Duckfy"""
+    def __init__(self, message, status_code=None, error_code=None, details=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.error_code = error_code
+        self.details = details
+
+
+class DuckfyClient:
+    """
+    Cliente HTTP da Duckfy com pool de conexões keep-alive.
+
+    Cada worker do gunicorn mantém uma instância por credencial (ver
+    credential_pool.get_credential_pool), reaproveitando conexões TCP/TLS
+    entre as requisições.
+    """
+
+    def __init__(self, base_url, public_key, secret_key, pool_size=10,
+                 connect_timeout=3.05, read_timeout=25, tcp_keepalive=True,
+                 debug=False, response_hooks=()):
+        self.base_url = base_url.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.debug = debug
+        self.session = self._build_session(public_key, secret_key, pool_size, tcp_keepalive)
+        self.session.hooks['response'] = list(response_hooks)
+
+    def _build_session(self, public_key, secret_key, pool_size, tcp_keepalive):
+        session = requests.Session()
+        session.headers.update({
+            'x-public-key': public_key,
+            'x-secret-key': secret_key,
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive'
+        })
+
+        socket_options = list(HTTPConnection.default_socket_options)
+        if tcp_keepalive:
+            socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+
+        # Sem retries automáticos: um POST repetido pode gerar cobrança duplicada
+        adapter = _KeepAliveAdapter(
+            socket_options=socket_options,
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=False,
+            max_retries=0
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @property
+    def timeout(self):
+        """Timeout (connect, read) usado nas chamadas para a Duckfy"""
+        return (self.connect_timeout, self.read_timeout)
+
+    def create_pix(self, pix_data, timeout=None):
+        """
+        Cria um pagamento PIX na Duckfy e retorna o JSON da resposta.
+
+        timeout (connect, read) substitui o padrão do cliente nesta chamada.
+        """
+        url = f"{self.base_url}/gateway/pix/receive"
+
+        # Payload completo só em modo debug; dados do cliente e chaves são
+        # mascarados pelo pipeline de log (structured_logging)
+        if self.debug and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Duckfy request", extra={'fields': {'url': url, 'payload': pix_data}})
+        else:
+            logger.debug(f"Creating PIX payment for amount: {pix_data.get('amount')}")
+
+        try:
+            response = self.session.post(url, data=dumps_bytes(pix_data), timeout=timeout or self.timeout)
+        except requests.Timeout as e:
+            logger.error(f"Timeout calling Duckfy API: {str(e)}")
+            raise DuckfyAPIError(
+                f"Tempo limite esgotado aguardando a gateway: {str(e)}",
+                status_code=504,
+                error_code='UPSTREAM_TIMEOUT'
+            )
+        except requests.RequestException as e:
+            logger.error(f"Connection error with Duckfy API: {str(e)}")
+            raise DuckfyAPIError(f"Erro de conexão com a gateway: {str(e)}")
+
+        if self.debug and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Duckfy response", extra={'fields': {
+                'status_code': response.status_code,
+                'body': response.text[:4096]
+            }})
+        else:
+            logger.debug(f"Duckfy API response status: {response.status_code}")
+
+        if response.status_code in [200, 201]:
+            return loads(response.content)
+
+        error_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
+        error = DuckfyAPIError(
+            message=error_data.get('message', f'Erro da gateway (Status: {response.status_code}). Response: {response.text}'),
+            status_code=response.status_code,
+            error_code=error_data.get('errorCode'),
+            details=error_data.get('details')
+        )
+        retry_after = response.headers.get('Retry-After', '')
+        if response.status_code in (429, 503) and retry_after.isdigit():
+            error.retry_after = int(retry_after)
+        raise error
+
+    def warm_up(self, connections=1):
+        """
+        Resolve o DNS e abre até `connections` conexões (TCP + TLS) com a
+        Duckfy antes da primeira requisição, deixando-as ociosas no pool.
+
+        Retorna quantas conexões foram abertas; falhas só são registradas
+        (a conexão é aberta normalmente no primeiro PIX).
+        """
+        url = f"{self.base_url}/"
+        adapter = self.session.get_adapter(url)
+        pool = adapter.poolmanager.connection_from_url(url)
+        # Mesma verificação de certificado que o requests aplica a cada envio
+        # (session.verify, REQUESTS_CA_BUNDLE)
+        settings = self.session.merge_environment_settings(url, {}, None, None, None)
+        adapter.cert_verify(pool, url, settings['verify'], settings['cert'])
+
+        taken = []
+        opened = 0
+        try:
+            for _ in range(max(0, connections)):
+                conn = pool._get_conn()
+                taken.append(conn)
+                conn.timeout = self.connect_timeout
+                conn.connect()
+                opened += 1
+            _discard_post_handshake_records(taken, wait=min(self.connect_timeout, 0.3))
+        except Exception as e:
+            logger.warning(f"Duckfy warm-up failed after {opened} connections: {str(e)}")
+        finally:
+            for conn in taken:
+                pool._put_conn(conn)
+        return opened
+
+    def close(self):
+        self.session.close()
+
+
+def _discard_post_handshake_records(connections, wait):
+    """
+    No TLS 1.3 o servidor envia session tickets logo após o handshake. Sem
+    processá-los, o socket ocioso fica "legível" e o urllib3 descarta a
+    conexão como caída no primeiro uso, refazendo o handshake. Lê esses
+    registros (que não trazem dados da aplicação) sem bloquear; conexões
+    que o servidor fechou, ou com dados inesperados, são fechadas.
+    """
+    deadline = time.monotonic() + wait
+    for conn in connections:
+        sock = conn.sock
+        if not isinstance(sock, ssl.SSLSocket):
+            continue
+        timeout = sock.gettimeout()
+        sock.settimeout(0)
+        try:
+            while wait_for_read(sock, timeout=max(0.0, deadline - time.monotonic())):
+                try:
+                    sock.recv(1)
+                except ssl.SSLWantReadError:
+                    # Os tickets chegam em sequência; depois do primeiro, espera pouco pelos demais
+                    deadline = min(deadline, time.monotonic() + 0.05)
+                    continue
+                conn.close()
+                break
+        except OSError:
+            conn.close()
+        if conn.sock is not None:
+            sock.settimeout(timeout)
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter que repassa opções de socket (TCP keep-alive) ao pool do urllib3"""
+
+    def __init__(self, socket_options=None, **kwargs):
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.socket_options is not None:
+            kwargs['socket_options'] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
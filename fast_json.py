@@ -0,0 +1,109 @@
+import json
+import hashlib
+
+from flask.json.provider import DefaultJSONProvider
+
+from compression import available_encodings, compress_body
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele tudo usa o json da stdlib
+    orjson = None
+
+
+def dumps_bytes(obj, indent=False):
+    """Serializa obj em JSON (UTF-8), usando orjson quando disponível"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+        except TypeError:
+            pass  # tipo não suportado pelo orjson (ex.: Decimal); cai no json da stdlib
+    return json.dumps(
+        obj,
+        ensure_ascii=False,
+        default=DefaultJSONProvider.default,
+        indent=2 if indent else None,
+        separators=None if indent else (',', ':')
+    ).encode('utf-8')
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Provider JSON do Flask baseado em orjson (jsonify, request.get_json).
+
+    Sem orjson instalado, se comporta como o DefaultJSONProvider.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(dumps_bytes(obj, indent=indent) + b'\n', mimetype=self.mimetype)
+
+
+class StaticJSON:
+    """
+    Corpo JSON serializado uma única vez, servido como bytes com ETag.
+
+    Requisições com If-None-Match igual ao ETag recebem 304 sem corpo
+    (a comparação é fraca: a resposta comprimida leva o ETag como W/).
+
+    Com compression (kwargs de compression.compress_body mais min_size), o
+    corpo também é comprimido uma única vez por codificação, no primeiro
+    pedido que a aceita, e as variantes ficam guardadas junto do ETag.
+    """
+
+    def __init__(self, obj, max_age=3600, compression=None):
+        self.body = dumps_bytes(obj) + b'\n'
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.cache_control = f'public, max-age={int(max_age)}'
+        self.compression = dict(compression) if compression is not None else None
+        self._compressed = {}  # codificação -> corpo comprimido (do corpo deste ETag)
+
+    def compressed(self, encoding):
+        """Corpo comprimido com encoding, calculado no primeiro uso"""
+        body = self._compressed.get(encoding)
+        if body is None:
+            options = {key: value for key, value in self.compression.items() if key != 'min_size'}
+            body = self._compressed[encoding] = compress_body(self.body, encoding, **options)
+        return body
+
+    def _encoding(self, request):
+        if self.compression is None or len(self.body) < self.compression.get('min_size', 0):
+            return None
+        return request.accept_encodings.best_match(available_encodings())
+
+    def response(self, request, response_class):
+        if request.if_none_match.contains_weak(self.etag):
+            response = response_class(status=304)
+            response.set_etag(self.etag)
+        else:
+            encoding = self._encoding(request)
+            if encoding is None:
+                response = response_class(self.body, mimetype='application/json')
+                response.set_etag(self.etag)
+            else:
+                response = response_class(self.compressed(encoding), mimetype='application/json')
+                response.headers['Content-Encoding'] = encoding
+                response.set_etag(self.etag, weak=True)
+            if self.compression is not None:
+                response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = self.cache_control
+        return response
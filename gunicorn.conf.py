@@ -0,0 +1,56 @@
+# Configuração do Gunicorn para a API PIX Duckfy
+#
+# SERVER_MODE=sync  (padrão) -> workers síncronos, um request por worker
+# SERVER_MODE=async          -> workers gevent; a chamada à Duckfy cede o
+#                               controle enquanto espera a rede, permitindo
+#                               centenas de PIX em andamento por processo
+import os
+import shutil
+import tempfile
+
+SERVER_MODE = os.environ.get('SERVER_MODE', 'sync').lower()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+# O app já escreve uma linha JSON por requisição (structured_logging);
+# defina GUNICORN_ACCESS_LOG=- para ter também o access log do gunicorn
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+
+# Importa o app uma vez no master e faz fork dos workers já carregados
+# (boot mais rápido e memória compartilhada). Só no modo sync: com gevent o
+# monkey patching precisa acontecer antes de importar requests/ssl.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true' and SERVER_MODE != 'async'
+
+if SERVER_MODE == 'async':
+    worker_class = 'gevent'
+    worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
+else:
+    worker_class = 'sync'
+
+# Métricas Prometheus agregadas entre workers: cada worker grava em arquivos
+# neste diretório (a variável precisa existir antes do fork dos workers)
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'api_pix_metrics')
+)
+
+
+def on_starting(server):
+    """Limpa métricas de execuções anteriores antes de criar os workers"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    """Aquece o worker (conexões com a Duckfy etc.) e inicia as threads de background"""
+    import app
+    if app.app.config['WARMUP_ENABLED']:
+        app.warm_up_worker()
+    app.start_background_workers()
@@ -0,0 +1,202 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+
+
+class IdempotencyConflict(Exception):
+    """Chave de idempotência reutilizada com um corpo de requisição diferente"""
+
+
+class _InFlight:
+    """Chamada em andamento para uma chave; duplicatas aguardam o resultado"""
+    __slots__ = ('fingerprint', 'done', 'result', 'error')
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class IdempotencyCache:
+    """
+    Idempotência da criação de PIX, compartilhada entre os workers.
+
+    - Cada chave é reservada na tabela idempotency_keys (SQLite) antes da
+      chamada: uma duplicata que cai em outro worker encontra a reserva e
+      aguarda o resultado em vez de criar outra cobrança
+    - Uma chave repetida dentro do TTL retorna a resposta armazenada; as
+      já vistas pelo worker ficam também em um LRU em memória, limitado a
+      max_entries respostas e max_bytes de JSON (as respostas completas
+      trazem o QR Code em base64)
+    - Duplicatas concorrentes no mesmo worker aguardam a chamada em andamento
+    - Apenas sucessos são armazenados: em erro a reserva é apagada e o
+      erro é repassado a quem aguardava no worker; em outro worker, a
+      duplicata tenta de novo
+    - Uma reserva sem resultado após pending_timeout (worker morto no meio
+      da chamada) pode ser assumida por outra requisição
+    """
+
+    def __init__(self, db, max_entries=10000, max_bytes=8 * 1024 * 1024, ttl=600, pending_timeout=35,
+                 wait_timeout=25, poll_interval=0.05):
+        self.db = db
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._entries = OrderedDict()  # key -> (expires_at, fingerprint, result, tamanho do JSON)
+        self._bytes = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._create_schema()
+
+    def _create_schema(self):
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                state TEXT NOT NULL,
+                result TEXT,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+
+    def execute(self, key, fingerprint, func):
+        """
+        Executa func() uma única vez por chave.
+
+        Retorna (resultado, replayed), onde replayed indica que o resultado
+        veio do cache ou de uma chamada concorrente.
+        """
+        with self._lock:
+            cached = self._get(key)
+            if cached is not None:
+                self._check_fingerprint(cached[1], fingerprint)
+                return cached[2], True
+
+            pending = self._in_flight.get(key)
+            if pending is None:
+                pending = _InFlight(fingerprint)
+                self._in_flight[key] = pending
+                owner = True
+            else:
+                self._check_fingerprint(pending.fingerprint, fingerprint)
+                owner = False
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result, True
+
+        replayed = False
+        try:
+            claimed_at, encoded = self._claim(key, fingerprint)
+            if claimed_at is None:
+                pending.result, replayed = json.loads(encoded), True
+            else:
+                try:
+                    pending.result = func()
+                except Exception:
+                    self.db.execute('DELETE FROM idempotency_keys WHERE key = ? AND created_at = ?', (key, claimed_at))
+                    raise
+                encoded = json.dumps(pending.result, ensure_ascii=False)
+                self.db.execute(
+                    "UPDATE idempotency_keys SET state = 'done', result = ? WHERE key = ? AND created_at = ?",
+                    (encoded, key, claimed_at)
+                )
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                if pending.error is None:
+                    self._set(key, fingerprint, pending.result, len(encoded))
+            pending.done.set()
+
+        return pending.result, replayed
+
+    def _claim(self, key, fingerprint):
+        """
+        Reserva a chave no banco. Retorna (instante da reserva, None) para
+        quem deve chamar func(), ou (None, resultado em JSON) se outro
+        worker já concluiu a mesma chave.
+        """
+        give_up = time.monotonic() + self.wait_timeout
+        while True:
+            now = time.time()
+            cursor = self.db.execute(
+                'INSERT INTO idempotency_keys (key, fingerprint, state, created_at, expires_at) '
+                "VALUES (?, ?, 'pending', ?, ?) ON CONFLICT(key) DO NOTHING",
+                (key, fingerprint, now, now + self.ttl)
+            )
+            if cursor.rowcount == 1:
+                self._prune(now)
+                return now, None
+
+            row = self.db.execute(
+                'SELECT fingerprint, state, result, created_at, expires_at FROM idempotency_keys WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                continue  # Reserva apagada (erro) entre o INSERT e o SELECT
+            stored_fingerprint, state, result, created_at, expires_at = row
+
+            expired = expires_at < now or (state == 'pending' and now - created_at > self.pending_timeout)
+            if expired:
+                cursor = self.db.execute(
+                    "UPDATE idempotency_keys SET fingerprint = ?, state = 'pending', result = NULL, "
+                    'created_at = ?, expires_at = ? WHERE key = ? AND created_at = ?',
+                    (fingerprint, now, now + self.ttl, key, created_at)
+                )
+                if cursor.rowcount == 1:
+                    return now, None
+                continue
+
+            self._check_fingerprint(stored_fingerprint, fingerprint)
+            if state == 'done':
+                return None, result
+            if time.monotonic() >= give_up:
+                raise IdempotencyConflict("Requisição com a mesma chave de idempotência ainda em processamento")
+            time.sleep(self.poll_interval)
+
+    def _prune(self, now):
+        if now - self._last_prune > 3600:
+            self._last_prune = now
+            self.db.execute('DELETE FROM idempotency_keys WHERE expires_at < ?', (now,))
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            self._bytes -= entry[3]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _set(self, key, fingerprint, result, size):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[3]
+        if size > self.max_bytes:
+            return  # Fica só no banco
+        self._entries[key] = (time.monotonic() + self.ttl, fingerprint, result, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted[3]
+
+    @staticmethod
+    def _check_fingerprint(stored, fingerprint):
+        if stored != fingerprint:
+            raise IdempotencyConflict("Chave de idempotência já utilizada com dados diferentes")
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,78 @@
+import os
+import time
+import threading
+
+# Base32 de Crockford (sem I, L, O, U): a ordem dos caracteres é a ordem ASCII,
+# então comparar as strings equivale a comparar os valores
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+IDENTIFIER_LENGTH = 26
+
+_RANDOM_CHARS = 16
+
+# Byte aleatório -> caractere: 256 é múltiplo de 32, então cada caractere
+# sai uniforme e carrega exatamente 5 bits (16 caracteres = 80 bits)
+_RANDOM_TABLE = bytes(ord(ALPHABET[byte % 32]) for byte in range(256))
+
+
+def _encode_time(ms):
+    """48 bits de milissegundos -> 10 caracteres"""
+    return ''.join(ALPHABET[(ms >> shift) & 31] for shift in range(45, -1, -5))
+
+
+def identifier_time(identifier):
+    """Instante (epoch em segundos) em que um identificador foi gerado; None se não for deste formato"""
+    encoded = identifier[-IDENTIFIER_LENGTH:-_RANDOM_CHARS]
+    if len(encoded) != 10 or any(ch not in ALPHABET for ch in encoded):
+        return None
+    ms = 0
+    for ch in encoded:
+        ms = (ms << 5) | ALPHABET.index(ch)
+    return ms / 1000
+
+
+class IdentifierGenerator:
+    """
+    Identificadores de transação no formato do ULID: 48 bits de
+    milissegundos + 80 bits aleatórios, em 26 caracteres de base32.
+
+    Ordenados pelo tempo de criação (em milissegundos), os identificadores
+    novos entram sempre no fim dos índices que os usam como chave. Os 80
+    bits aleatórios por identificador dispensam coordenação entre workers e
+    servidores (colisão exige o mesmo milissegundo e os mesmos 80 bits) e
+    não deixam adivinhar o identificador de outro cliente.
+
+    A parte aleatória vem de os.urandom em blocos de batch identificadores,
+    já convertidos para base32 de uma vez: cada identificador custa uma
+    fatia de string. O bloco é descartado no fork, e um worker nunca repete
+    a sequência do processo pai.
+    """
+
+    def __init__(self, batch=4096):
+        self.batch = batch
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._pool = ''
+        self._offset = 0
+        self._time = (-1, '')  # (ms, ms codificado)
+
+    def _random(self):
+        with self._lock:
+            if self._offset >= len(self._pool):
+                self._pool = os.urandom(_RANDOM_CHARS * self.batch).translate(_RANDOM_TABLE).decode('ascii')
+                self._offset = 0
+            offset = self._offset
+            self._offset += _RANDOM_CHARS
+            return self._pool[offset:offset + _RANDOM_CHARS]
+
+    def new(self, prefix=''):
+        """Novo identificador, opcionalmente com prefixo (ex.: 'SEDEX_')"""
+        ms = time.time_ns() // 1_000_000
+        cached = self._time
+        if cached[0] != ms:
+            cached = (ms, _encode_time(ms))
+            self._time = cached
+        return prefix + cached[1] + self._random()
@@ -0,0 +1,201 @@
+import os
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+
+# Com PROMETHEUS_MULTIPROC_DIR definido (ver gunicorn.conf.py) cada worker grava
+# suas métricas em arquivos nesse diretório e /metrics agrega todos eles
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, .75, 1, 1.5, 2.5, 5, 10, 20, 30)
+STAGE_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUESTS = Counter(
+    'pix_http_requests_total',
+    'Requisições HTTP recebidas',
+    ['route', 'method', 'status']
+)
+HTTP_LATENCY = Histogram(
+    'pix_http_request_duration_seconds',
+    'Latência das requisições HTTP por rota',
+    ['route'],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge(
+    'pix_http_requests_in_flight',
+    'Requisições HTTP em andamento',
+    ['route'],
+    multiprocess_mode='livesum'
+)
+STAGE_LATENCY = Histogram(
+    'pix_stage_duration_seconds',
+    'Latência por etapa da criação de PIX (validation, utm, upstream)',
+    ['stage'],
+    buckets=STAGE_BUCKETS
+)
+UPSTREAM_RESPONSES = Counter(
+    'duckfy_upstream_responses_total',
+    'Respostas da Duckfy por status HTTP (timeout/error quando não houve resposta)',
+    ['status']
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    'duckfy_upstream_in_flight',
+    'Chamadas à Duckfy em andamento',
+    multiprocess_mode='livesum'
+)
+CREDENTIAL_CALLS = Counter(
+    'duckfy_credential_calls_total',
+    'Chamadas à Duckfy por credencial e resultado (success, client_error, error)',
+    ['credential', 'result']
+)
+ADMISSION = Counter(
+    'pix_admission_total',
+    'Decisões do controle de admissão por prioridade (admitted, rejected, timeout, shed)',
+    ['priority', 'result']
+)
+ASYNC_JOBS = Counter(
+    'pix_async_jobs_total',
+    'Criações assíncronas (Prefer: respond-async) por resultado (accepted, replayed, rejected, created, failed)',
+    ['result']
+)
+RATE_LIMITED = Counter(
+    'http_rate_limited_total',
+    'Requisições recusadas com 429 pelo rate limiting',
+    ['route', 'dimension']
+)
+CHARGES_REUSED = Counter(
+    'pix_charges_reused_total',
+    'Cobranças PENDING devolvidas de novo ao mesmo cliente sem chamar a Duckfy',
+    ['route']
+)
+CONVERSION_EVENTS = Counter(
+    'conversion_events_total',
+    'Eventos de conversão server-side por resultado (exported, rejected, failed, dropped)',
+    ['result']
+)
+RESPONSE_BYTES = Counter(
+    'http_response_body_bytes_total',
+    'Bytes dos corpos JSON comprimidos, antes (identity) e depois da compressão',
+    ['encoding']
+)
+
+
+def _record_request_stage(name, start, duration):
+    """
+    Acumula a duração da etapa na requisição atual (linha de log e
+    Server-Timing) e, se a requisição tem trace, registra o span da etapa
+    """
+    if has_request_context():
+        timings = g.setdefault('stage_timings', {})
+        timings[name] = timings.get(name, 0.0) + duration
+        trace = g.get('trace')
+        if trace is not None:
+            trace.add_stage(name, start, duration)
+
+
+@contextmanager
+def stage(name):
+    """Mede a duração de uma etapa da criação de PIX"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_LATENCY.labels(name).observe(duration)
+        _record_request_stage(name, start, duration)
+
+
+@contextmanager
+def upstream_call():
+    """Mede uma chamada à Duckfy: latência, chamadas em andamento e falhas sem resposta"""
+    UPSTREAM_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        # Respostas HTTP são contadas por record_upstream_response; aqui só
+        # entram as falhas em que a Duckfy nem respondeu
+        if getattr(e, 'error_code', None) == 'UPSTREAM_TIMEOUT':
+            UPSTREAM_RESPONSES.labels('timeout').inc()
+        elif getattr(e, 'status_code', None) is None:
+            UPSTREAM_RESPONSES.labels('error').inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_LATENCY.labels('upstream').observe(duration)
+        _record_request_stage('upstream', start, duration)
+        UPSTREAM_IN_FLIGHT.dec()
+
+
+def record_upstream_response(response, *args, **kwargs):
+    """Hook de resposta da sessão requests: conta o status HTTP da Duckfy"""
+    UPSTREAM_RESPONSES.labels(str(response.status_code)).inc()
+
+
+def record_credential_call(credential, result):
+    """Callback do CredentialPool"""
+    CREDENTIAL_CALLS.labels(credential, result).inc()
+
+
+def record_admission(priority, result):
+    """Callback do AdmissionController"""
+    ADMISSION.labels(priority, result).inc()
+
+
+def record_async_job(result):
+    ASYNC_JOBS.labels(result).inc()
+
+
+def record_rate_limited(route, dimension):
+    RATE_LIMITED.labels(route, dimension).inc()
+
+
+def record_charge_reused(route):
+    CHARGES_REUSED.labels(route).inc()
+
+
+def record_conversion_events(result, count):
+    """Callback do ConversionExporter"""
+    CONVERSION_EVENTS.labels(result).inc(count)
+
+
+def record_compression(encoding, original_size, compressed_size):
+    RESPONSE_BYTES.labels('identity').inc(original_size)
+    RESPONSE_BYTES.labels(encoding).inc(compressed_size)
+
+
+def prepare_routes(routes):
+    """Cria de antemão as séries por rota (e os arquivos de métricas do worker)"""
+    for route in routes:
+        HTTP_IN_FLIGHT.labels(route)
+        HTTP_LATENCY.labels(route)
+
+
+def request_started(route):
+    HTTP_IN_FLIGHT.labels(route).inc()
+
+
+def request_finished(route, method, status, duration):
+    HTTP_IN_FLIGHT.labels(route).dec()
+    HTTP_REQUESTS.labels(route, method, str(status)).inc()
+    HTTP_LATENCY.labels(route).observe(duration)
+
+
+def render():
+    """Gera o texto no formato Prometheus, agregando todos os workers"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    from prometheus_client import REGISTRY
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """Remove os arquivos de gauges live* de um worker encerrado"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
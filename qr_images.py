@@ -0,0 +1,108 @@
+import time
+import base64
+import hashlib
+import binascii
+import threading
+from collections import OrderedDict
+
+
+def decode_data_uri(value):
+    """'data:image/png;base64,...' (ou só o base64) -> bytes; None se inválido"""
+    if not isinstance(value, str) or not value:
+        return None
+    _, separator, encoded = value.partition('base64,')
+    try:
+        return base64.b64decode(encoded if separator else value, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+class QRImageStore:
+    """
+    Imagens PNG dos QR Codes, servidas por /pix/<id>/qr.png.
+
+    O PNG vem do pix.base64 da Duckfy na criação e é gravado na tabela
+    pix_qr_images (compartilhada pelos workers). Na frente do banco há um
+    LRU em memória por worker, limitado a max_bytes. Cada imagem tem um
+    ETag fixo: o QR de uma cobrança nunca muda.
+    """
+
+    def __init__(self, db, max_bytes=32 * 1024 * 1024, retention_days=2):
+        self.db = db
+        self.max_bytes = max_bytes
+        self.retention_seconds = retention_days * 86400
+        self._entries = OrderedDict()  # chave -> (png, etag)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._create_schema()
+
+    def _create_schema(self):
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS pix_qr_images (
+                transaction_id TEXT PRIMARY KEY,
+                identifier TEXT,
+                png BLOB NOT NULL,
+                etag TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS idx_pix_qr_images_identifier ON pix_qr_images (identifier)')
+
+    def put(self, transaction_id, identifier, data_uri):
+        """Guarda o QR de uma cobrança; retorna False se não havia imagem válida"""
+        with self._lock:
+            if transaction_id in self._entries:
+                return True
+        png = decode_data_uri(data_uri)
+        if not png:
+            return False
+
+        etag = hashlib.sha256(png).hexdigest()[:32]
+        now = time.time()
+        self.db.execute(
+            'INSERT OR IGNORE INTO pix_qr_images (transaction_id, identifier, png, etag, created_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (transaction_id, identifier, png, etag, now)
+        )
+        self._remember(transaction_id, (png, etag))
+        if now - self._last_prune > 3600:
+            self._last_prune = now
+            self.db.execute('DELETE FROM pix_qr_images WHERE created_at < ?', (now - self.retention_seconds,))
+        return True
+
+    def get(self, key):
+        """(png, etag) pelo transactionId (ou identifier), ou None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        row = self.db.execute(
+            'SELECT png, etag FROM pix_qr_images WHERE transaction_id = ?', (key,)
+        ).fetchone()
+        if row is None:
+            row = self.db.execute(
+                'SELECT png, etag FROM pix_qr_images WHERE identifier = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        entry = (bytes(row[0]), row[1])
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key, entry):
+        size = len(entry[0])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[0])
+            self._entries[key] = entry
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (png, _) = self._entries.popitem(last=False)
+                self._size -= len(png)
@@ -0,0 +1,202 @@
+import os
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from shared_state import SharedRecords
+
+# key_hash, tokens, updated_at, full_at (instante em que o balde volta a ficar cheio)
+_BUCKET_FORMAT = '<Qddd'
+_MAX_PROBES = 8
+
+
+def parse_rate_limit_rules(value):
+    """
+    Converte '/pix/create=ip:60/60,cpf:10/600;/pix/create/batch=ip:10/60'
+    em {rota: ((dimensão, capacidade, tokens por segundo), ...)}.
+
+    'ip:60/60' = balde de 60 requisições que se recarrega em 60 segundos.
+    """
+    rules = {}
+    for item in (value or '').split(';'):
+        if '=' not in item:
+            continue
+        route, limits = item.split('=', 1)
+        parsed = []
+        for limit in limits.split(','):
+            if ':' not in limit:
+                continue
+            dimension, spec = limit.split(':', 1)
+            count, _, seconds = spec.partition('/')
+            burst = float(count)
+            parsed.append((dimension.strip(), burst, burst / float(seconds or 1)))
+        if parsed:
+            rules[route.strip()] = tuple(parsed)
+    return rules
+
+
+def without_dimension(rules, dimension):
+    """Regras sem os limites de uma dimensão (rotas que ficam sem nenhum limite saem)"""
+    filtered = {}
+    for route, limits in rules.items():
+        kept = tuple(limit for limit in limits if limit[0] != dimension)
+        if kept:
+            filtered[route] = kept
+    return filtered
+
+
+def client_ip(remote_addr, forwarded_for=None, trusted_proxies=0):
+    """
+    IP do cliente. Com trusted_proxies > 0, usa o endereço que o proxy mais
+    externo confiável acrescentou ao X-Forwarded-For (os anteriores podem
+    ter sido forjados pelo próprio cliente).
+    """
+    if trusted_proxies and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+        if len(hops) >= trusted_proxies:
+            return hops[-trusted_proxies]
+    return remote_addr or 'unknown'
+
+
+class MemoryBucketBackend:
+    """Baldes em memória, por worker (LRU limitado a max_entries)"""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def open(self):
+        return self
+
+    def acquire(self, checks, now):
+        """
+        Consome um token de cada balde em checks [(key, burst, rate)] se todos
+        tiverem saldo; senão não consome nada e retorna (espera, índice do
+        primeiro balde vazio). Retorna (0, None) quando liberado.
+        """
+        with self._lock:
+            levels = []
+            for index, (key, burst, rate) in enumerate(checks):
+                bucket = self._buckets.get(key)
+                tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+                if tokens < 1:
+                    return (1 - tokens) / rate, index
+                levels.append(tokens)
+
+            for (key, _, _), tokens in zip(checks, levels):
+                self._buckets[key] = [tokens - 1, now]
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return 0, None
+
+
+class SharedBucketBackend:
+    """
+    Baldes compartilhados entre os workers em uma tabela hash de tamanho
+    fixo sobre SharedRecords (mmap + flock).
+
+    Cada chave ocupa um slot (endereçamento aberto, até 8 tentativas). Com
+    as tentativas ocupadas, o slot reaproveitado é o do balde mais próximo
+    de estar cheio, que é o que menos perde ao ser esquecido. Todos os
+    baldes de uma requisição são lidos e atualizados em um único flock.
+    """
+
+    def __init__(self, name='rate_limits.v1', slots=65536, directory=None):
+        self.name = name
+        self.slots = slots
+        self.directory = directory
+        self._storage = None
+        self._pid = None
+        self._open_lock = threading.Lock()
+
+    def open(self):
+        """Arquivo de estado do worker atual (aberto no primeiro uso após o fork)"""
+        # Aberto no próprio worker: o flock não vale para descritores herdados do fork
+        if self._pid != os.getpid():
+            with self._open_lock:
+                if self._pid != os.getpid():
+                    self._storage = SharedRecords(self.name, _BUCKET_FORMAT, slots=self.slots,
+                                                  directory=self.directory)
+                    self._pid = os.getpid()
+        return self._storage
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') | 1  # 0 marca slot vazio
+
+    def _find_slot(self, records, key_hash, now, taken):
+        """Slot da chave (ou o melhor slot livre fora de taken) e o registro atual dela, se houver"""
+        start = key_hash % self.slots
+        candidate, candidate_full_at = None, math.inf
+        for probe in range(_MAX_PROBES):
+            slot = (start + probe) % self.slots
+            stored_hash, tokens, updated_at, full_at = records.read(slot)
+            if stored_hash == key_hash:
+                return slot, (tokens, updated_at)
+            # Slot vazio ou balde já cheio de novo equivalem a livres (full_at 0)
+            full_at = 0 if stored_hash == 0 or full_at <= now else full_at
+            if full_at < candidate_full_at and slot not in taken:
+                candidate, candidate_full_at = slot, full_at
+        return candidate, None
+
+    def acquire(self, checks, now):
+        """Mesma semântica de MemoryBucketBackend.acquire, valendo para todos os workers"""
+        records = self.open()
+        with records.locked():
+            updates = []
+            for index, (key, burst, rate) in enumerate(checks):
+                key_hash = self._hash(key)
+                slot, current = self._find_slot(records, key_hash, now, {update[0] for update in updates})
+                tokens = burst if current is None else min(burst, current[0] + (now - current[1]) * rate)
+                if tokens < 1:
+                    return (1 - tokens) / rate, index
+                if slot is not None:
+                    updates.append((slot, key_hash, tokens - 1, burst, rate))
+
+            for slot, key_hash, tokens, burst, rate in updates:
+                records.write((key_hash, tokens, now, now + (burst - tokens) / rate), slot)
+        return 0, None
+
+
+class RateLimiter:
+    """
+    Token bucket por rota e por identidade (IP, CPF, e-mail).
+
+    rules vem de parse_rate_limit_rules; o backend guarda os baldes
+    (SharedBucketBackend entre workers ou MemoryBucketBackend por worker,
+    ou qualquer objeto com acquire(checks, now)).
+    """
+
+    def __init__(self, rules, backend):
+        self.rules = rules
+        self.backend = backend
+
+    def dimensions(self, route):
+        """Dimensões limitadas na rota (vazio = rota sem limite)"""
+        return tuple(dimension for dimension, _, _ in self.rules.get(route, ()))
+
+    def check(self, route, identities, now=None):
+        """
+        Consome um token da rota para cada identidade presente.
+
+        Retorna (retry_after em segundos, dimensão que estourou) ou (0, None).
+        """
+        checks = []
+        dimensions = []
+        for dimension, burst, rate in self.rules.get(route, ()):
+            identity = identities.get(dimension)
+            if identity:
+                checks.append((f'{route}|{dimension}|{identity}', burst, rate))
+                dimensions.append(dimension)
+        if not checks:
+            return 0, None
+
+        wait, index = self.backend.acquire(checks, time.time() if now is None else now)
+        if index is None:
+            return 0, None
+        return max(1, math.ceil(wait)), dimensions[index]
@@ -53,7 +53,8 @@ echo ""
 echo "🚀 Para iniciar em produção, execute:"
 echo "   source venv/bin/activate"
 echo "   export FLASK_ENV=production"
-echo "   gunicorn --bind 0.0.0.0:5000 --workers 4 --timeout 30 --access-logfile - app:app"
+echo "   gunicorn --config gunicorn.conf.py app:app"
+echo "   (SERVER_MODE=async para workers gevent)"
 echo ""
 echo "🔍 Para testar localmente:"
 echo "   source venv/bin/activate"
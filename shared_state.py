@@ -0,0 +1,59 @@
+import os
+import mmap
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+
+class SharedRecords:
+    """
+    Registros de tamanho fixo em um arquivo mapeado em memória.
+
+    Todos os workers do gunicorn abrem o mesmo arquivo e enxergam os mesmos
+    bytes; alterações devem ser feitas dentro de locked(), que combina um
+    lock entre threads com flock entre processos.
+
+    A instância deve ser criada no próprio worker (depois do fork): o flock
+    é por descritor aberto, e um descritor herdado não exclui o processo pai.
+    """
+
+    def __init__(self, name, fmt, slots=1, directory=None):
+        self._struct = struct.Struct(fmt)
+        self.slots = slots
+        directory = directory or tempfile.gettempdir()
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, name)
+
+        size = self._struct.size * slots
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._mmap = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def locked(self):
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield self
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def read(self, slot=0):
+        return self._struct.unpack_from(self._mmap, slot * self._struct.size)
+
+    def write(self, values, slot=0):
+        self._struct.pack_into(self._mmap, slot * self._struct.size, *values)
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
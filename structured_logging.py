@@ -0,0 +1,263 @@
+import os
+import re
+import sys
+import copy
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from fast_json import dumps_bytes
+
+REDACTED = '[REDACTED]'
+
+# Chaves cujo valor nunca vai para o log (comparação sem maiúsculas/hífens)
+SECRET_KEYS = frozenset((
+    'xsecretkey', 'xpublickey', 'secretkey', 'publickey', 'secret', 'password',
+    'token', 'authorization', 'apikey', 'xwebhooktoken', 'webhooktoken'
+))
+
+CPF_CNPJ_RE = re.compile(r'\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b|\b\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}\b')
+EMAIL_RE = re.compile(r'\b([A-Za-z0-9._%+-])[A-Za-z0-9._%+-]*@([A-Za-z0-9.-]+\.[A-Za-z]{2,})\b')
+BASE64_RE = re.compile(r'data:[\w/+.-]+;base64,[A-Za-z0-9+/=]+')
+
+
+def mask_document(value):
+    digits = ''.join(ch for ch in str(value) if ch.isdigit())
+    return f"***{digits[-2:]}" if len(digits) > 2 else REDACTED
+
+
+def mask_email(value):
+    local, _, domain = str(value).partition('@')
+    return f"{local[:1]}***@{domain}" if domain else REDACTED
+
+
+def mask_phone(value):
+    digits = ''.join(ch for ch in str(value) if ch.isdigit())
+    return f"***{digits[-4:]}" if len(digits) > 4 else REDACTED
+
+
+def mask_name(value):
+    return f"{str(value).strip()[:1]}***" if value else value
+
+
+# Dados pessoais do cliente: mascarados, mantendo só o suficiente para depurar
+PII_MASKS = {
+    'cpf': mask_document,
+    'document': mask_document,
+    'email': mask_email,
+    'phone': mask_phone,
+    'name': mask_name
+}
+
+
+def _normalize_key(key):
+    return str(key).lower().replace('-', '').replace('_', '')
+
+
+def snapshot(value, depth=0, max_depth=8):
+    """Cópia dos dicionários e listas de value (só a estrutura; textos não são tocados)"""
+    if depth >= max_depth:
+        return value
+    if isinstance(value, dict):
+        return {key: snapshot(item, depth + 1, max_depth) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [snapshot(item, depth + 1, max_depth) for item in value]
+    return value
+
+
+class Redactor:
+    """
+    Remove segredos e dados pessoais de valores que vão para o log.
+
+    Dicionários e listas são copiados (o original nunca é alterado):
+    chaves de credenciais viram [REDACTED], campos do cliente são
+    mascarados e imagens base64 são trocadas pelo tamanho. Em textos
+    livres, os valores das credenciais configuradas, CPF/CNPJ, e-mails e
+    data URIs base64 também são substituídos.
+    """
+
+    def __init__(self, secrets=(), max_depth=8):
+        self.secrets = [s for s in secrets if s and len(s) >= 4]
+        self.max_depth = max_depth
+
+    def redact(self, value, depth=0):
+        if isinstance(value, dict):
+            if depth >= self.max_depth:
+                return '[...]'
+            result = {}
+            for key, item in value.items():
+                normalized = _normalize_key(key)
+                if normalized in SECRET_KEYS:
+                    result[key] = REDACTED
+                elif normalized in PII_MASKS and isinstance(item, (str, int)):
+                    result[key] = PII_MASKS[normalized](item)
+                elif normalized == 'base64' and isinstance(item, str):
+                    result[key] = f'<base64 {len(item)} chars>'
+                else:
+                    result[key] = self.redact(item, depth + 1)
+            return result
+        if isinstance(value, (list, tuple)):
+            if depth >= self.max_depth:
+                return '[...]'
+            return [self.redact(item, depth + 1) for item in value]
+        if isinstance(value, str):
+            return self.text(value)
+        return value
+
+    def text(self, value):
+        for secret in self.secrets:
+            if secret in value:
+                value = value.replace(secret, REDACTED)
+        if 'base64,' in value:
+            value = BASE64_RE.sub(lambda m: f'<base64 {len(m.group(0))} chars>', value)
+        if '@' in value:
+            value = EMAIL_RE.sub(r'\1***@\2', value)
+        return CPF_CNPJ_RE.sub(lambda m: mask_document(m.group(0)), value)
+
+
+class JSONLineFormatter(logging.Formatter):
+    """
+    Uma linha JSON por registro; campos extras vêm de record.fields, já
+    sem segredos e dados pessoais. Um campo extra com o nome de um campo
+    do próprio registro (ts, level, msg...) é ignorado.
+    """
+
+    def __init__(self, redactor):
+        super().__init__()
+        self.redactor = redactor
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'msg': self.redactor.text(record.getMessage())
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        if record.exc_info:
+            entry['exc'] = self.redactor.text(self.formatException(record.exc_info))
+        fields = getattr(record, 'fields', None)
+        if fields:
+            for key, value in self.redactor.redact(fields).items():
+                entry.setdefault(key, value)
+        return dumps_bytes(entry).decode('utf-8')
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Amostragem dos registros verbosos (abaixo de verbose_level).
+
+    context() retorna (request_id, sampled) dentro de uma requisição ou
+    None fora dela: a decisão de amostragem é tomada uma vez por requisição,
+    para que os registros verbosos de uma mesma requisição venham juntos.
+    """
+
+    def __init__(self, sample_rate=1.0, context=None, verbose_level=logging.INFO):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.context = context
+        self.verbose_level = verbose_level
+
+    def should_sample(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def filter(self, record):
+        current = self.context() if self.context is not None else None
+        sampled = None
+        if current is not None:
+            record.request_id, sampled = current
+        if record.levelno >= self.verbose_level:
+            return True
+        return self.should_sample() if sampled is None else sampled
+
+
+class BackgroundLogHandler(QueueHandler):
+    """
+    Handler que só enfileira: redação, serialização JSON, formatação de
+    exceções e escrita no stdout acontecem em uma thread própria
+    (QueueListener).
+
+    A fila é limitada; se encher, o registro é descartado e contado em
+    dropped, em vez de bloquear a requisição. Fila e thread são criadas
+    por processo, na primeira emissão após o fork do worker.
+    """
+
+    def __init__(self, handlers, redactor, maxsize=10000):
+        super().__init__(None)
+        self.target_handlers = list(handlers)
+        self.redactor = redactor
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.sampling_filter = None
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.maxsize)
+            self.listener = QueueListener(self.queue, *self.target_handlers, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Na thread da requisição só o que não pode esperar: os argumentos da
+        # mensagem e os campos estruturados podem mudar depois que a requisição
+        # seguir adiante, então a mensagem é montada e os campos são copiados
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        fields = getattr(record, 'fields', None)
+        if fields:
+            record.fields = snapshot(fields)
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self._pid = None
+        super().close()
+
+
+def configure_logging(level='INFO', sample_rate=1.0, secrets=(), queue_size=10000,
+                      context=None, stream=None):
+    """
+    Substitui os handlers do logger raiz por BackgroundLogHandler + JSON.
+
+    Retorna o handler (para consultar dropped ou encerrar no shutdown).
+    """
+    redactor = Redactor(secrets)
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JSONLineFormatter(redactor))
+
+    handler = BackgroundLogHandler([output], redactor, maxsize=queue_size)
+    handler.sampling_filter = RequestContextFilter(sample_rate, context=context)
+    handler.addFilter(handler.sampling_filter)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    atexit.register(handler.close)
+    return handler
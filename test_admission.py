@@ -0,0 +1,179 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def acquire_in_thread(controller, priority, timeout=None):
+    """Tenta a vaga em outra thread; o resultado ('admitted' ou o motivo da recusa) fica em outcome"""
+    outcome = {}
+
+    def run():
+        try:
+            controller.acquire(priority, timeout)
+            outcome['result'] = 'admitted'
+        except AdmissionRejected as e:
+            outcome['result'] = e.reason
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def wait_queued(controller, count, timeout=2.0):
+    end = time.monotonic() + timeout
+    while controller.queued < count and time.monotonic() < end:
+        time.sleep(0.01)
+    assert controller.queued == count
+
+
+def test_rejects_when_queue_is_full():
+    controller = AdmissionController(max_in_flight=1, max_queue=0)
+    controller.acquire('normal')
+    with pytest.raises(AdmissionRejected) as error:
+        controller.acquire('normal')
+    assert error.value.reason == 'queue_full'
+    assert error.value.status_code == 503 and error.value.error_code == 'OVERLOADED'
+
+    controller.release('normal')
+    controller.acquire('normal')
+
+
+def test_rejects_without_time_left():
+    controller = AdmissionController(max_in_flight=1, max_queue=5)
+    controller.acquire('normal')
+    with pytest.raises(AdmissionRejected) as error:
+        controller.acquire('normal', timeout=0)
+    assert error.value.reason == 'no_time'
+
+
+def test_queued_request_times_out():
+    controller = AdmissionController(max_in_flight=1, max_queue=5, max_queue_seconds=0.1)
+    controller.acquire('normal')
+    with pytest.raises(AdmissionRejected) as error:
+        controller.acquire('normal')
+    assert error.value.reason == 'queue_timeout'
+    assert controller.queued == 0
+
+
+def test_release_hands_slot_to_highest_priority():
+    controller = AdmissionController(max_in_flight=1, max_queue=5, max_queue_seconds=2)
+    controller.acquire('normal')
+    low, low_outcome = acquire_in_thread(controller, 'low')
+    wait_queued(controller, 1)
+    high, high_outcome = acquire_in_thread(controller, 'high')
+    wait_queued(controller, 2)
+
+    controller.release('normal')
+    high.join()
+    assert high_outcome['result'] == 'admitted'
+    assert controller.class_in_flight['high'] == 1
+
+    controller.release('high')
+    low.join()
+    assert low_outcome['result'] == 'admitted'
+
+
+def test_higher_priority_sheds_lowest_waiter():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, max_queue_seconds=2)
+    controller.acquire('normal')
+    low, low_outcome = acquire_in_thread(controller, 'low')
+    wait_queued(controller, 1)
+
+    # Fila cheia: quem chega com prioridade maior toma o lugar de quem tem menor
+    high, high_outcome = acquire_in_thread(controller, 'high')
+    low.join()
+    assert low_outcome['result'] == 'preempted'
+
+    # Com a fila cheia de uma prioridade igual ou maior, a recusa é imediata
+    with pytest.raises(AdmissionRejected) as error:
+        controller.acquire('low')
+    assert error.value.reason == 'queue_full'
+
+    controller.release('normal')
+    high.join()
+    assert high_outcome['result'] == 'admitted'
+
+
+def test_class_share_keeps_slots_for_other_classes():
+    controller = AdmissionController(max_in_flight=4, max_queue=0, class_shares={'low': 0.5})
+    assert controller.class_limits == {'high': 4, 'normal': 4, 'low': 2}
+    controller.acquire('low')
+    controller.acquire('low')
+    with pytest.raises(AdmissionRejected):
+        controller.acquire('low')
+    controller.acquire('normal')
+    controller.acquire('high')
+    assert controller.snapshot()['by_priority'] == {'high': 1, 'normal': 1, 'low': 2}
+
+
+def test_acquire_many_takes_only_free_slots():
+    controller = AdmissionController(max_in_flight=4, max_queue=5, class_shares={'low': 0.5})
+    assert controller.acquire_many('low', 10) == 2
+    assert controller.acquire_many('normal', 10) == 2
+    with pytest.raises(AdmissionRejected):
+        controller.acquire_many('normal', 3, timeout=0)
+    for priority in ('low', 'low', 'normal', 'normal'):
+        controller.release(priority)
+    assert controller.in_flight == 0
+
+
+def test_results_are_reported():
+    results = []
+    controller = AdmissionController(max_in_flight=1, max_queue=0,
+                                     on_result=lambda priority, result: results.append((priority, result)))
+    controller.acquire('high')
+    with pytest.raises(AdmissionRejected):
+        controller.acquire('low')
+    assert results == [('high', 'admitted'), ('low', 'rejected')]
+
+
+@pytest.fixture
+def saturated(api, monkeypatch):
+    """Controle de admissão do app com a única vaga ocupada e sem fila"""
+    controller = AdmissionController(max_in_flight=1, max_queue=0)
+    controller.acquire('high')
+    monkeypatch.setattr(api, 'admission', controller)
+    yield controller
+    controller.release('high')
+
+
+def test_create_route_sheds_when_saturated(client, pix_client, saturated):
+    response = client.post('/pix/create', json={'amount': 10, 'client': pix_client})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    body = response.get_json()
+    assert body['errorCode'] == 'OVERLOADED' and body['details'] == {'reason': 'queue_full'}
+
+
+def test_batch_is_rejected_without_a_slot(client, pix_client, saturated):
+    items = [{'amount': 10 + index, 'client': pix_client} for index in range(3)]
+    response = client.post('/pix/create/batch', json={'items': items})
+    assert response.status_code == 503
+    assert response.get_json()['errorCode'] == 'OVERLOADED'
+
+
+def test_batch_holds_one_slot_per_concurrent_call(api, client, stub, pix_client, monkeypatch):
+    controller = AdmissionController(max_in_flight=4, max_queue=0, class_shares={'low': 0.5})
+    monkeypatch.setattr(api, 'admission', controller)
+    peak = []
+    call_duckfy = api.call_duckfy
+
+    def tracked(pix_data, deadline):
+        peak.append(controller.in_flight)
+        return call_duckfy(pix_data, deadline)
+
+    monkeypatch.setattr(api, 'call_duckfy', tracked)
+    stub.configure(status='OK', latency='fixed:0.1')
+    items = [{'amount': 10 + index, 'client': pix_client} for index in range(6)]
+    start = time.monotonic()
+    response = client.post('/pix/create/batch', json={'items': items})
+
+    assert response.status_code == 201
+    assert response.get_json()['summary'] == {'total': 6, 'succeeded': 6, 'failed': 0}
+    # Lotes são 'low': no máximo metade das 4 vagas, e cada chamada simultânea ocupa uma
+    assert peak == [2] * 6
+    assert time.monotonic() - start >= 0.3
+    assert controller.in_flight == 0
@@ -33,7 +33,7 @@ def create_simple_pix():
             "name": "João da Silva",
             "email": "joao.silva@example.com",
             "phone": "(11) 99999-9999",
-            "document": "123.456.789-00"
+            "document": "123.456.789-09"
         }
     }
     
@@ -129,7 +129,7 @@ def test_invalid_data():
         "client": {
             "name": "Teste",
             # email ausente
-            "document": "123.456.789-00"
+            "document": "123.456.789-09"
         }
     }
     
@@ -0,0 +1,98 @@
+import os
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from catalog import Catalog
+
+SEDEX = {'code': 'Z29J23C', 'name': 'Taxa Sedex', 'price': 28.97, 'identifier_prefix': 'SEDEX_', 'due_days': 1}
+
+
+def write_catalog(path, products, mtime):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(products if isinstance(products, str) else json.dumps({'products': products}))
+    # mtime explícito: duas escritas no mesmo instante teriam o mesmo mtime
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def catalog_path(tmp_path):
+    path = str(tmp_path / 'catalog.json')
+    write_catalog(path, {'taxa-sedex': SEDEX}, 1000)
+    return path
+
+
+def test_product_payload(catalog_path):
+    product = Catalog(catalog_path).get('taxa-sedex')
+    pix_data = product.build_pix_data('01ABC', {'name': 'Maria'}, {'utm_source': 'FB'})
+    assert pix_data['identifier'] == 'SEDEX_01ABC'
+    assert pix_data['amount'] == 28.97
+    assert pix_data['products'] == [{'id': 'Z29J23C', 'name': 'Taxa Sedex', 'quantity': 1, 'price': 28.97}]
+    assert pix_data['metadata']['tracking'] == {'utm_source': 'FB'}
+    assert pix_data['dueDate'] == (date.today() + timedelta(days=1)).strftime('%Y-%m-%d')
+
+    # O metadata pré-montado não é alterado pela requisição
+    assert 'tracking' not in product._metadata
+    assert product.build_response({'transactionId': 't'})['data'] == {'transactionId': 't'}
+
+
+def test_reload_picks_up_changes(catalog_path):
+    catalog = Catalog(catalog_path, reload_interval=0)
+    write_catalog(catalog_path, {'taxa-sedex': {**SEDEX, 'price': 30}, 'frete': {**SEDEX, 'name': 'Frete'}}, 2000)
+    assert catalog.get('taxa-sedex').price == 30.0
+    assert catalog.get('frete').name == 'Frete'
+
+    write_catalog(catalog_path, {'frete': {**SEDEX, 'name': 'Frete'}}, 3000)
+    assert catalog.get('taxa-sedex') is None
+
+
+def test_reload_waits_for_interval(catalog_path):
+    catalog = Catalog(catalog_path, reload_interval=3600)
+    write_catalog(catalog_path, {'taxa-sedex': {**SEDEX, 'price': 30}}, 2000)
+    assert catalog.get('taxa-sedex').price == 28.97
+    assert catalog.reload() is True
+    assert catalog.get('taxa-sedex').price == 30.0
+
+
+def test_unchanged_file_is_not_reloaded(catalog_path):
+    catalog = Catalog(catalog_path, reload_interval=0)
+    product = catalog.get('taxa-sedex')
+    assert catalog.reload() is False
+    assert catalog.get('taxa-sedex') is product
+
+
+@pytest.mark.parametrize('content', [
+    '{"products": ',                                            # JSON quebrado
+    json.dumps({'products': {'taxa-sedex': {'name': 'Sem código', 'price': 10}}}),
+    json.dumps({'products': {'taxa-sedex': {**SEDEX, 'price': 0}}}),
+    json.dumps({'products': {'taxa-sedex': {**SEDEX, 'price': 'caro'}}}),
+    json.dumps({'products': ['taxa-sedex']}),
+    json.dumps(['taxa-sedex']),
+])
+def test_invalid_file_keeps_previous_catalog(catalog_path, content):
+    catalog = Catalog(catalog_path, reload_interval=0)
+    write_catalog(catalog_path, content, 2000)
+    assert catalog.reload() is False
+    assert catalog.get('taxa-sedex').price == 28.97
+
+    # Corrigido o arquivo, o próximo reload vale
+    write_catalog(catalog_path, {'taxa-sedex': {**SEDEX, 'price': 31}}, 3000)
+    assert catalog.get('taxa-sedex').price == 31.0
+
+
+def test_missing_file_keeps_previous_catalog(catalog_path):
+    catalog = Catalog(catalog_path, reload_interval=0)
+    os.remove(catalog_path)
+    assert catalog.get('taxa-sedex').price == 28.97
+    assert Catalog(catalog_path).products() == []
+
+
+def test_product_route_uses_reloaded_catalog(api, client, pix_client, catalog_path, monkeypatch):
+    monkeypatch.setattr(api, 'catalog', Catalog(catalog_path, reload_interval=0))
+    assert client.post('/pix/create/frete', json={'client': pix_client}).status_code == 404
+
+    write_catalog(catalog_path, {'frete': {**SEDEX, 'name': 'Frete', 'identifier_prefix': 'FRETE_'}}, 2000)
+    response = client.post('/pix/create/frete', json={'client': pix_client})
+    assert response.status_code == 201
+    assert response.get_json()['product']['name'] == 'Frete'
@@ -0,0 +1,64 @@
+import pytest
+
+from charge_reuse import PendingChargeStore
+from database import SQLiteDatabase
+from transaction_store import TransactionStore
+from webhook_queue import WebhookQueue, parse_webhook_payload
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'api_pix.db')
+
+
+def test_pending_charge_not_reused_with_unapplied_webhook(db_path):
+    db = SQLiteDatabase(db_path)
+    transactions = TransactionStore(db)
+    webhooks = WebhookQueue(db)
+    charges = PendingChargeStore(db, window=900)
+    pix_data = {'identifier': 'id-1', 'amount': 28.97, 'client': {'cpf': '52998224725'}}
+    result = {'transactionId': 'tx-1', 'status': 'OK'}
+
+    transactions.record_created(pix_data, result)
+    key = charges.key(pix_data['client'], 'sku:taxa-sedex')
+    assert charges.remember(key, pix_data, result)
+    assert charges.find(key) == result
+
+    # Pagamento recebido mas ainda na fila: a cobrança já não é devolvida
+    webhooks.enqueue(parse_webhook_payload({'transactionId': 'tx-1', 'status': 'PAID'}))
+    assert charges.find(key) is None
+
+    events = webhooks.claim_batch(10)
+    transactions.update_statuses(events)
+    webhooks.complete([event['id'] for event in events])
+    assert charges.find(key) is None
+
+
+def test_taxa_sedex_reuses_pending_charge_until_paid(api, client, pix_client):
+    body = {'client': pix_client}
+    first = client.post('/pix/create/taxa-sedex', json=body)
+    second = client.post('/pix/create/taxa-sedex', json=body)
+    assert first.status_code == second.status_code == 201
+    assert second.headers.get('Charge-Reused') == 'true'
+    transaction_id = first.get_json()['data']['transactionId']
+    assert second.get_json()['data']['transactionId'] == transaction_id
+
+    response = client.post('/pix/webhook', json={'transactionId': transaction_id, 'status': 'PAID'},
+                           headers={'X-Webhook-Token': api.app.config['WEBHOOK_TOKEN']})
+    assert response.status_code == 200
+    third = client.post('/pix/create/taxa-sedex', json=body)
+    assert third.status_code == 201
+    assert 'Charge-Reused' not in third.headers
+    assert third.get_json()['data']['transactionId'] != transaction_id
+
+
+def test_reuse_disabled_without_webhook_token(api, client, pix_client):
+    token = api.app.config['WEBHOOK_TOKEN']
+    api.app.config['WEBHOOK_TOKEN'] = None
+    try:
+        client.post('/pix/create/taxa-sedex', json={'client': pix_client})
+        second = client.post('/pix/create/taxa-sedex', json={'client': pix_client})
+    finally:
+        api.app.config['WEBHOOK_TOKEN'] = token
+    assert second.status_code == 201
+    assert 'Charge-Reused' not in second.headers
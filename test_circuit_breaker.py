@@ -0,0 +1,220 @@
+import threading
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CircuitOpenError, _RECORD_FORMAT
+from duckfy_client import DuckfyAPIError
+from shared_state import SharedRecords
+
+
+class FakeClock:
+    """Substitui o módulo time do circuit_breaker: o tempo só anda com advance()"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, 'time', fake)
+    return fake
+
+
+def make_breaker(tmp_path, **options):
+    storage = SharedRecords('breaker', _RECORD_FORMAT, directory=str(tmp_path))
+    settings = dict(window_seconds=30, min_requests=4, error_rate=0.5, slow_call_seconds=5, slow_rate=0.8,
+                    open_seconds=30, probe_timeout=10)
+    settings.update(options)
+    return CircuitBreaker(storage, **settings)
+
+
+def ok():
+    return 'ok'
+
+
+def fail(status=502):
+    def call():
+        raise DuckfyAPIError('falhou', status_code=status)
+    return call
+
+
+def slow(clock, seconds):
+    def call():
+        clock.advance(seconds)
+        return 'ok'
+    return call
+
+
+def open_breaker(breaker):
+    for _ in range(4):
+        with pytest.raises(DuckfyAPIError):
+            breaker.call(fail())
+
+
+def test_opens_after_error_rate(tmp_path, clock):
+    breaker = make_breaker(tmp_path)
+    breaker.call(ok)
+    breaker.call(ok)
+    with pytest.raises(DuckfyAPIError):
+        breaker.call(fail())
+    assert breaker.snapshot()['state'] == 'closed'
+    with pytest.raises(DuckfyAPIError):
+        breaker.call(fail())
+    assert breaker.snapshot()['state'] == 'open'
+
+    called = []
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.call(lambda: called.append(1))
+    assert not called
+    assert error.value.status_code == 503 and error.value.error_code == 'CIRCUIT_OPEN'
+    assert error.value.retry_after == 30
+    clock.advance(12.5)
+    assert breaker.snapshot()['retry_after'] == 18
+
+
+def test_client_errors_do_not_count(tmp_path, clock):
+    breaker = make_breaker(tmp_path)
+    for _ in range(10):
+        with pytest.raises(DuckfyAPIError):
+            breaker.call(fail(422))
+    assert breaker.snapshot() == {'state': 'closed', 'window': {'requests': 10, 'failures': 0, 'slow_calls': 0}}
+
+
+def test_min_requests_and_window_reset(tmp_path, clock):
+    breaker = make_breaker(tmp_path)
+    for _ in range(3):
+        with pytest.raises(DuckfyAPIError):
+            breaker.call(fail())
+    # A janela acabou antes de min_requests: as falhas antigas não contam
+    clock.advance(31)
+    with pytest.raises(DuckfyAPIError):
+        breaker.call(fail())
+    snapshot = breaker.snapshot()
+    assert snapshot['state'] == 'closed' and snapshot['window']['requests'] == 1
+
+
+def test_opens_on_slow_calls(tmp_path, clock):
+    breaker = make_breaker(tmp_path, window_seconds=300)
+    for _ in range(4):
+        assert breaker.call(slow(clock, 6)) == 'ok'
+    assert breaker.snapshot()['state'] == 'open'
+
+
+def test_half_open_probe_closes_on_success(tmp_path, clock):
+    breaker = make_breaker(tmp_path)
+    open_breaker(breaker)
+    clock.advance(30)
+
+    probe_started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def probe():
+        probe_started.set()
+        release.wait(2)
+        return 'ok'
+
+    thread = threading.Thread(target=lambda: results.append(breaker.call(probe)))
+    thread.start()
+    probe_started.wait(2)
+    assert breaker.snapshot()['state'] == 'half_open'
+    # Só uma chamada de teste por vez
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.call(ok)
+    assert error.value.retry_after == 1
+    release.set()
+    thread.join()
+
+    assert results == ['ok']
+    assert breaker.snapshot()['state'] == 'closed'
+    assert breaker.call(ok) == 'ok'
+
+
+def test_half_open_probe_failure_reopens(tmp_path, clock):
+    breaker = make_breaker(tmp_path)
+    open_breaker(breaker)
+    clock.advance(30)
+    with pytest.raises(DuckfyAPIError):
+        breaker.call(fail())
+    assert breaker.snapshot()['state'] == 'open'
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.call(ok)
+    assert error.value.retry_after == 30
+
+
+def test_slow_probe_reopens(tmp_path, clock):
+    breaker = make_breaker(tmp_path)
+    open_breaker(breaker)
+    clock.advance(30)
+    assert breaker.call(slow(clock, 6)) == 'ok'
+    assert breaker.snapshot()['state'] == 'open'
+
+
+def test_stuck_probe_is_replaced_after_timeout(tmp_path, clock):
+    breaker = make_breaker(tmp_path)
+    open_breaker(breaker)
+    clock.advance(30)
+    # Sonda que nunca termina (worker morto no meio): o estado fica half_open
+    breaker._before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.call(ok)
+    clock.advance(10)
+    assert breaker.call(ok) == 'ok'
+    assert breaker.snapshot()['state'] == 'closed'
+
+
+def test_state_is_shared_between_workers(tmp_path, clock):
+    first = make_breaker(tmp_path)
+    second = make_breaker(tmp_path)
+    open_breaker(first)
+    with pytest.raises(CircuitOpenError):
+        second.call(ok)
+
+
+def test_route_fails_fast_while_open(api, client, pix_client, tmp_path, monkeypatch):
+    breaker = make_breaker(tmp_path)
+    open_breaker(breaker)
+    monkeypatch.setattr(api, 'get_circuit_breaker', lambda config: breaker)
+    response = client.post('/pix/create', json={'amount': 10, 'client': pix_client})
+    assert response.status_code == 503
+    assert response.get_json()['errorCode'] == 'CIRCUIT_OPEN'
+    assert int(response.headers['Retry-After']) >= 1
+
+
+def test_worker_breaker_is_created_once(tmp_path, monkeypatch):
+    opened = []
+
+    def slow_open(*args, **kwargs):
+        opened.append(1)
+        threading.Event().wait(0.05)
+        return SharedRecords(*args, **kwargs)
+
+    monkeypatch.setattr(circuit_breaker, '_breaker', None)
+    monkeypatch.setattr(circuit_breaker, 'SharedRecords', slow_open)
+    config = {
+        'SHARED_STATE_DIR': str(tmp_path / 'state'), 'BREAKER_WINDOW_SECONDS': 30, 'BREAKER_MIN_REQUESTS': 10,
+        'BREAKER_ERROR_RATE': 0.5, 'BREAKER_SLOW_CALL_SECONDS': 5, 'BREAKER_SLOW_RATE': 0.8,
+        'BREAKER_OPEN_SECONDS': 30, 'DUCKFY_CONNECT_TIMEOUT': 5, 'DUCKFY_READ_TIMEOUT': 25
+    }
+    breakers = []
+    threads = [threading.Thread(target=lambda: breakers.append(circuit_breaker.get_circuit_breaker(config)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(opened) == 1
+    assert all(breaker is breakers[0] for breaker in breakers)
+    # SHARED_STATE_DIR ainda não existia: é criado na abertura
+    assert (tmp_path / 'state').is_dir()
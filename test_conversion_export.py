@@ -0,0 +1,82 @@
+import time
+
+from conversion_export import ConversionExporter
+
+
+def wait_for(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def purchase(identifier):
+    return {'event_name': 'Purchase', 'event_id': identifier, 'custom_data': {'value': 10}}
+
+
+def test_exporter_sends_gzip_batch_with_token(receiver, receiver_url):
+    receiver.configure(token='export-token')
+    results = []
+    exporter = ConversionExporter(receiver_url, token='export-token', batch_size=10, flush_interval=0.05,
+                                  on_result=lambda result, count: results.append((result, count)))
+
+    for identifier in ('a', 'b', 'c'):
+        assert exporter.submit(purchase, identifier)
+    assert exporter.submit(lambda: None)  # evento descartado na montagem
+
+    assert wait_for(lambda: receiver.stats()['total_events'] == 3)
+    assert receiver.stats()['events'] == {'Purchase': 3}
+    assert wait_for(lambda: sum(count for result, count in results if result == 'exported') == 3)
+
+
+def test_exporter_retries_server_errors_then_gives_up(receiver, receiver_url):
+    receiver.configure(error_rate=1.0, error_status=503)
+    results = []
+    exporter = ConversionExporter(receiver_url, max_attempts=2, on_result=lambda *args: results.append(args))
+    exporter._session = exporter._build_session()
+
+    assert exporter._send([purchase('a')]) is False
+    assert receiver.stats()['failed_requests'] == 2
+    assert results == [('failed', 1)]
+
+
+def test_exporter_does_not_retry_client_errors(receiver, receiver_url):
+    receiver.configure(token='other-token')
+    results = []
+    exporter = ConversionExporter(receiver_url, token='export-token', max_attempts=3,
+                                  on_result=lambda *args: results.append(args))
+    exporter._session = exporter._build_session()
+
+    assert exporter._send([purchase('a')]) is False
+    assert results == [('rejected', 1)]
+
+
+def test_purchase_only_after_authenticated_payment(api, client, receiver, pix_client):
+    identifier = api.generate_unique_identifier()
+    response = client.post('/pix/create', json={
+        'identifier': identifier, 'amount': 49.9, 'client': pix_client, 'utm_campaign': 'teste|1'
+    })
+    assert response.status_code == 201
+    transaction_id = response.get_json()['data']['transactionId']
+    assert wait_for(lambda: receiver.stats()['events'].get('InitiateCheckout') == 1)
+
+    # Sem token (ou com token errado) o webhook é recusado e nada muda
+    paid = {'transactionId': transaction_id, 'status': 'PAID'}
+    assert client.post('/pix/webhook', json=paid).status_code == 401
+    assert client.post('/pix/webhook?token=wrong', json=paid).status_code == 401
+    time.sleep(0.3)
+    assert client.get(f'/pix/{identifier}/status').get_json()['data']['state'] == 'created'
+    assert 'Purchase' not in receiver.stats()['events']
+
+    token = api.app.config['WEBHOOK_TOKEN']
+    assert client.post(f'/pix/webhook?token={token}', json=paid).status_code == 200
+    status = client.get(f'/pix/{identifier}/status?wait=5&state=created').get_json()['data']
+    assert status['state'] == 'paid'
+    assert wait_for(lambda: receiver.stats()['events'].get('Purchase') == 1)
+
+    # Um webhook repetido não gera um segundo Purchase
+    assert client.post('/pix/webhook', json=paid, headers={'X-Webhook-Token': token}).status_code == 200
+    time.sleep(0.3)
+    assert receiver.stats()['events']['Purchase'] == 1
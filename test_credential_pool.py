@@ -0,0 +1,162 @@
+import pytest
+
+import credential_pool
+from credential_pool import _HEALTH_FORMAT, Credential, CredentialPool, parse_credentials
+from duckfy_client import DuckfyAPIError, DuckfyClient
+from shared_state import SharedRecords
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(credential_pool, 'time', fake)
+    return fake
+
+
+def make_pool(tmp_path, names=('conta-a', 'conta-b'), **options):
+    credentials = [Credential(name, f'pk-{name}', f'sk-{name}') for name in names]
+    storage = SharedRecords('credentials', _HEALTH_FORMAT, slots=len(credentials), directory=str(tmp_path))
+    settings = dict(eject_failures=3, eject_seconds=30, max_eject_seconds=300)
+    settings.update(options)
+    return CredentialPool(credentials, lambda credential: credential.name, storage, **settings)
+
+
+def responder(errors):
+    """func(client) do pool: o 'client' é o nome da chave; errors mapeia nome -> status de erro"""
+    calls = []
+
+    def send(name):
+        calls.append(name)
+        if name in errors:
+            error = DuckfyAPIError('falhou', status_code=errors[name])
+            if errors[name] == 429:
+                error.retry_after = 5
+            raise error
+        return {'ok': name}
+
+    send.calls = calls
+    return send
+
+
+def states(pool):
+    return {key['name']: key['state'] for key in pool.snapshot()['keys']}
+
+
+def test_parse_credentials():
+    credentials = parse_credentials('conta-a:PK1:SK1:2, conta-b:PK2:SK2')
+    assert [(c.name, c.public_key, c.secret_key, c.weight) for c in credentials] == [
+        ('conta-a', 'PK1', 'SK1', 2.0), ('conta-b', 'PK2', 'SK2', 1.0)]
+    assert [c.name for c in parse_credentials('', 'PK', 'SK')] == ['default']
+    for invalid in ('conta-a:PK1', 'conta-a:PK1:SK1:0', 'conta-a:PK1:SK1,conta-a:PK2:SK2'):
+        with pytest.raises(ValueError):
+            parse_credentials(invalid)
+
+
+@pytest.mark.parametrize('status', [401, 403, 429])
+def test_failover_to_another_key(tmp_path, clock, status):
+    pool = make_pool(tmp_path, strategy='weighted')
+    send = responder({'conta-a': status})
+    for _ in range(20):
+        assert pool.call(send) == ('conta-b', {'ok': 'conta-b'})
+    # A chave recusada saiu do rodízio: no máximo uma tentativa nela
+    assert send.calls.count('conta-a') <= 1
+    assert states(pool) == {'conta-a': 'ejected', 'conta-b': 'active'}
+
+
+def test_retry_after_and_auth_ejection_times(tmp_path, clock):
+    pool = make_pool(tmp_path, names=('conta-a',))
+    with pytest.raises(DuckfyAPIError):
+        pool.call(responder({'conta-a': 429}))
+    assert pool.snapshot()['keys'][0]['retry_after'] == 5
+
+    clock.advance(5)
+    with pytest.raises(DuckfyAPIError):
+        pool.call(responder({'conta-a': 401}))
+    assert pool.snapshot()['keys'][0]['retry_after'] == 300
+
+
+def test_server_errors_are_not_retried(tmp_path, clock):
+    pool = make_pool(tmp_path)
+    send = responder({'conta-a': 502, 'conta-b': 502})
+    with pytest.raises(DuckfyAPIError) as error:
+        pool.call(send)
+    # O POST pode ter criado a cobrança: não repete em outra chave
+    assert error.value.status_code == 502 and len(send.calls) == 1
+
+
+def test_failover_stops_after_second_key(tmp_path, clock):
+    pool = make_pool(tmp_path, names=('conta-a', 'conta-b', 'conta-c'))
+    send = responder({'conta-a': 401, 'conta-b': 401, 'conta-c': 401})
+    with pytest.raises(DuckfyAPIError):
+        pool.call(send)
+    assert len(send.calls) == 2
+
+
+def test_consecutive_failures_eject_with_backoff(tmp_path, clock):
+    pool = make_pool(tmp_path, names=('conta-a',))
+    for _ in range(3):
+        with pytest.raises(DuckfyAPIError):
+            pool.call(responder({'conta-a': 500}))
+    assert pool.snapshot()['keys'][0]['retry_after'] == 30
+
+    # Volta depois do prazo; nova ejeção seguida dobra o tempo
+    clock.advance(30)
+    for _ in range(3):
+        with pytest.raises(DuckfyAPIError):
+            pool.call(responder({'conta-a': 500}))
+    assert pool.snapshot()['keys'][0]['retry_after'] == 60
+
+    # Um sucesso zera o histórico
+    clock.advance(60)
+    assert pool.call(responder({})) == ('conta-a', {'ok': 'conta-a'})
+    assert pool.snapshot()['keys'][0]['consecutive_failures'] == 0
+    for _ in range(3):
+        with pytest.raises(DuckfyAPIError):
+            pool.call(responder({'conta-a': 500}))
+    assert pool.snapshot()['keys'][0]['retry_after'] == 30
+
+
+def test_all_keys_ejected_uses_first_to_return(tmp_path, clock):
+    pool = make_pool(tmp_path, strategy='weighted')
+    with pytest.raises(DuckfyAPIError):
+        pool.call(responder({'conta-a': 401, 'conta-b': 429}))
+    assert states(pool) == {'conta-a': 'ejected', 'conta-b': 'ejected'}
+    assert pool.call(responder({})) == ('conta-b', {'ok': 'conta-b'})
+
+
+def test_health_is_shared_between_workers(tmp_path, clock):
+    first = make_pool(tmp_path, strategy='weighted')
+    second = make_pool(tmp_path, strategy='weighted')
+    member = first.acquire(exclude=('conta-b',))
+    first.release(member, failed=True, eject_for=60)
+    send = responder({})
+    for _ in range(20):
+        second.call(send)
+    assert set(send.calls) == {'conta-b'}
+
+
+def test_failover_against_gateway(api, stub, tmp_path, clock):
+    stub.configure(status='OK', reject_keys=('pk-conta-a',))
+    base_url = api.app.config['DUCKFY_BASE_URL']
+    credentials = [Credential(name, f'pk-{name}', f'sk-{name}') for name in ('conta-a', 'conta-b')]
+    storage = SharedRecords('credentials', _HEALTH_FORMAT, slots=2, directory=str(tmp_path))
+    pool = CredentialPool(
+        credentials,
+        lambda credential: DuckfyClient(base_url, credential.public_key, credential.secret_key),
+        storage
+    )
+    for _ in range(20):
+        name, result = pool.call(lambda client: client.create_pix({'identifier': 'x', 'amount': 10}))
+        assert name == 'conta-b' and result['transactionId']
+    assert states(pool) == {'conta-a': 'ejected', 'conta-b': 'active'}
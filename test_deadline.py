@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+import deadline as deadline_module
+from deadline import (Deadline, DeadlineExceeded, LatencyTracker, deadline_from_request, parse_route_defaults,
+                      upstream_timeouts)
+from duckfy_client import DuckfyClient
+
+NOW = 1_700_000_000.0
+ROUTES = {'/pix/create/batch': 28.0}
+
+
+@pytest.fixture
+def frozen(monkeypatch):
+    monkeypatch.setattr(deadline_module.time, 'time', lambda: NOW)
+
+
+def budget(headers, route='/pix/create', default=25, max_seconds=28):
+    return deadline_from_request(headers, route, default, ROUTES, max_seconds).expires_at - NOW
+
+
+def test_parse_route_defaults():
+    assert parse_route_defaults('/pix/create=20, /pix/create/batch=28') == {'/pix/create': 20.0,
+                                                                            '/pix/create/batch': 28.0}
+    assert parse_route_defaults('') == {} and parse_route_defaults(None) == {}
+
+
+def test_budget_precedence(frozen):
+    assert budget({}) == 25
+    assert budget({}, route='/pix/create/batch') == 28
+    assert budget({'X-Request-Timeout': '3'}) == 3
+    assert budget({'X-Request-Deadline': str(NOW + 7), 'X-Request-Timeout': '3'}) == 7
+    # Cabeçalho inválido cai no padrão da rota
+    assert budget({'X-Request-Timeout': 'logo'}) == 25
+
+
+def test_budget_never_exceeds_worker_timeout(frozen):
+    assert budget({'X-Request-Timeout': '120'}) == 28
+    assert budget({'X-Request-Deadline': str(NOW + 600)}) == 28
+
+
+@pytest.mark.parametrize('header', [f't={int((NOW - 2) * 1000)}', str(NOW - 2), str(int((NOW - 2) * 1_000_000))])
+def test_request_start_discounts_queue_time(frozen, header):
+    assert budget({'X-Request-Start': header}) == pytest.approx(23)
+
+
+def test_request_start_in_the_future_is_ignored(frozen):
+    assert budget({'X-Request-Start': str(NOW + 60)}) == 25
+    assert budget({'X-Request-Start': 'ontem'}) == 25
+
+
+def test_upstream_timeouts_split_remaining_budget():
+    assert upstream_timeouts(None, 5, 25, 0.5) == (5, 25)
+    connect, read = upstream_timeouts(Deadline(time.time() + 4), 5, 25, 0.5)
+    assert connect == pytest.approx(1, abs=0.01)
+    assert connect + read == pytest.approx(4, abs=0.01)
+    # Com folga, valem os timeouts configurados
+    assert upstream_timeouts(Deadline(time.time() + 100), 5, 25, 0.5) == (5, 25)
+
+    with pytest.raises(DeadlineExceeded) as error:
+        upstream_timeouts(Deadline(time.time() + 0.2), 5, 25, 0.5)
+    assert error.value.status_code == 504 and error.value.error_code == 'DEADLINE_EXCEEDED'
+
+
+def test_adaptive_read_timeout():
+    tracker = LatencyTracker(size=100, min_samples=10, multiplier=2.0, floor=1.0, ceiling=25.0, recompute_every=10)
+    for _ in range(9):
+        tracker.observe(0.2)
+    # Poucas amostras: fica no teto configurado
+    assert tracker.p99 is None and tracker.read_timeout() == 25.0
+
+    tracker.observe(0.2)
+    assert tracker.p99 == 0.2
+    assert tracker.read_timeout() == 1.0  # 0.4 fica abaixo do piso
+
+    for _ in range(9):
+        tracker.observe(3.0)
+    # Só recalcula a cada recompute_every amostras
+    assert tracker.p99 == 0.2
+    tracker.observe(3.0)
+    assert tracker.read_timeout() == 6.0
+
+    for _ in range(100):
+        tracker.observe(60.0)
+    assert tracker.read_timeout() == 25.0
+
+
+def test_route_fails_without_budget(client, pix_client, monkeypatch):
+    called = []
+    monkeypatch.setattr(DuckfyClient, 'create_pix', lambda self, *args, **kwargs: called.append(1))
+    response = client.post('/pix/create', json={'amount': 10, 'client': pix_client},
+                           headers={'X-Request-Timeout': '0.2'})
+    assert response.status_code == 504
+    assert response.get_json()['errorCode'] == 'DEADLINE_EXCEEDED'
+    assert not called
+
+
+def test_route_uses_adaptive_timeout_and_deadline(api, client, pix_client, monkeypatch):
+    timeouts = []
+    create_pix = DuckfyClient.create_pix
+
+    def recording_create_pix(self, pix_data, timeout=None):
+        timeouts.append(timeout)
+        return create_pix(self, pix_data, timeout=timeout)
+
+    tracker = LatencyTracker(min_samples=1, recompute_every=1, multiplier=2.0, floor=0.5, ceiling=25.0)
+    tracker.observe(1.5)
+    monkeypatch.setattr(api, 'latency_tracker', tracker)
+    monkeypatch.setattr(DuckfyClient, 'create_pix', recording_create_pix)
+
+    assert client.post('/pix/create', json={'amount': 10, 'client': pix_client}).status_code == 201
+    assert timeouts[-1][1] == 3.0
+
+    response = client.post('/pix/create', json={'amount': 10, 'client': pix_client},
+                           headers={'X-Request-Timeout': '2'})
+    assert response.status_code == 201
+    connect, read = timeouts[-1]
+    assert connect + read <= 2
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from database import SQLiteDatabase
+from idempotency import IdempotencyCache, IdempotencyConflict
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'api_pix.db')
+
+
+def test_idempotency_shared_between_workers(db_path):
+    # Duas instâncias no mesmo banco fazem o papel de dois workers
+    first = IdempotencyCache(SQLiteDatabase(db_path))
+    second = IdempotencyCache(SQLiteDatabase(db_path))
+    calls = []
+    started = threading.Event()
+
+    def create():
+        calls.append(1)
+        started.set()
+        time.sleep(0.3)
+        return {'transactionId': 'tx-1'}
+
+    results = {}
+    thread = threading.Thread(target=lambda: results.setdefault('first', first.execute('k', 'fp', create)))
+    thread.start()
+    started.wait(2)
+    results['second'] = second.execute('k', 'fp', create)
+    thread.join()
+
+    assert len(calls) == 1
+    assert results['first'] == ({'transactionId': 'tx-1'}, False)
+    assert results['second'] == ({'transactionId': 'tx-1'}, True)
+    with pytest.raises(IdempotencyConflict):
+        second.execute('k', 'outro-corpo', create)
+
+
+def test_idempotency_failure_releases_key(db_path):
+    first = IdempotencyCache(SQLiteDatabase(db_path))
+    second = IdempotencyCache(SQLiteDatabase(db_path))
+
+    def fail():
+        raise RuntimeError('gateway fora do ar')
+
+    with pytest.raises(RuntimeError):
+        first.execute('k', 'fp', fail)
+    assert second.execute('k', 'fp', lambda: {'ok': True}) == ({'ok': True}, False)
+
+
+def test_idempotency_takes_over_stale_claim(db_path):
+    cache = IdempotencyCache(SQLiteDatabase(db_path), pending_timeout=0.1)
+    now = time.time()
+    # Reserva deixada por um worker que morreu no meio da chamada
+    cache.db.execute(
+        "INSERT INTO idempotency_keys (key, fingerprint, state, created_at, expires_at) VALUES ('k', 'fp', 'pending', ?, ?)",
+        (now - 1, now + 600)
+    )
+    assert cache.execute('k', 'fp', lambda: {'ok': True}) == ({'ok': True}, False)
+
+
+def test_create_route_replays_idempotency_key(client, pix_client):
+    body = {'amount': 21, 'client': pix_client}
+    headers = {'Idempotency-Key': f'key-{pix_client["cpf"]}'}
+    first = client.post('/pix/create', json=body, headers=headers)
+    second = client.post('/pix/create', json=body, headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert first.get_json()['data']['transactionId'] == second.get_json()['data']['transactionId']
+
+    conflict = client.post('/pix/create', json={**body, 'amount': 22}, headers=headers)
+    assert conflict.status_code == 409
+
+
+def test_memory_cache_is_bounded_by_bytes(db_path):
+    cache = IdempotencyCache(SQLiteDatabase(db_path), max_bytes=1000)
+    qr = {'pix': {'base64': 'A' * 300}}
+    for index in range(5):
+        cache.execute(f'k{index}', 'fp', lambda: qr)
+    assert len(cache) == 3 and cache._bytes <= 1000
+    # Respostas maiores que o limite ficam só no banco, e continuam sendo repetidas
+    cache.execute('grande', 'fp', lambda: {'pix': {'base64': 'A' * 2000}})
+    assert 'grande' not in cache._entries
+    assert cache.execute('grande', 'fp', lambda: {})[1] is True
+    # As mais antigas saíram da memória, mas não do banco
+    assert cache.execute('k0', 'fp', lambda: {}) == (qr, True)
@@ -0,0 +1,80 @@
+import os
+import threading
+
+import pytest
+
+import identifiers
+from identifiers import ALPHABET, IDENTIFIER_LENGTH, IdentifierGenerator, identifier_time
+
+
+def test_format_and_prefix():
+    generator = IdentifierGenerator()
+    identifier = generator.new()
+    assert len(identifier) == IDENTIFIER_LENGTH
+    assert set(identifier) <= set(ALPHABET)
+
+    prefixed = generator.new('SEDEX_')
+    assert prefixed.startswith('SEDEX_') and len(prefixed) == IDENTIFIER_LENGTH + 6
+
+
+def test_identifier_time_round_trip(monkeypatch):
+    monkeypatch.setattr(identifiers.time, 'time_ns', lambda: 1_700_000_000_123_456_789)
+    generator = IdentifierGenerator()
+    assert identifier_time(generator.new()) == 1_700_000_000.123
+    assert identifier_time(generator.new('SEDEX_')) == 1_700_000_000.123
+    assert identifier_time('a1b2c3d4e5') is None
+    assert identifier_time('pedido-' + 'u' * IDENTIFIER_LENGTH) is None
+
+
+def test_sorted_by_creation_time(monkeypatch):
+    clock = iter(range(1_700_000_000_000, 1_700_000_000_000 + 5000))
+    monkeypatch.setattr(identifiers.time, 'time_ns', lambda: next(clock) * 1_000_000)
+    generator = IdentifierGenerator(batch=16)
+    generated = [generator.new() for _ in range(5000)]
+    assert generated == sorted(generated)
+    # Comparar as strings equivale a comparar os instantes
+    assert [identifier_time(i) for i in generated] == sorted(identifier_time(i) for i in generated)
+
+
+def test_unique_within_the_same_millisecond(monkeypatch):
+    monkeypatch.setattr(identifiers.time, 'time_ns', lambda: 1_700_000_000_000_000_000)
+    generator = IdentifierGenerator(batch=64)
+    generated = [generator.new() for _ in range(50000)]
+    assert len(set(generated)) == len(generated)
+    assert len({identifier[:10] for identifier in generated}) == 1
+
+
+def test_unique_across_threads():
+    generator = IdentifierGenerator(batch=32)
+    results = [[] for _ in range(8)]
+
+    def generate(bucket):
+        for _ in range(5000):
+            bucket.append(generator.new())
+
+    threads = [threading.Thread(target=generate, args=(bucket,)) for bucket in results]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    generated = [identifier for bucket in results for identifier in bucket]
+    assert len(set(generated)) == 40000
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork indisponível')
+def test_forked_worker_does_not_repeat_parent_sequence():
+    generator = IdentifierGenerator()
+    generator.new()  # bloco aleatório já carregado antes do fork
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        os.write(write, ','.join(generator.new()[10:] for _ in range(100)).encode())
+        os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as pipe:
+        child = set(pipe.read().split(','))
+    os.waitpid(pid, 0)
+    parent = {generator.new()[10:] for _ in range(100)}
+    assert len(child) == 100
+    assert not child & parent
@@ -0,0 +1,124 @@
+import threading
+import time
+
+ASYNC = {'Prefer': 'respond-async'}
+
+
+def webhook(client, api, payload):
+    return client.post('/pix/webhook', json=payload, headers={'X-Webhook-Token': api.app.config['WEBHOOK_TOKEN']})
+
+
+def wait_state(client, identifier, known_state, timeout=5):
+    response = client.get(f'/pix/{identifier}/status?wait={timeout}&state={known_state}')
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+def parse_sse(body):
+    """Eventos (nome, id) de um stream SSE"""
+    events = []
+    for block in body.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], fields.get('id')))
+    return events
+
+
+def test_new_charge_is_pending_even_when_gateway_answers_ok(client, created_pix):
+    # O stub responde status 'OK' na criação, como a Duckfy
+    identifier, transaction_id = created_pix
+    status = client.get(f'/pix/{identifier}/status').get_json()['data']
+    assert status == {'identifier': identifier, 'state': 'created', 'transactionId': transaction_id,
+                      'paymentStatus': 'PENDING'}
+
+
+def test_unknown_status_keeps_pix_open_and_closed_status_ends_it(api, client, created_pix):
+    identifier, transaction_id = created_pix
+    assert webhook(client, api, {'transactionId': transaction_id, 'status': 'WAITING_PAYMENT'}).status_code == 200
+    time.sleep(0.3)
+    status = client.get(f'/pix/{identifier}/status').get_json()['data']
+    assert status['state'] == 'created'
+
+    assert webhook(client, api, {'transactionId': transaction_id, 'status': 'EXPIRED'}).status_code == 200
+    status = wait_state(client, identifier, 'created')
+    assert (status['state'], status['paymentStatus']) == ('closed', 'EXPIRED')
+
+
+def test_webhook_wakes_long_poll_and_sse(api, client, created_pix):
+    identifier, transaction_id = created_pix
+
+    def pay():
+        time.sleep(0.3)
+        webhook(client, api, {'transactionId': transaction_id, 'status': 'PAID'})
+
+    threading.Thread(target=pay).start()
+    start = time.monotonic()
+    response = client.get(f'/pix/{identifier}/events')
+    assert response.mimetype == 'text/event-stream'
+    events = parse_sse(response.get_data(as_text=True))
+    assert events == [('created', 'created'), ('paid', 'paid')]
+    assert time.monotonic() - start < 5
+
+    assert client.get(f'/pix/{identifier}/status').get_json()['data']['state'] == 'paid'
+    # Reconexão depois do estado final: nada mais a enviar
+    assert client.get(f'/pix/{identifier}/events', headers={'Last-Event-ID': 'paid'}).status_code == 204
+
+
+def test_async_creation_reports_created_then_paid(api, client, pix_client):
+    response = client.post('/pix/create', json={'amount': 12.5, 'client': pix_client}, headers=ASYNC)
+    assert response.status_code == 202
+    data = response.get_json()['data']
+    identifier = data['identifier']
+    assert data['statusUrl'].endswith(f'/pix/{identifier}/status')
+
+    status = wait_state(client, identifier, 'pending')
+    assert status['state'] == 'created'
+    assert status['data']['transactionId'] == status['transactionId']
+
+    webhook(client, api, {'identifier': identifier, 'status': 'PAID'})
+    assert wait_state(client, identifier, 'created')['state'] == 'paid'
+
+
+def test_async_retry_of_failed_job_keeps_job_identifier(api, client, stub, pix_client):
+    body = {'amount': 15, 'client': pix_client}
+    headers = {**ASYNC, 'Idempotency-Key': f'retry-{pix_client["cpf"]}'}
+
+    stub.configure(status='OK', error_rate=1.0, error_status=400)
+    response = client.post('/pix/create', json=body, headers=headers)
+    assert response.status_code == 202
+    identifier = response.get_json()['data']['identifier']
+    assert wait_state(client, identifier, 'pending')['state'] == 'failed'
+
+    stub.configure(status='OK')
+    response = client.post('/pix/create', json=body, headers=headers)
+    assert response.status_code == 202
+    assert response.get_json()['data']['identifier'] == identifier
+
+    status = wait_state(client, identifier, 'pending')
+    assert status['state'] == 'created'
+    # A transação foi registrada com o identifier do job, não com um novo
+    assert api.transaction_store.get(identifier)['transaction_id'] == status['transactionId']
+
+
+def test_status_changes_opens_shared_state_once(tmp_path, monkeypatch):
+    import async_jobs
+
+    opened = []
+    shared_records = async_jobs.SharedRecords
+
+    def slow_open(*args, **kwargs):
+        opened.append(1)
+        time.sleep(0.05)
+        return shared_records(*args, **kwargs)
+
+    monkeypatch.setattr(async_jobs, 'SharedRecords', slow_open)
+    changes = async_jobs.StatusChanges(slots=16, directory=str(tmp_path))
+    threads = [threading.Thread(target=changes.version, args=('pix',)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(opened) == 1
+
+    changes.notify('pix')
+    assert changes.version('pix') == 1
@@ -0,0 +1,135 @@
+import gzip
+import json
+import base64
+
+import pytest
+from werkzeug.http import parse_accept_header
+from werkzeug.wrappers import Response
+
+import compression
+from compression import compress_response
+from database import SQLiteDatabase
+from qr_images import QRImageStore, decode_data_uri
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 4
+
+
+def data_uri(png=PNG):
+    return 'data:image/png;base64,' + base64.b64encode(png).decode()
+
+
+@pytest.fixture
+def database(tmp_path):
+    return SQLiteDatabase(str(tmp_path / 'qr.db'))
+
+
+def test_decode_data_uri():
+    assert decode_data_uri(data_uri()) == PNG
+    assert decode_data_uri(base64.b64encode(PNG).decode()) == PNG
+    for invalid in (None, '', 'data:image/png;base64,não é base64', 123):
+        assert decode_data_uri(invalid) is None
+
+
+def test_store_and_read_back(database):
+    store = QRImageStore(database)
+    assert store.put('tx-1', 'pedido-1', data_uri()) is True
+    png, etag = store.get('tx-1')
+    assert png == PNG
+    assert store.get('pedido-1') == (PNG, etag)
+    assert store.get('tx-2') is None
+    assert store.put('tx-2', 'pedido-2', 'data:image/png;base64,???') is False
+
+    # Outro worker (outro LRU) encontra a imagem no banco, com o mesmo ETag
+    assert QRImageStore(database).get('tx-1') == (PNG, etag)
+
+
+def test_memory_cache_is_bounded(database):
+    store = QRImageStore(database, max_bytes=(len(PNG) + 1) * 2)
+    for index in range(5):
+        store.put(f'tx-{index}', f'pedido-{index}', data_uri(PNG + bytes([index])))
+    assert list(store._entries) == ['tx-3', 'tx-4']
+    assert store._size <= store.max_bytes
+    # Fora da memória, continua disponível no banco
+    assert store.get('tx-0')[0] == PNG + b'\x00'
+
+
+def accept(value):
+    return parse_accept_header(value)
+
+
+def json_response(size=2048, etag=None):
+    response = Response(json.dumps({'pix': 'x' * size}), mimetype='application/json')
+    if etag:
+        response.set_etag(etag)
+    return response
+
+
+@pytest.mark.skipif(compression.brotli is None, reason='brotli não instalado')
+def test_brotli_preferred_when_accepted():
+    response = compress_response(json_response(), accept('gzip, deflate, br'))
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(compression.brotli.decompress(response.get_data()))['pix'] == 'x' * 2048
+
+
+def test_encoding_negotiation():
+    response = compress_response(json_response(etag='abc'), accept('gzip'))
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.get_data()))['pix'] == 'x' * 2048
+    assert 'Accept-Encoding' in response.headers['Vary']
+    # Os bytes mudaram: o ETag forte vira fraco
+    assert response.get_etag() == ('abc', True)
+
+    for encodings in (accept(''), accept('identity'), accept('gzip;q=0, deflate')):
+        response = compress_response(json_response(), encodings)
+        assert 'Content-Encoding' not in response.headers
+        assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_small_and_non_json_bodies_are_not_compressed():
+    assert 'Content-Encoding' not in compress_response(json_response(size=10), accept('gzip')).headers
+    image = compress_response(Response(PNG, mimetype='image/png'), accept('gzip'))
+    assert 'Content-Encoding' not in image.headers and image.get_data() == PNG
+
+
+def create_lean_pix(client, pix_client, prefer='return=minimal'):
+    response = client.post('/pix/create', json={'amount': 10, 'client': pix_client}, headers={'Prefer': prefer})
+    assert response.status_code == 201
+    return response.get_json()['data']
+
+
+def test_lean_response_serves_qr_image(api, client, stub, pix_client):
+    pix = create_lean_pix(client, pix_client)['pix']
+    assert 'base64' not in pix
+    path = pix['qrCodeUrl'].replace(api.app.config['PUBLIC_BASE_URL'], '')
+
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert response.get_data() == decode_data_uri(stub.StubConfig.qr_base64)
+    assert response.headers['Cache-Control'] == f"public, max-age={api.app.config['QR_IMAGE_MAX_AGE']}, immutable"
+    assert 'Content-Encoding' not in response.headers
+
+    etag = response.headers['ETag']
+    cached = client.get(path, headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.get_data() == b''
+    assert cached.headers['ETag'] == etag
+    assert client.get(path, headers={'If-None-Match': '"outro"'}).status_code == 200
+
+
+def test_qr_image_not_found(client):
+    assert client.get('/pix/nao-existe/qr.png').status_code == 404
+
+
+def test_full_response_is_compressed(client, pix_client):
+    response = client.post('/pix/create', json={'amount': 10, 'client': pix_client},
+                           headers={'Prefer': 'return=representation', 'Accept-Encoding': 'gzip'})
+    assert response.status_code == 201
+    assert response.headers['Content-Encoding'] == 'gzip'
+    body = json.loads(gzip.decompress(response.get_data()))
+    assert body['data']['pix']['base64'].startswith('data:image/png;base64,')
+    assert 'qrCodeUrl' not in body['data']['pix']
+
+    plain = client.post('/pix/create', json={'amount': 10, 'client': pix_client},
+                        headers={'Prefer': 'return=representation'})
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.get_json()['data']['pix']['base64']
@@ -0,0 +1,96 @@
+import pytest
+
+from rate_limit import (MemoryBucketBackend, RateLimiter, SharedBucketBackend, client_ip, parse_rate_limit_rules,
+                        without_dimension)
+
+RULES = '/pix/create=ip:3/60,cpf:2/600;/pix/create/batch=ip:1/10'
+
+
+@pytest.fixture(params=['memory', 'shared'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBucketBackend()
+    return SharedBucketBackend(slots=64, directory=str(tmp_path))
+
+
+def test_parse_rules():
+    assert parse_rate_limit_rules(RULES) == {
+        '/pix/create': (('ip', 3.0, 0.05), ('cpf', 2.0, 2 / 600)),
+        '/pix/create/batch': (('ip', 1.0, 0.1),)
+    }
+    assert parse_rate_limit_rules('') == {}
+
+
+def test_without_dimension_drops_empty_routes():
+    rules = parse_rate_limit_rules(RULES)
+    assert without_dimension(rules, 'ip') == {'/pix/create': (('cpf', 2.0, 2 / 600),)}
+
+
+def test_client_ip_trusts_only_configured_proxies():
+    assert client_ip('10.0.0.1', '1.1.1.1, 2.2.2.2') == '10.0.0.1'
+    assert client_ip('10.0.0.1', '1.1.1.1, 2.2.2.2', trusted_proxies=1) == '2.2.2.2'
+    assert client_ip('10.0.0.1', '1.1.1.1, 2.2.2.2', trusted_proxies=2) == '1.1.1.1'
+    assert client_ip('10.0.0.1', '2.2.2.2', trusted_proxies=2) == '10.0.0.1'
+    assert client_ip(None) == 'unknown'
+
+
+def test_bucket_rejects_when_empty_and_refills(backend):
+    limiter = RateLimiter(parse_rate_limit_rules('/pix/create=ip:3/60'), backend)
+    identities = {'ip': '1.1.1.1'}
+    for _ in range(3):
+        assert limiter.check('/pix/create', identities, now=1000.0) == (0, None)
+    # Balde vazio: 1 token volta a cada 20s
+    assert limiter.check('/pix/create', identities, now=1000.0) == (20, 'ip')
+    assert limiter.check('/pix/create', identities, now=1010.0) == (10, 'ip')
+    assert limiter.check('/pix/create', identities, now=1020.0) == (0, None)
+    assert limiter.check('/pix/create', identities, now=1020.0) == (20, 'ip')
+
+    # Depois de um minuto parado o balde está cheio de novo, sem passar da capacidade
+    for _ in range(3):
+        assert limiter.check('/pix/create', identities, now=2000.0) == (0, None)
+    assert limiter.check('/pix/create', identities, now=2000.0)[1] == 'ip'
+
+    # Outros IPs e outras rotas têm baldes próprios
+    assert limiter.check('/pix/create', {'ip': '2.2.2.2'}, now=2000.0) == (0, None)
+    assert limiter.check('/pix/create/batch', identities, now=2000.0) == (0, None)
+
+
+def test_rejection_consumes_no_token(backend):
+    limiter = RateLimiter(parse_rate_limit_rules(RULES), backend)
+    assert limiter.check('/pix/create', {'ip': '1.1.1.1', 'cpf': '52998224725'}, now=0.0) == (0, None)
+    assert limiter.check('/pix/create', {'ip': '1.1.1.1', 'cpf': '52998224725'}, now=0.0) == (0, None)
+    # O CPF esgotou: a recusa não gasta o token do IP
+    assert limiter.check('/pix/create', {'ip': '1.1.1.1', 'cpf': '52998224725'}, now=0.0) == (300, 'cpf')
+    assert limiter.check('/pix/create', {'ip': '1.1.1.1', 'cpf': '11144477735'}, now=0.0) == (0, None)
+    assert limiter.check('/pix/create', {'ip': '1.1.1.1'}, now=0.0) == (20, 'ip')
+
+
+def test_shared_buckets_are_seen_by_every_worker(tmp_path):
+    rules = parse_rate_limit_rules('/pix/create=cpf:1/600')
+    first = RateLimiter(rules, SharedBucketBackend(slots=64, directory=str(tmp_path)))
+    second = RateLimiter(rules, SharedBucketBackend(slots=64, directory=str(tmp_path)))
+    assert first.check('/pix/create', {'cpf': '52998224725'}, now=0.0) == (0, None)
+    assert second.check('/pix/create', {'cpf': '52998224725'}, now=0.0) == (600, 'cpf')
+
+
+def test_memory_backend_is_bounded():
+    backend = MemoryBucketBackend(max_entries=2)
+    limiter = RateLimiter(parse_rate_limit_rules('/pix/create=ip:1/60'), backend)
+    for ip in ('1.1.1.1', '2.2.2.2', '3.3.3.3'):
+        limiter.check('/pix/create', {'ip': ip}, now=0.0)
+    assert len(backend._buckets) == 2
+    # O balde mais antigo foi esquecido e recomeça cheio
+    assert limiter.check('/pix/create', {'ip': '1.1.1.1'}, now=0.0) == (0, None)
+
+
+def test_route_answers_429_per_cpf(api, client, pix_client, monkeypatch):
+    limiter = RateLimiter(parse_rate_limit_rules('/pix/create=cpf:1/600'), MemoryBucketBackend())
+    monkeypatch.setitem(api.app.config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(api, 'rate_limiter', limiter)
+
+    body = {'amount': 10, 'client': pix_client}
+    assert client.post('/pix/create', json=body).status_code == 201
+    response = client.post('/pix/create', json=body)
+    assert response.status_code == 429
+    assert response.get_json()['errorCode'] == 'RATE_LIMITED'
+    assert response.headers['Retry-After'] == '600'
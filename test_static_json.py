@@ -0,0 +1,69 @@
+import gzip
+
+import pytest
+from flask import request
+
+import fast_json
+from fast_json import StaticJSON, dumps_bytes, loads
+
+EXAMPLE = {'exemplo': 'PIX', 'itens': list(range(300))}
+COMPRESSION = {'min_size': 512, 'gzip_level': 6, 'brotli_quality': 4}
+
+
+def test_dumps_bytes_round_trip():
+    obj = {'nome': 'João', 'valor': 10.5, 'lista': [1, None, True]}
+    assert loads(dumps_bytes(obj)) == obj
+    assert b'\n' in dumps_bytes(obj, indent=True)
+
+
+def test_static_json_etag_and_304(api):
+    static = StaticJSON(EXAMPLE, max_age=60)
+    with api.app.test_request_context():
+        response = static.response(request, api.app.response_class)
+    assert response.status_code == 200
+    assert loads(response.get_data()) == EXAMPLE
+    assert response.get_etag() == (static.etag, False)
+    assert response.headers['Cache-Control'] == 'public, max-age=60'
+
+    for if_none_match in (f'"{static.etag}"', f'W/"{static.etag}"', f'"outro", "{static.etag}"'):
+        with api.app.test_request_context(headers={'If-None-Match': if_none_match}):
+            response = static.response(request, api.app.response_class)
+        assert response.status_code == 304 and response.get_data() == b''
+
+    with api.app.test_request_context(headers={'If-None-Match': '"outro"'}):
+        assert static.response(request, api.app.response_class).status_code == 200
+
+
+def test_static_json_compresses_once_per_encoding(api, monkeypatch):
+    calls = []
+    compress_body = fast_json.compress_body
+    monkeypatch.setattr(fast_json, 'compress_body', lambda body, encoding, **kw: calls.append(encoding)
+                        or compress_body(body, encoding, **kw))
+    static = StaticJSON(EXAMPLE, compression=COMPRESSION)
+
+    for _ in range(3):
+        with api.app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+            response = static.response(request, api.app.response_class)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.get_etag() == (static.etag, True)
+        assert 'Accept-Encoding' in response.vary
+        assert loads(gzip.decompress(response.get_data())) == EXAMPLE
+    assert calls == ['gzip']
+
+    with api.app.test_request_context(headers={'Accept-Encoding': 'identity'}):
+        response = static.response(request, api.app.response_class)
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == static.body
+
+
+@pytest.mark.parametrize('accept, expected', [('gzip, br', 'br'), ('gzip', 'gzip'), ('', None)])
+def test_example_route_serves_cached_variants(client, accept, expected):
+    if expected == 'br':
+        pytest.importorskip('brotli')
+    response = client.get('/pix/example', headers={'Accept-Encoding': accept})
+    assert response.status_code == 200
+    assert response.headers.get('Content-Encoding') == expected
+    etag, _ = response.get_etag()
+
+    again = client.get('/pix/example', headers={'Accept-Encoding': accept, 'If-None-Match': f'W/"{etag}"'})
+    assert again.status_code == 304
@@ -0,0 +1,77 @@
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+from structured_logging import BackgroundLogHandler, JSONLineFormatter, Redactor
+
+
+@pytest.fixture
+def log():
+    """Logger próprio com o pipeline em background; lines() para a thread e devolve as linhas"""
+    stream = io.StringIO()
+    redactor = Redactor(secrets=('segredo-da-duckfy',))
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JSONLineFormatter(redactor))
+    handler = BackgroundLogHandler([output], redactor)
+    logger = logging.getLogger('test_structured_logging')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+
+    def lines():
+        handler.close()  # o listener escreve o que estiver na fila antes de parar
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    logger.lines = lines
+    yield logger
+    logger.removeHandler(handler)
+    handler.close()
+
+
+def test_reserved_keys_are_not_overwritten(log):
+    log.info('pix criado', extra={'fields': {'msg': 'falso', 'level': 'DEBUG', 'ts': 0, 'event': 'create'}})
+    entry, = log.lines()
+    assert entry['msg'] == 'pix criado'
+    assert entry['level'] == 'INFO'
+    assert entry['ts'] != 0
+    assert entry['event'] == 'create'
+
+
+def test_fields_and_message_are_redacted(log):
+    log.info('chave %s cliente 529.982.247-25', 'segredo-da-duckfy', extra={'fields': {
+        'payload': {'client': {'cpf': '52998224725', 'email': 'maria@example.com'}, 'token': 'abc'},
+        'pix': {'base64': 'A' * 100}
+    }})
+    entry, = log.lines()
+    assert 'segredo-da-duckfy' not in entry['msg'] and '529.982.247-25' not in entry['msg']
+    assert entry['payload'] == {'client': {'cpf': '***25', 'email': 'm***@example.com'}, 'token': '[REDACTED]'}
+    assert entry['pix'] == {'base64': '<base64 100 chars>'}
+
+
+def test_request_thread_only_snapshots(log, monkeypatch):
+    threads = set()
+    redact = Redactor.redact
+
+    def tracking_redact(self, value, depth=0):
+        threads.add(threading.current_thread().name)
+        return redact(self, value, depth)
+
+    monkeypatch.setattr(Redactor, 'redact', tracking_redact)
+    payload = {'client': {'name': 'Maria'}, 'items': [1]}
+    log.info('payload', extra={'fields': {'payload': payload}})
+    # Mudanças depois do log não aparecem na linha
+    payload['client']['name'] = 'Outra'
+    payload['items'].append(2)
+    try:
+        raise ValueError('falhou')
+    except ValueError:
+        log.exception('erro')
+
+    entry, error = log.lines()
+    assert entry['payload'] == {'client': {'name': 'M***'}, 'items': [1]}
+    assert threading.current_thread().name not in threads
+    assert error['msg'] == 'erro'
+    assert 'ValueError: falhou' in error['exc']
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+import pytest
+
+from tracing import BatchSpanProcessor, FileSpanExporter, RequestTrace, parse_traceparent, server_timing_header
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+
+def read_spans(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as spans:
+        return [json.loads(line) for line in spans]
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(f'00-{TRACE_ID}-{PARENT_ID}-01') == (TRACE_ID, PARENT_ID, True)
+    assert parse_traceparent(f'00-{TRACE_ID}-{PARENT_ID}-00') == (TRACE_ID, PARENT_ID, False)
+    assert parse_traceparent(f' 00-{TRACE_ID.upper()}-{PARENT_ID}-03 ') == (TRACE_ID, PARENT_ID, True)
+
+
+@pytest.mark.parametrize('value', [
+    None,
+    '',
+    'lixo',
+    f'ff-{TRACE_ID}-{PARENT_ID}-01',
+    f'00-{TRACE_ID[:-1]}-{PARENT_ID}-01',
+    f'00-{TRACE_ID}-{PARENT_ID}1-01',
+    f'00-{"0" * 32}-{PARENT_ID}-01',
+    f'00-{TRACE_ID}-{"0" * 16}-01',
+    f'00-{"z" * 32}-{PARENT_ID}-01',
+    f'00-{TRACE_ID}-{PARENT_ID}-zz',
+])
+def test_parse_traceparent_rejects_invalid(value):
+    assert parse_traceparent(value) is None
+
+
+def test_server_timing_header():
+    header = server_timing_header({'validation': 0.0012, 'upstream': 0.25}, total=0.3,
+                                  traceparent=f'00-{TRACE_ID}-{PARENT_ID}-01')
+    assert header == (f'validation;dur=1.20, upstream;dur=250.00, total;dur=300.00, '
+                      f'traceparent;desc="00-{TRACE_ID}-{PARENT_ID}-01"')
+    assert server_timing_header({'parse': 0.0005}) == 'parse;dur=0.50'
+
+
+def test_request_trace_continues_incoming_trace():
+    trace = RequestTrace(f'00-{TRACE_ID}-{PARENT_ID}-00', sample_rate=1.0)
+    assert (trace.trace_id, trace.parent_id, trace.sampled) == (TRACE_ID, PARENT_ID, False)
+    assert trace.traceparent == f'00-{TRACE_ID}-{trace.span_id}-00'
+
+    trace.add_stage('upstream', trace.start + 0.01, 0.2)
+    root, stage = trace.spans('POST /pix/create', 0.25)
+    assert root['parentSpanId'] == PARENT_ID and root['durationMs'] == 250.0
+    assert stage['parentSpanId'] == trace.span_id and stage['kind'] != root['kind']
+
+
+def test_batch_span_processor_flush(tmp_path, monkeypatch):
+    path = str(tmp_path / 'spans' / 'traces.jsonl')
+    processor = BatchSpanProcessor(FileSpanExporter(path), batch_size=2, flush_interval=60)
+    monkeypatch.setattr(processor, '_run', lambda: None)  # sem a thread: só o flush exporta
+
+    assert processor.submit([{'name': f'span-{i}'} for i in range(5)])
+    assert read_spans(path) == []
+
+    processor.flush()
+    assert [span['name'] for span in read_spans(path)] == [f'span-{i}' for i in range(5)]
+    processor.flush()
+    assert len(read_spans(path)) == 5
+
+
+def test_batch_span_processor_disabled_without_exporter():
+    processor = BatchSpanProcessor(None)
+    assert not processor.enabled
+    assert processor.submit([{'name': 'span'}]) is False
+    processor.flush()
+
+
+def test_create_route_traces_and_reports_server_timing(client, pix_client, trace_file):
+    response = client.post('/pix/create', json={'amount': 19.9, 'client': pix_client},
+                           headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-01'})
+    assert response.status_code == 201
+
+    server_timing = response.headers['Server-Timing']
+    assert 'validation;dur=' in server_timing and 'total;dur=' in server_timing
+    assert f'traceparent;desc="00-{TRACE_ID}-' in server_timing
+
+    end = time.monotonic() + 5
+    while time.monotonic() < end:
+        spans = [span for span in read_spans(trace_file) if span['traceId'] == TRACE_ID]
+        if spans:
+            break
+        time.sleep(0.05)
+    roots = [span for span in spans if span['parentSpanId'] == PARENT_ID]
+    assert len(roots) == 1
+    assert any(span['name'] == 'validation' and span['parentSpanId'] == roots[0]['spanId'] for span in spans)
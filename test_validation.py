@@ -0,0 +1,120 @@
+import random
+
+import pytest
+
+from validation import RequestValidator, ValidationError, normalize_document, parse_client
+
+CPF_WEIGHTS = (list(range(10, 1, -1)), list(range(11, 1, -1)))
+CNPJ_WEIGHTS = ([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+
+def check_digits(base, weights):
+    """Cálculo direto dos dígitos verificadores, para comparar com o validador"""
+    digits = list(base)
+    for weight in weights:
+        remainder = sum(d * w for d, w in zip(digits, weight)) % 11
+        digits.append(0 if remainder < 2 else 11 - remainder)
+    return ''.join(map(str, digits))
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('529.982.247-25', '52998224725'),
+    ('52998224725', '52998224725'),
+    (' 529 982 247 25 ', '52998224725'),
+    ('111.444.777-35', '11144477735'),
+    ('00000000191', '00000000191'),
+    ('11.222.333/0001-81', '11222333000181'),
+    ('11222333000181', '11222333000181'),
+    (52998224725, '52998224725'),
+])
+def test_valid_documents(value, expected):
+    assert normalize_document(value) == expected
+
+
+@pytest.mark.parametrize('value', [
+    '529.982.247-24',      # segundo dígito errado
+    '529.982.247-15',      # primeiro dígito errado
+    '11.222.333/0001-80',
+    '11.222.333/0001-91',
+    '111.111.111-11',      # dígitos repetidos passam na conta, mas não são válidos
+    '00000000000000',
+    '5299822472',          # tamanhos errados
+    '529982247250',
+    '1122233300018',
+    '',
+    '529.982.247-2X',
+    '５２９９８２２４７２５',  # dígitos não ASCII
+    '529_982_247_25',
+])
+def test_invalid_documents(value):
+    with pytest.raises(ValidationError):
+        normalize_document(value)
+
+
+def test_check_digits_match_reference():
+    rng = random.Random(1234)
+    for size, weights in ((9, CPF_WEIGHTS), (12, CNPJ_WEIGHTS)):
+        for _ in range(2000):
+            document = check_digits([rng.randrange(10) for _ in range(size)], weights)
+            if document == document[0] * len(document):
+                continue
+            assert normalize_document(document) == document
+            wrong = document[:-1] + str((int(document[-1]) + rng.randrange(1, 10)) % 10)
+            with pytest.raises(ValidationError):
+                normalize_document(wrong)
+
+
+def client_data(**fields):
+    return {'name': 'Maria', 'email': 'maria@example.com', **fields}
+
+
+def test_document_field_is_first_non_empty():
+    parsed = parse_client(client_data(cpf=None, document='11.222.333/0001-81'))
+    assert (parsed.document_field, parsed.document) == ('document', '11222333000181')
+    assert parse_client(client_data(cpf='', document='52998224725')).document_field == 'document'
+    assert parse_client(client_data(cpf='52998224725', document='11222333000181')).to_payload()['cpf'] == '52998224725'
+
+    with pytest.raises(ValidationError, match='ausentes: cpf'):
+        parse_client(client_data(cpf=None, document=''))
+
+
+def test_client_validation():
+    payload = parse_client(client_data(cpf='529.982.247-25', phone='11999999999', address={'city': 'SP'})).to_payload()
+    assert payload == {'name': 'Maria', 'email': 'maria@example.com', 'phone': '11999999999',
+                       'cpf': '52998224725', 'address': {'city': 'SP'}}
+    for invalid in (client_data(cpf='52998224725', name='  '), client_data(cpf='52998224725', email='maria'),
+                    client_data(cpf='52998224725', name=12), 'maria'):
+        with pytest.raises(ValidationError):
+            parse_client(invalid)
+
+
+@pytest.mark.parametrize('identifier', ['pedido-1', 12345, 'x' * 100])
+def test_identifier_accepted(identifier):
+    parsed = RequestValidator().parse({'amount': 10, 'client': client_data(cpf='52998224725'), 'identifier': identifier})
+    assert parsed.identifier == str(identifier)
+
+
+@pytest.mark.parametrize('identifier', ['', '   ', 'x' * 101, True, 1.5, {'id': 1}, ['a']])
+def test_identifier_rejected(identifier):
+    with pytest.raises(ValidationError, match='identifier'):
+        RequestValidator().parse({'amount': 10, 'client': client_data(cpf='52998224725'), 'identifier': identifier})
+
+
+def test_request_validation():
+    validator = RequestValidator()
+    parsed = validator.parse({'amount': 10.5, 'client': client_data(cpf='52998224725'), 'utm_source': 'FB',
+                              'utm_term': '', 'products': [{'id': 1}], 'callbackUrl': 'https://x', 'outro': 1})
+    assert (parsed.amount, parsed.identifier, parsed.utm) == (10.5, None, {'utm_source': 'FB'})
+    assert parsed.fields == {'products': [{'id': 1}]}
+
+    for body in ({'client': client_data(cpf='52998224725')}, {'amount': 0, 'client': client_data(cpf='52998224725')},
+                 {'amount': True, 'client': client_data(cpf='52998224725')}, []):
+        with pytest.raises(ValidationError):
+            validator.parse(body)
+    assert RequestValidator(require_amount=False).parse({'client': client_data(cpf='52998224725')}).amount is None
+
+
+def test_route_rejects_invalid_identifier(client, pix_client):
+    response = client.post('/pix/create', json={'amount': 10, 'client': pix_client, 'identifier': 'x' * 500})
+    assert response.status_code == 400
+    assert 'identifier' in response.get_json()['message']
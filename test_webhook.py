@@ -0,0 +1,20 @@
+def test_webhooks_require_token(api, client, created_pix):
+    _, transaction_id = created_pix
+    payload = {'transactionId': transaction_id, 'status': 'PAID'}
+    assert client.post('/pix/webhook', json=payload).status_code == 401
+    assert client.post('/pix/webhook', json=payload, headers={'X-Webhook-Token': 'errado'}).status_code == 401
+
+    token = api.app.config['WEBHOOK_TOKEN']
+    api.app.config['WEBHOOK_TOKEN'] = None
+    try:
+        assert client.post('/pix/webhook', json=payload).status_code == 503
+    finally:
+        api.app.config['WEBHOOK_TOKEN'] = token
+
+
+def test_callback_url_points_to_webhook(api, pix_client):
+    pix_request = api.pix_request_validator.parse({
+        'amount': 10, 'client': pix_client, 'callbackUrl': 'https://outro-servidor.example/cb'
+    })
+    pix_data = api.build_pix_data(pix_request, {})
+    assert pix_data['callbackUrl'] == f"http://testserver/pix/webhook?token={api.app.config['WEBHOOK_TOKEN']}"
@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import importlib
+import threading
+
+import requests
+
+from fast_json import dumps_bytes
+
+logger = logging.getLogger('api_pix.tracing')
+
+# Tipos de span do OTLP
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+# Etapas que são chamadas a serviços externos
+CLIENT_STAGES = frozenset({'upstream'})
+
+
+def parse_traceparent(value):
+    """Header W3C traceparent '00-<trace_id>-<span_id>-<flags>' -> (trace_id, parent_id, sampled) ou None"""
+    parts = (value or '').strip().lower().split('-')
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2 or parts[0] == 'ff':
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == '0' * 32 or parts[2] == '0' * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def server_timing_header(stage_timings, total=None, traceparent=None):
+    """Header Server-Timing: uma métrica por etapa (ms), total e o traceparent para o APM do navegador"""
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stage_timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.2f}")
+    if traceparent:
+        entries.append(f'traceparent;desc="{traceparent}"')
+    return ', '.join(entries)
+
+
+class RequestTrace:
+    """
+    Trace de uma requisição: um span raiz (a requisição) e um span filho
+    por etapa medida com metrics.stage (parse, validation, utm, upstream...).
+
+    Continua o trace do header traceparent quando ele vem na requisição,
+    respeitando a decisão de amostragem de quem chamou; senão amostra com
+    sample_rate.
+    """
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'sampled', 'start_time', 'start', 'stages')
+
+    def __init__(self, traceparent=None, sample_rate=1.0, start_time=None, start=None):
+        parsed = parse_traceparent(traceparent)
+        if parsed is not None:
+            self.trace_id, self.parent_id, self.sampled = parsed
+        else:
+            self.trace_id, self.parent_id = os.urandom(16).hex(), None
+            self.sampled = random.random() < sample_rate
+        self.span_id = os.urandom(8).hex()
+        self.start_time = time.time() if start_time is None else start_time
+        self.start = time.perf_counter() if start is None else start
+        self.stages = []  # (nome, início perf_counter, duração)
+
+    def add_stage(self, name, start, duration):
+        self.stages.append((name, start, duration))
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def _epoch(self, perf_start):
+        return self.start_time + (perf_start - self.start)
+
+    def spans(self, name, duration, attributes=None, error=None):
+        """Spans prontos para exportar (dicts), o raiz primeiro"""
+        root = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id,
+            'name': name,
+            'kind': SPAN_KIND_SERVER,
+            'startTime': self.start_time,
+            'durationMs': round(duration * 1000, 3),
+            'attributes': attributes or {}
+        }
+        if error:
+            root['error'] = error
+        spans = [root]
+        for stage_name, start, stage_duration in self.stages:
+            spans.append({
+                'traceId': self.trace_id,
+                'spanId': os.urandom(8).hex(),
+                'parentSpanId': self.span_id,
+                'name': stage_name,
+                'kind': SPAN_KIND_CLIENT if stage_name in CLIENT_STAGES else SPAN_KIND_INTERNAL,
+                'startTime': self._epoch(start),
+                'durationMs': round(stage_duration * 1000, 3),
+                'attributes': {}
+            })
+        return spans
+
+
+class FileSpanExporter:
+    """Grava os spans em JSON Lines (um span por linha); útil em testes e em desenvolvimento"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans):
+        lines = ''.join(json.dumps(span, ensure_ascii=False) + '\n' for span in spans)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as output:
+            output.write(lines)
+        return True
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class OTLPSpanExporter:
+    """
+    Envia os spans para um coletor OpenTelemetry (OTLP/HTTP em JSON,
+    POST em .../v1/traces), aceito pela maioria dos APMs.
+    """
+
+    def __init__(self, endpoint, headers=None, service_name='api-pix', timeout=5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._session.headers.update({'Content-Type': 'application/json', **(headers or {})})
+
+    def _to_otlp(self, span):
+        start = int(span['startTime'] * 1e9)
+        otlp_span = {
+            'traceId': span['traceId'],
+            'spanId': span['spanId'],
+            'name': span['name'],
+            'kind': span['kind'],
+            'startTimeUnixNano': str(start),
+            'endTimeUnixNano': str(start + int(span['durationMs'] * 1e6)),
+            'attributes': _otlp_attributes(span['attributes'])
+        }
+        if span.get('parentSpanId'):
+            otlp_span['parentSpanId'] = span['parentSpanId']
+        if span.get('error'):
+            otlp_span['status'] = {'code': 2, 'message': span['error']}
+        return otlp_span
+
+    def export(self, spans):
+        body = dumps_bytes({'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': self.service_name})},
+            'scopeSpans': [{'scope': {'name': 'api_pix'}, 'spans': [self._to_otlp(span) for span in spans]}]
+        }]})
+        response = self._session.post(self.endpoint, data=body, timeout=self.timeout)
+        if response.status_code >= 300:
+            logger.warning(f"Trace export rejected ({response.status_code}): {response.text[:200]}")
+            return False
+        return True
+
+
+def parse_headers(value):
+    """'Chave=valor,Outra=valor' -> dict (headers do exporter OTLP)"""
+    headers = {}
+    for item in (value or '').split(','):
+        name, separator, header_value = item.partition('=')
+        if separator and name.strip():
+            headers[name.strip()] = header_value.strip()
+    return headers
+
+
+def build_span_exporter(name, config):
+    """
+    Exporter configurado em TRACE_EXPORTER: '' / 'none', 'file', 'otlp' ou
+    'modulo:fabrica' (fabrica(config) deve retornar um objeto com export(spans)).
+    """
+    name = (name or '').strip()
+    if not name or name == 'none':
+        return None
+    if name == 'file':
+        return FileSpanExporter(config['TRACE_FILE_PATH'])
+    if name == 'otlp':
+        return OTLPSpanExporter(
+            config['TRACE_OTLP_ENDPOINT'],
+            headers=parse_headers(config['TRACE_OTLP_HEADERS']),
+            service_name=config['TRACE_SERVICE_NAME'],
+            timeout=config['TRACE_EXPORT_TIMEOUT']
+        )
+    module_name, separator, attribute = name.partition(':')
+    if not separator:
+        raise ValueError(f"TRACE_EXPORTER inválido: {name}")
+    return getattr(importlib.import_module(module_name), attribute)(config)
+
+
+class BatchSpanProcessor:
+    """
+    Exporta os spans fora da requisição: submit() só enfileira, e uma
+    thread por worker junta até batch_size spans (ou o que chegou em
+    flush_interval) e chama exporter.export. Falhas não são repetidas;
+    com a fila cheia os spans são descartados.
+    """
+
+    def __init__(self, exporter, batch_size=100, flush_interval=2.0, queue_size=10000):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._queue = None
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def start(self):
+        """Inicia a thread de exportação no processo atual (no-op se já iniciada ou desabilitado)"""
+        if not self.enabled:
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.queue_size)
+            self._started_pid = os.getpid()
+            threading.Thread(target=self._run, name='span-exporter', daemon=True).start()
+            atexit.register(self.flush)
+
+    def submit(self, spans):
+        if not self.enabled:
+            return False
+        if self._started_pid != os.getpid():
+            self.start()
+        try:
+            for span in spans:
+                self._queue.put_nowait(span)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._export(batch)
+
+    def _export(self, batch):
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            logger.warning(f"Failed to export {len(batch)} spans: {str(e)}")
+
+    def flush(self):
+        """Exporta na thread atual o que estiver na fila (encerramento do worker e testes)"""
+        if self._queue is None or self._started_pid != os.getpid():
+            return
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) == self.batch_size:
+                self._export(batch)
+                batch = []
+        if batch:
+            self._export(batch)
@@ -0,0 +1,178 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def hash_client_document(document, salt=''):
+    """Hash do CPF/CNPJ (apenas dígitos) para identificar o cliente sem guardar o documento"""
+    digits = ''.join(ch for ch in str(document or '') if ch.isdigit())
+    if not digits:
+        return None
+    return hashlib.sha256(f"{salt}{digits}".encode()).hexdigest()
+
+
+class TransactionStore:
+    """
+    Registro local das transações criadas (SQLite, tabela transactions).
+
+    Guarda identifier, transactionId, valor, hash do cliente, UTM e status
+    no momento da criação; o status é atualizado pelos webhooks.
+    """
+
+    COLUMNS = ('identifier', 'transaction_id', 'amount', 'client_hash', 'utm',
+               'status', 'due_date', 'credential', 'created_at', 'updated_at')
+
+    def __init__(self, db, client_hash_salt=''):
+        self.db = db
+        self.client_hash_salt = client_hash_salt
+        self._create_schema()
+
+    def _create_schema(self):
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS transactions (
+                identifier TEXT PRIMARY KEY,
+                transaction_id TEXT,
+                amount REAL,
+                client_hash TEXT,
+                utm TEXT,
+                status TEXT,
+                due_date TEXT,
+                credential TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        # Bancos criados antes do pool de credenciais
+        columns = {row[1] for row in self.db.execute('PRAGMA table_info(transactions)')}
+        if 'credential' not in columns:
+            self.db.execute('ALTER TABLE transactions ADD COLUMN credential TEXT')
+        self.db.execute(
+            'CREATE INDEX IF NOT EXISTS idx_transactions_transaction_id ON transactions (transaction_id)'
+        )
+
+    def record_created(self, pix_data, result, credential=None):
+        """Registra uma transação recém-criada na Duckfy (credential: chave do pool usada)"""
+        now = time.time()
+        client = pix_data.get('client') or {}
+        tracking = (pix_data.get('metadata') or {}).get('tracking') or {}
+        row = {
+            'identifier': str(pix_data['identifier']),
+            'transaction_id': result.get('transactionId'),
+            'amount': pix_data.get('amount'),
+            'client_hash': hash_client_document(client.get('cpf') or client.get('document'), self.client_hash_salt),
+            'utm': json.dumps(tracking, ensure_ascii=False) if tracking else None,
+            # O status da resposta de criação é o da chamada ('OK'), não o da
+            # cobrança: toda cobrança nasce pendente e só webhooks a mudam
+            'status': 'PENDING',
+            'due_date': pix_data.get('dueDate'),
+            'credential': credential,
+            'created_at': now,
+            'updated_at': now
+        }
+        self.db.execute(
+            f"INSERT OR REPLACE INTO transactions ({', '.join(self.COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in self.COLUMNS)})",
+            tuple(row[column] for column in self.COLUMNS)
+        )
+        return row
+
+    def update_statuses(self, events):
+        """
+        Aplica um lote de eventos de status (transaction_id/identifier + status).
+
+        Retorna as transações atualizadas (identifier, status anterior e novo,
+        valor, UTM e hash do cliente), para invalidar caches e contabilizar
+        pagamentos.
+        """
+        now = time.time()
+        updated = []
+        with self.db.transaction() as conn:
+            for event in events:
+                row = None
+                if event.get('identifier'):
+                    row = conn.execute(
+                        'SELECT identifier, status, amount, utm, client_hash FROM transactions WHERE identifier = ?',
+                        (event['identifier'],)
+                    ).fetchone()
+                if row is None:
+                    row = conn.execute(
+                        'SELECT identifier, status, amount, utm, client_hash FROM transactions WHERE transaction_id = ?',
+                        (event.get('transaction_id'),)
+                    ).fetchone()
+                    if row is None:
+                        continue
+                identifier, previous_status, amount, utm, client_hash = row
+
+                conn.execute(
+                    'UPDATE transactions SET status = ?, updated_at = ?, '
+                    'transaction_id = COALESCE(transaction_id, ?) WHERE identifier = ?',
+                    (event['status'], now, event.get('transaction_id'), identifier)
+                )
+                updated.append({
+                    'identifier': identifier,
+                    'previous_status': previous_status,
+                    'status': event['status'],
+                    'amount': amount,
+                    'utm': json.loads(utm) if utm else None,
+                    'client_hash': client_hash
+                })
+        return updated
+
+    def get(self, identifier):
+        """Busca por identifier (ou, na falta, por transactionId)"""
+        columns = ', '.join(self.COLUMNS)
+        row = self.db.execute(
+            f'SELECT {columns} FROM transactions WHERE identifier = ?', (identifier,)
+        ).fetchone()
+        if row is None:
+            row = self.db.execute(
+                f'SELECT {columns} FROM transactions WHERE transaction_id = ?', (identifier,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        record = dict(zip(self.COLUMNS, row))
+        record['utm'] = json.loads(record['utm']) if record['utm'] else None
+        return record
+
+
+class ReadThroughCache:
+    """
+    Cache LRU em memória com TTL curto na frente de uma função de leitura.
+
+    O TTL limita quanto tempo um worker pode servir um status desatualizado
+    por outro worker; alterações no próprio worker chamam invalidate().
+    Resultados None (não encontrado) também são guardados, evitando
+    consultas repetidas ao banco por ids inexistentes.
+    """
+
+    def __init__(self, loader, max_entries=10000, ttl=2.0):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        value = self.loader(key)
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
@@ -0,0 +1,225 @@
+import os
+import time
+import atexit
+import logging
+import threading
+
+# Dimensão -> parâmetro UTM de origem (formato "nome|id" do Facebook Ads)
+DIMENSIONS = (
+    ('campaign', 'utm_campaign'),
+    ('adset', 'utm_medium'),
+    ('ad', 'utm_content'),
+    ('placement', 'utm_term')
+)
+DIMENSION_NAMES = tuple(name for name, _ in DIMENSIONS)
+
+# Células do buffer: [key_name, created, created_amount, paid, paid_amount]
+_CREATED, _CREATED_AMOUNT, _PAID, _PAID_AMOUNT = range(1, 5)
+
+
+class UTMRollupStore:
+    """
+    Totais por bucket de tempo e por campanha/conjunto/anúncio/posicionamento
+    (SQLite, tabela utm_rollups). Cada worker soma seus deltas com UPSERT,
+    então a tabela já contém o agregado de todos os workers.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._create_schema()
+
+    def _create_schema(self):
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS utm_rollups (
+                bucket_start INTEGER NOT NULL,
+                dimension TEXT NOT NULL,
+                key_id TEXT NOT NULL,
+                key_name TEXT,
+                created INTEGER NOT NULL DEFAULT 0,
+                created_amount REAL NOT NULL DEFAULT 0,
+                paid INTEGER NOT NULL DEFAULT 0,
+                paid_amount REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket_start, dimension, key_id)
+            )
+        ''')
+
+    def apply(self, deltas):
+        """Soma deltas {(bucket_start, dimension, key_id): (key_name, created, created_amount, paid, paid_amount)}"""
+        with self.db.transaction() as conn:
+            conn.executemany(
+                'INSERT INTO utm_rollups (bucket_start, dimension, key_id, key_name, '
+                'created, created_amount, paid, paid_amount) VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (bucket_start, dimension, key_id) DO UPDATE SET '
+                'key_name = excluded.key_name, '
+                'created = created + excluded.created, '
+                'created_amount = created_amount + excluded.created_amount, '
+                'paid = paid + excluded.paid, '
+                'paid_amount = paid_amount + excluded.paid_amount',
+                [(bucket, dimension, key_id, *values) for (bucket, dimension, key_id), values in deltas.items()]
+            )
+
+    def rollup(self, since, dimensions=DIMENSION_NAMES, limit=50):
+        """Totais desde since por dimensão, ordenados por receita paga"""
+        result = {}
+        for dimension in dimensions:
+            rows = self.db.execute(
+                'SELECT key_id, MAX(key_name), SUM(created), SUM(created_amount), SUM(paid), SUM(paid_amount) '
+                'FROM utm_rollups WHERE dimension = ? AND bucket_start >= ? '
+                'GROUP BY key_id ORDER BY SUM(paid_amount) DESC, SUM(created_amount) DESC LIMIT ?',
+                (dimension, since, limit)
+            ).fetchall()
+            result[dimension] = [
+                {
+                    'id': key_id,
+                    'name': key_name,
+                    'created': created,
+                    'created_amount': round(created_amount, 2),
+                    'paid': paid,
+                    'paid_amount': round(paid_amount, 2),
+                    'conversion_rate': round(paid / created, 4) if created else None
+                }
+                for key_id, key_name, created, created_amount, paid, paid_amount in rows
+            ]
+        return result
+
+    def prune(self, before):
+        self.db.execute('DELETE FROM utm_rollups WHERE bucket_start < ?', (before,))
+
+
+class UTMAggregator:
+    """
+    Contadores de PIX criados/pagos e receita por campanha, conjunto de
+    anúncios, anúncio e posicionamento, em buckets de bucket_seconds.
+
+    Os valores "nome|id" são separados uma única vez e guardados em uma
+    tabela de strings internadas (limitada a max_keys). record() só soma
+    em memória; uma thread grava os deltas no UTMRollupStore a cada
+    flush_interval segundos.
+    """
+
+    def __init__(self, store, bucket_seconds=300, flush_interval=10.0, retention_days=30, max_keys=50000):
+        self.store = store
+        self.bucket_seconds = int(bucket_seconds)
+        self.flush_interval = flush_interval
+        self.retention_seconds = int(retention_days * 86400)
+        self.max_keys = max_keys
+        self._splits = {}
+        self._strings = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def split(self, value):
+        """'Nome da campanha|123' -> ('123', 'Nome da campanha'); sem id, o nome vira a chave"""
+        cached = self._splits.get(value)
+        if cached is not None:
+            return cached
+
+        name, separator, key_id = value.rpartition('|')
+        if not separator or not key_id.strip():
+            name, key_id = value, value
+        name, key_id = name.strip(), key_id.strip()
+        parts = (self._intern(key_id), self._intern(name))
+        if len(self._splits) < self.max_keys:
+            self._splits[value] = parts
+        return parts
+
+    def _intern(self, value):
+        interned = self._strings.get(value)
+        if interned is None:
+            interned = value
+            if len(self._strings) < self.max_keys:
+                self._strings[value] = value
+        return interned
+
+    def bucket_start(self, timestamp):
+        return int(timestamp) - int(timestamp) % self.bucket_seconds
+
+    def record(self, tracking, amount, paid=False, timestamp=None):
+        """Contabiliza um PIX criado (ou pago) com o tracking UTM dele"""
+        if not tracking:
+            return
+        keys = []
+        for dimension, param in DIMENSIONS:
+            value = tracking.get(param)
+            if value:
+                keys.append((dimension, *self.split(str(value))))
+        if not keys:
+            return
+
+        bucket = self.bucket_start(timestamp or time.time())
+        amount = float(amount or 0)
+        with self._lock:
+            for dimension, key_id, key_name in keys:
+                cell = self._pending.get((bucket, dimension, key_id))
+                if cell is None:
+                    cell = self._pending[(bucket, dimension, key_id)] = [key_name, 0, 0.0, 0, 0.0]
+                if paid:
+                    cell[_PAID] += 1
+                    cell[_PAID_AMOUNT] += amount
+                else:
+                    cell[_CREATED] += 1
+                    cell[_CREATED_AMOUNT] += amount
+
+    def flush(self):
+        """Grava os deltas acumulados; em caso de erro eles voltam para o buffer"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        try:
+            self.store.apply(pending)
+        except Exception:
+            with self._lock:
+                for key, values in pending.items():
+                    cell = self._pending.get(key)
+                    if cell is None:
+                        self._pending[key] = values
+                    else:
+                        for index in (_CREATED, _CREATED_AMOUNT, _PAID, _PAID_AMOUNT):
+                            cell[index] += values[index]
+            raise
+
+        now = time.time()
+        if now - self._last_prune > 3600:
+            self._last_prune = now
+            self.store.prune(self.bucket_start(now - self.retention_seconds))
+        return len(pending)
+
+    def start(self):
+        """Inicia a thread de flush no processo atual (no-op se já iniciada)"""
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            threading.Thread(target=self._run, name='utm-aggregator-flush', daemon=True).start()
+            # Worker encerrado normalmente: grava o que ainda estiver no buffer
+            atexit.register(self._flush_quietly)
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"UTM aggregator flush failed: {str(e)}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self._flush_quietly()
+
+
+def parse_window(value, default=86400, maximum=None):
+    """'30m', '24h', '7d' ou segundos -> segundos"""
+    if not value:
+        return default
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    value = str(value).strip().lower()
+    multiplier = units.get(value[-1])
+    number = value[:-1] if multiplier else value
+    seconds = int(float(number) * (multiplier or 1))
+    if seconds <= 0:
+        raise ValueError("Janela deve ser positiva")
+    return min(seconds, maximum) if maximum else seconds
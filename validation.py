@@ -0,0 +1,232 @@
+import re
+import json
+from operator import mul
+
+
+class ValidationError(ValueError):
+    """Corpo da requisição inválido (respondido com 400)"""
+
+
+EMAIL_RE = re.compile(r'\s*[^@\s]+@[^@\s]+\.[^@\s.]+\s*$')
+
+UTM_FIELDS = ('utm_source', 'utm_campaign', 'utm_medium', 'utm_content', 'utm_term')
+UTM_MAX_LENGTH = 200
+IDENTIFIER_MAX_LENGTH = 100
+
+# Campos repassados como vieram para a Duckfy (o callbackUrl é sempre o desta API)
+PASSTHROUGH_FIELDS = ('shippingFee', 'extraFee', 'discount', 'products', 'splits', 'dueDate')
+
+# Pesos dos dígitos verificadores; o deslocamento compensa somar códigos ASCII
+# ('0' == 48) em vez de converter cada dígito com int()
+_CPF_WEIGHTS = (tuple(range(10, 1, -1)), tuple(range(11, 1, -1)))
+_CNPJ_WEIGHTS = ((5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2), (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2))
+
+
+def _check_digit_table(first, second):
+    """
+    Os pesos do segundo dígito são os do primeiro + 1 (exceto onde o CNPJ
+    volta de 9 para 2) e 2 na posição do primeiro dígito: a segunda soma sai
+    da primeira com uma soma simples dos dígitos, sem outra multiplicação.
+    """
+    corrections = tuple(
+        (position, weight - first[position] - 1)
+        for position, weight in enumerate(second[:-1]) if weight != first[position] + 1
+    )
+    return first, 48 * sum(first), corrections, 48 * sum(second)
+
+
+_CHECK_DIGITS = {
+    len(first) + 2: _check_digit_table(first, second)
+    for first, second in (_CPF_WEIGHTS, _CNPJ_WEIGHTS)
+}
+
+
+def _check_digit(total):
+    remainder = total % 11
+    return 0 if remainder < 2 else 11 - remainder
+
+
+def normalize_document(value):
+    """
+    Normaliza e valida CPF (11 dígitos) ou CNPJ (14 dígitos).
+
+    Retorna apenas os dígitos; levanta ValidationError se o formato ou os
+    dígitos verificadores forem inválidos.
+    """
+    digits = str(value).replace('.', '').replace('-', '').replace('/', '').replace(' ', '')
+    table = _CHECK_DIGITS.get(len(digits))
+    if table is None or not digits.isascii() or not digits.isdigit() or digits == digits[0] * len(digits):
+        raise ValidationError("CPF/CNPJ do cliente inválido")
+
+    weights, offset, corrections, second_offset = table
+    codes = digits.encode()
+    position = len(digits) - 2
+    total = sum(map(mul, codes, weights))
+    if codes[position] - 48 != _check_digit(total - offset):
+        raise ValidationError("CPF/CNPJ do cliente inválido")
+
+    total += sum(codes[:position]) + 2 * codes[position]
+    for correction_position, delta in corrections:
+        total += delta * codes[correction_position]
+    if codes[position + 1] - 48 != _check_digit(total - second_offset):
+        raise ValidationError("CPF/CNPJ do cliente inválido")
+    return digits
+
+
+class ClientData:
+    """Dados do cliente já validados; document guarda só os dígitos do CPF/CNPJ"""
+    __slots__ = ('name', 'email', 'phone', 'document', 'document_field', 'extra')
+
+    def __init__(self, name, email, phone, document, document_field, extra):
+        self.name = name
+        self.email = email
+        self.phone = phone
+        self.document = document
+        self.document_field = document_field
+        self.extra = extra
+
+    def to_payload(self):
+        payload = dict(self.extra) if self.extra else {}
+        payload['name'] = self.name
+        payload['email'] = self.email
+        if self.phone is not None:
+            payload['phone'] = self.phone
+        payload[self.document_field] = self.document
+        return payload
+
+
+class PixRequest:
+    """Requisição de criação de PIX validada (ver RequestValidator)"""
+    __slots__ = ('amount', 'client', 'identifier', 'metadata', 'utm', 'fields')
+
+    def __init__(self):
+        self.amount = None
+        self.client = None
+        self.identifier = None
+        self.metadata = None
+        self.utm = {}
+        self.fields = {}
+
+
+_CLIENT_FIELDS = frozenset(('name', 'email', 'phone', 'cpf', 'document'))
+_DOCUMENT_FIELDS = ('cpf', 'document')
+
+
+def parse_client(value):
+    """Valida o objeto client: campos obrigatórios, e-mail e CPF/CNPJ"""
+    if not isinstance(value, dict):
+        raise ValidationError("Campo 'client' deve ser um objeto")
+
+    name = value.get('name')
+    email = value.get('email')
+    phone = value.get('phone')
+    # O primeiro preenchido entre cpf e document ({"cpf": null, "document": "..."} vale)
+    document_field, document = 'cpf', None
+    for field in _DOCUMENT_FIELDS:
+        candidate = value.get(field)
+        if candidate is not None and candidate != '':
+            document_field, document = field, candidate
+            break
+
+    if name is None or email is None or document is None:
+        missing = [field for field, present in (('name', name), ('email', email), ('cpf', document))
+                   if present is None]
+        raise ValidationError(f"Campos obrigatórios do cliente ausentes: {', '.join(missing)}")
+
+    name = name.strip() if isinstance(name, str) else ''
+    if not name:
+        raise ValidationError("Nome do cliente inválido")
+    if not isinstance(email, str) or not EMAIL_RE.match(email):
+        raise ValidationError("E-mail do cliente inválido")
+
+    # Campos além dos conhecidos (endereço etc.) seguem para a Duckfy como vieram
+    extra = None
+    if len(value) > 3 + (phone is not None):
+        extra = {key: field_value for key, field_value in value.items() if key not in _CLIENT_FIELDS}
+
+    return ClientData(name, email.strip(), phone, normalize_document(document),
+                      document_field, extra)
+
+
+def _parse_amount(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise ValidationError("Campo 'amount' deve ser um número positivo")
+    return value
+
+
+def _parse_identifier(value):
+    # Números são aceitos como texto; o identifier vai para a Duckfy e para o banco
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str) or not value.strip() or len(value) > IDENTIFIER_MAX_LENGTH:
+        raise ValidationError(f"Campo 'identifier' deve ser um texto de 1 a {IDENTIFIER_MAX_LENGTH} caracteres")
+    return value
+
+
+def _parse_metadata(value):
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            parsed = None
+        return parsed if isinstance(parsed, dict) else {'original_metadata': value}
+    if value is None:
+        return {}
+    raise ValidationError("Campo 'metadata' deve ser um objeto")
+
+
+# Tipos de campo resolvidos na montagem do validador
+_AMOUNT, _IDENTIFIER, _METADATA, _PASSTHROUGH, _UTM = range(5)
+
+
+class RequestValidator:
+    """
+    Validador de corpo de requisição, montado uma vez por rota.
+
+    A tabela de campos é resolvida na construção; parse() percorre o corpo
+    uma única vez, validando e copiando cada campo conhecido para um
+    PixRequest. Campos desconhecidos são ignorados.
+    """
+
+    def __init__(self, require_amount=True, passthrough=PASSTHROUGH_FIELDS, utm_fields=UTM_FIELDS):
+        self.require_amount = require_amount
+        self.required = ('amount', 'client') if require_amount else ('client',)
+        self._fields = {}
+        if require_amount:
+            self._fields.update({'amount': _AMOUNT, 'identifier': _IDENTIFIER, 'metadata': _METADATA})
+        self._fields.update(dict.fromkeys(passthrough, _PASSTHROUGH))
+        self._fields.update(dict.fromkeys(utm_fields, _UTM))
+
+    def parse(self, data):
+        if not isinstance(data, dict):
+            raise ValidationError("Corpo da requisição deve ser um objeto JSON")
+
+        if 'client' not in data or (self.require_amount and 'amount' not in data):
+            missing = [field for field in self.required if field not in data]
+            raise ValidationError(f"Campos obrigatórios ausentes: {', '.join(missing)}")
+
+        parsed = PixRequest()
+        fields = self._fields
+        for key, value in data.items():
+            kind = fields.get(key)
+            if kind is None:
+                continue
+            if kind == _UTM:
+                if value:
+                    parsed.utm[key] = str(value)[:UTM_MAX_LENGTH]
+            elif kind == _PASSTHROUGH:
+                parsed.fields[key] = value
+            elif kind == _AMOUNT:
+                parsed.amount = value
+            elif kind == _IDENTIFIER:
+                if value is not None:
+                    parsed.identifier = _parse_identifier(value)
+            else:
+                parsed.metadata = _parse_metadata(value)
+
+        parsed.client = parse_client(data['client'])
+        if self.require_amount:
+            parsed.amount = _parse_amount(parsed.amount)
+        return parsed
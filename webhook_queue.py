@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import logging
+import threading
+
+
+class WebhookQueue:
+    """
+    Fila durável de webhooks em SQLite (modo WAL).
+
+    O endpoint só grava o evento e responde; o processamento acontece depois,
+    em lotes, pelo WebhookProcessor. Cada thread usa sua própria conexão e
+    vários workers do gunicorn podem consumir a mesma fila: um lote é
+    reservado (status 'processing') dentro de uma transação IMMEDIATE.
+    """
+
+    def __init__(self, db, visibility_timeout=60, max_attempts=5):
+        self.db = db
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._create_schema()
+
+    def _create_schema(self):
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS webhook_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                received_at REAL NOT NULL,
+                transaction_id TEXT,
+                identifier TEXT,
+                status TEXT,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                claimed_at REAL,
+                processed_at REAL,
+                error TEXT
+            )
+        ''')
+        self.db.execute(
+            'CREATE INDEX IF NOT EXISTS idx_webhook_events_state ON webhook_events (state, id)'
+        )
+        # Consulta de eventos ainda não aplicados de uma cobrança (reaproveitamento)
+        self.db.execute(
+            'CREATE INDEX IF NOT EXISTS idx_webhook_events_identifier ON webhook_events (identifier)'
+        )
+        self.db.execute(
+            'CREATE INDEX IF NOT EXISTS idx_webhook_events_transaction ON webhook_events (transaction_id)'
+        )
+
+    def enqueue(self, event):
+        """Grava um evento normalizado (ver parse_webhook_payload)"""
+        cursor = self.db.execute(
+            'INSERT INTO webhook_events (received_at, transaction_id, identifier, status, payload) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (time.time(), event['transaction_id'], event['identifier'], event['status'],
+             json.dumps(event['payload'], ensure_ascii=False))
+        )
+        return cursor.lastrowid
+
+    def claim_batch(self, limit):
+        """
+        Reserva até limit eventos pendentes. Eventos reservados há mais de
+        visibility_timeout (worker morto no meio do lote) voltam a ser elegíveis.
+        """
+        now = time.time()
+        with self.db.transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, transaction_id, identifier, status, payload, attempts FROM webhook_events "
+                "WHERE state = 'pending' OR (state = 'processing' AND claimed_at < ?) "
+                "ORDER BY id LIMIT ?",
+                (now - self.visibility_timeout, limit)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE webhook_events SET state = 'processing', claimed_at = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    [(now, row[0]) for row in rows]
+                )
+
+        return [
+            {
+                'id': row[0],
+                'transaction_id': row[1],
+                'identifier': row[2],
+                'status': row[3],
+                'payload': json.loads(row[4]),
+                'attempts': row[5] + 1
+            }
+            for row in rows
+        ]
+
+    def complete(self, event_ids):
+        self.db.executemany(
+            "UPDATE webhook_events SET state = 'done', processed_at = ?, error = NULL WHERE id = ?",
+            [(time.time(), event_id) for event_id in event_ids]
+        )
+
+    def fail(self, events, error):
+        """Devolve os eventos à fila, ou marca 'failed' após max_attempts"""
+        self.db.executemany(
+            "UPDATE webhook_events SET state = ?, error = ? WHERE id = ?",
+            [
+                ('failed' if event['attempts'] >= self.max_attempts else 'pending', str(error)[:500], event['id'])
+                for event in events
+            ]
+        )
+
+    def stats(self):
+        return dict(self.db.execute('SELECT state, COUNT(*) FROM webhook_events GROUP BY state').fetchall())
+
+
+class WebhookProcessor:
+    """
+    Pool de threads que consome a WebhookQueue em lotes e repassa cada lote
+    para os handlers registrados (atualização de status, ações seguintes).
+
+    Um handler recebe a lista de eventos do lote; se levantar exceção o lote
+    inteiro volta para a fila e será tentado de novo.
+    """
+
+    def __init__(self, queue, handlers=(), workers=2, batch_size=50, poll_interval=1.0):
+        self.queue = queue
+        self.handlers = list(handlers)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+
+    def add_handler(self, handler):
+        self.handlers.append(handler)
+
+    def start(self):
+        """Inicia as threads no processo atual (no-op se já iniciadas)"""
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._wakeup = threading.Event()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'webhook-processor-{i}', daemon=True)
+                thread.start()
+
+    def notify(self):
+        """Acorda os consumidores após um enqueue neste processo"""
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            try:
+                processed = self.process_once()
+            except Exception as e:
+                logging.error(f"Webhook processor error: {str(e)}")
+                processed = 0
+
+            if processed < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def process_once(self):
+        events = self.queue.claim_batch(self.batch_size)
+        if not events:
+            return 0
+
+        try:
+            for handler in self.handlers:
+                handler(events)
+        except Exception as e:
+            logging.error(f"Webhook batch failed ({len(events)} events): {str(e)}")
+            self.queue.fail(events, e)
+            return len(events)
+
+        self.queue.complete([event['id'] for event in events])
+        return len(events)
+
+
+def parse_webhook_payload(data):
+    """
+    Valida e normaliza o payload de confirmação de pagamento.
+
+    Aceita os campos no topo do objeto ou dentro de 'transaction':
+    id/transactionId, identifier e status. Levanta ValueError se inválido.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Payload do webhook deve ser um objeto JSON")
+
+    transaction = data.get('transaction') if isinstance(data.get('transaction'), dict) else data
+    transaction_id = transaction.get('transactionId') or transaction.get('id')
+    identifier = transaction.get('identifier')
+    status = transaction.get('status') or data.get('status')
+
+    if not transaction_id and not identifier:
+        raise ValueError("Webhook sem transactionId/identifier")
+    if not status:
+        raise ValueError("Webhook sem status da transação")
+
+    return {
+        'transaction_id': str(transaction_id or identifier)[:100],
+        'identifier': str(identifier)[:100] if identifier else None,
+        'status': str(status).upper()[:50],
+        'payload': data
+    }